@@ -5,6 +5,7 @@ from flask import Flask, render_template
 from flask_graphql import GraphQLView
 
 from src.models import db
+from src.response_cache import CachedGraphQLView, create_cache
 from src.schema import schema
 from src.utils import get_config
 
@@ -18,10 +19,15 @@ def create_app(config=CONFIG) -> Flask:
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = True
     db.init_app(app)
 
-    app.add_url_rule(
-        "/graphql",
-        view_func=GraphQLView.as_view("graphql", schema=schema, graphiql=True),
-    )
+    cache_config = config.get("response_cache")
+    if cache_config:
+        cache, generation = create_cache(cache_config)
+        view = CachedGraphQLView.as_view(
+            "graphql", schema=schema, graphiql=True, cache=cache, generation=generation
+        )
+    else:
+        view = GraphQLView.as_view("graphql", schema=schema, graphiql=True)
+    app.add_url_rule("/graphql", view_func=view)
 
     @app.route("/")
     def index() -> str:
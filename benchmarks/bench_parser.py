@@ -0,0 +1,94 @@
+"""
+Compare rows/sec of the old dict-per-row TSV reader with `TsvScanner`.
+
+    python -m benchmarks.bench_parser [--rows N] [dataset.tsv ...]
+
+Without dataset paths the well formed rows of tests/datasets/*.tsv
+are repeated until every file has `--rows` rows.
+"""
+import csv
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from os.path import getsize
+from pathlib import Path
+from typing import Callable, Iterable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.dataset_scanner import TsvScanner, parse_ids  # noqa: E402
+from src.utils import get_int  # noqa: E402
+
+DELIMITER = "\t"
+DATASETS_DIR = Path(__file__).resolve().parent.parent / "tests" / "datasets"
+
+
+def legacy_scan(file_path: Path) -> int:
+    size = getsize(file_path)
+    read_size = 0
+    rows = 0
+    with open(file_path) as fd:
+        tsv_reader = csv.reader(fd, delimiter=DELIMITER)
+        headers = next(tsv_reader)
+        id_column = headers[0]
+        for line in tsv_reader:
+            read_size += len("".join(line)) + len(line)
+            data = dict(zip(headers, line))
+            _ = get_int(data[id_column]), (read_size / size) * 100
+            rows += 1
+    return rows
+
+
+def scanner_scan(file_path: Path) -> int:
+    rows = 0
+    for batch in TsvScanner(file_path, DELIMITER):
+        if len(batch):
+            parse_ids(batch.columns[0])
+        rows += len(batch) + len(batch.malformed)
+    return rows
+
+
+def make_dataset(source: Path, target_dir: Path, rows: int) -> Path:
+    with open(source) as fd:
+        header, *lines = [line.rstrip("\n") for line in fd if line.strip()]
+    width = header.count(DELIMITER)
+    lines = [line for line in lines if line.count(DELIMITER) == width]
+    target = target_dir / source.name
+    with open(target, "w") as fd:
+        fd.write(f"{header}\n")
+        for idx in range(rows):
+            fd.write(f"{lines[idx % len(lines)]}\n")
+    return target
+
+
+def measure(scan: Callable[[Path], int], file_path: Path) -> float:
+    start = time.perf_counter()
+    rows = scan(file_path)
+    return rows / (time.perf_counter() - start)
+
+
+def run(paths: Iterable[Path]) -> None:
+    print(f"{'dataset':<28}{'legacy rows/s':>16}{'scanner rows/s':>16}{'speedup':>10}")
+    for path in paths:
+        legacy = measure(legacy_scan, path)
+        scanner = measure(scanner_scan, path)
+        print(f"{path.name:<28}{legacy:>16,.0f}{scanner:>16,.0f}{scanner / legacy:>9.2f}x")
+
+
+def main() -> None:
+    cmd_line_parser = ArgumentParser()
+    cmd_line_parser.add_argument("paths", nargs="*", type=Path)
+    cmd_line_parser.add_argument("--rows", type=int, default=500_000)
+    args = cmd_line_parser.parse_args()
+
+    if args.paths:
+        run(args.paths)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        run(make_dataset(path, Path(tmp_dir), args.rows) for path in sorted(DATASETS_DIR.glob("*.tsv")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+End to end benchmark of extract, parse and load on synthetic datasets.
+
+    python -m benchmarks.bench_pipeline [--scale 5] [--workers N] [--dburi URI]
+                                        [--update-baseline] [--tolerance 0.25]
+
+Datasets are generated by `benchmarks.synthetic` into a temporary directory,
+extracted with `DataSetsHandler.extract`, parsed with `DatasetParser` and,
+with --dburi, loaded with `DatasetLoader` (which replaces the tables there).
+Rows/s of every stage and table and the peak RSS of the process and its
+workers are compared with benchmarks/baselines.json: the run fails if a
+rate drops or the peak RSS grows by more than --tolerance. Without a
+baseline for the scale and workers the results are recorded as one.
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from argparse import ArgumentParser, Namespace
+from pathlib import Path
+from typing import Any, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.synthetic import CONFIG_PATH, SyntheticDatasets  # noqa: E402
+from src.progress import RunReport  # noqa: E402
+from src.utils import Config, DataSet, get_config  # noqa: E402
+
+BASELINES_PATH = Path(__file__).resolve().parent / "baselines.json"
+TOLERANCE = 0.25
+MIN_SECONDS = 0.2  # shorter timings are too noisy to compare
+RSS_INTERVAL = 0.05
+
+
+class PeakRss:
+    """
+    Samples the RSS of this process and its children (parse and COPY
+    workers) in a thread, `peak` is the highest sum seen. Needs `psutil`.
+    """
+
+    def __init__(self, interval: float = RSS_INTERVAL) -> None:
+        import psutil
+
+        self.interval = interval
+        self.peak = 0
+        self._process = psutil.Process()
+        self._error = psutil.Error
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name="peak-rss", daemon=True)
+
+    def __enter__(self) -> "PeakRss":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _sample(self) -> None:
+        while True:
+            rss = self._process.memory_info().rss
+            for child in self._process.children(recursive=True):
+                try:
+                    rss += child.memory_info().rss
+                except self._error:
+                    pass  # exited since listed
+            self.peak = max(self.peak, rss)
+            if self._stop.wait(self.interval):
+                return
+
+
+def get_benchmark_config(config: Config) -> Config:
+    """
+    Config with the datasets the parser has a handler for
+    """
+    from src.dataset_parser import DatasetParser
+
+    dataset_paths = {
+        key: path for key, path in config["dataset_paths"].items() if hasattr(DatasetParser, f"_parse_{key}")
+    }
+    return {**config, "dataset_paths": dataset_paths}  # type: ignore[typeddict-item]
+
+
+def run(root: Path, scale: float, workers: int, db_uri: Optional[str]) -> dict[str, Any]:
+    """
+    :return: seconds and rows/s per stage and table, peak RSS in bytes
+    """
+    from src.dataset_handler import DataSetsHandler
+    from src.dataset_parser import DatasetParser
+
+    config = get_benchmark_config(get_config(CONFIG_PATH))
+    report = RunReport()
+    started = time.perf_counter()
+    paths = SyntheticDatasets(scale).write(root, config)
+    generated = time.perf_counter() - started
+    print(f"Generated {sum(path.stat().st_size for path in paths):,} bytes in {generated:.1f}s")
+
+    cmd_args = Namespace(
+        root=str(root), dburi=db_uri, resume=None, debug=False, quiet=True, workers=workers
+    )
+    with PeakRss() as rss:
+        DataSetsHandler(
+            [DataSet(url="", gzipped=path, extracted=path.with_suffix("")) for path in paths],
+            report=report,
+        ).extract()
+        DatasetParser(cmd_args, config=config, report=report).parse_dataset()
+        if db_uri:
+            from src.dataset_loader import DatasetLoader
+
+            loader = DatasetLoader(cmd_args, config=config, report=report)
+            loader.db_init()
+            loader.load_dataset()
+
+    results: dict[str, Any] = {"peak_rss": rss.peak}
+    for stage_name, stage in report.stages.items():
+        rows = sum(metrics.rows for metrics in stage.datasets.values())
+        results[stage_name] = {"seconds": round(stage.seconds, 3), "rows_per_sec": _rate(rows, stage.seconds)}
+        for table, metrics in stage.datasets.items():
+            results[f"{stage_name}.{table}"] = {
+                "seconds": round(metrics.seconds, 3),
+                "rows_per_sec": _rate(metrics.rows, metrics.seconds),
+                "bytes_per_sec": _rate(metrics.bytes, metrics.seconds),
+            }
+    return results
+
+
+def _rate(amount: int, seconds: float) -> Optional[float]:
+    return round(amount / seconds, 1) if amount and seconds else None
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any], tolerance: float) -> list[str]:
+    """
+    :return: descriptions of the metrics worse than the baseline by more than `tolerance`
+    """
+    regressions = []
+    if results["peak_rss"] > baseline["peak_rss"] * (1 + tolerance):
+        regressions.append(f"peak RSS {results['peak_rss']:,} > {baseline['peak_rss']:,} bytes")
+    for name, expected in baseline.items():
+        if name == "peak_rss" or expected["seconds"] < MIN_SECONDS or name not in results:
+            continue
+        for metric in ("rows_per_sec", "bytes_per_sec"):
+            value, expected_value = results[name].get(metric), expected.get(metric)
+            if value and expected_value and value < expected_value * (1 - tolerance):
+                regressions.append(f"{name} {metric} {value:,.0f} < {expected_value:,.0f}")
+    return regressions
+
+
+def print_results(results: dict[str, Any]) -> None:
+    print(f"{'stage / table':<32}{'seconds':>10}{'rows/s':>14}{'MB/s':>10}")
+    for name, metrics in results.items():
+        if name == "peak_rss":
+            continue
+        rows = f"{metrics['rows_per_sec']:,.0f}" if metrics["rows_per_sec"] else "-"
+        mb = f"{metrics['bytes_per_sec'] / 1e6:.1f}" if metrics.get("bytes_per_sec") else "-"
+        print(f"{name:<32}{metrics['seconds']:>10.2f}{rows:>14}{mb:>10}")
+    print(f"peak RSS: {results['peak_rss'] / 2**20:,.0f} MiB")
+
+
+def main() -> None:
+    cmd_line_parser = ArgumentParser()
+    cmd_line_parser.add_argument("--scale", type=float, default=5.0)
+    cmd_line_parser.add_argument("--workers", "-w", type=int, default=os.cpu_count() or 1)
+    cmd_line_parser.add_argument(
+        "--dburi", default=None, help="Also load into this database, its tables are replaced"
+    )
+    cmd_line_parser.add_argument("--baselines", type=Path, default=BASELINES_PATH)
+    cmd_line_parser.add_argument("--update-baseline", action="store_true")
+    cmd_line_parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = cmd_line_parser.parse_args()
+
+    cwd = Path.cwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)  # the parser writes errors.log into the working directory
+        try:
+            results = run(Path(tmp_dir), args.scale, args.workers, args.dburi)
+        finally:
+            os.chdir(cwd)
+    print_results(results)
+
+    key = f"scale={args.scale:g},workers={args.workers},load={bool(args.dburi)}"
+    baselines = json.loads(args.baselines.read_text()) if args.baselines.exists() else {}
+    if key in baselines and not args.update_baseline:
+        regressions = compare(results, baselines[key], args.tolerance)
+        if regressions:
+            print(f"Regressions against the '{key}' baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"No regressions against the '{key}' baseline")
+        return
+
+    baselines[key] = results
+    args.baselines.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+    print(f"Recorded the '{key}' baseline in {args.baselines}")
+
+
+if __name__ == "__main__":
+    main()
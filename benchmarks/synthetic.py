@@ -0,0 +1,342 @@
+"""
+Deterministic IMDb-shaped datasets for benchmarks and tests.
+
+    python -m benchmarks.synthetic --root ~/synthetic [--scale 10] [--seed 0] [--plain]
+
+Scale 1 is about 1/1000 of the real dumps (10.5k titles, 13.5k persons,
+60k principals, 40k alternative titles), scale 1000 is about their size.
+Title types, genres, professions and regions follow weighted choices like
+the real ones, persons are picked with a Zipf (1/rank) skew so a few of
+them have most of the principals, vote counts are Pareto distributed and
+some fields are \\N. Every file has its own random generator, so one file
+is the same whether the others are generated or not, and the .gz files
+have no timestamp: a seed always gives the same bytes.
+"""
+import gzip
+import math
+import random
+import sys
+from argparse import ArgumentParser
+from array import array
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Callable, Iterator, Sequence, TypeVar
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.utils import Config, get_config  # noqa: E402
+
+T = TypeVar("T")
+
+CONFIG_PATH = Path(__file__).resolve().parent.parent / "config" / "config.yml"
+TITLES_PER_SCALE = 10_500
+PERSONS_PER_SCALE = 13_500
+NULL = "\\N"
+
+TITLE_TYPES = {
+    "tvEpisode": 72,
+    "short": 9,
+    "movie": 7,
+    "video": 3,
+    "tvSeries": 2.5,
+    "tvMovie": 1.5,
+    "tvMiniSeries": 0.5,
+    "tvSpecial": 0.5,
+    "tvShort": 0.5,
+    "videoGame": 0.5,
+}
+GENRES = {
+    "Drama": 20, "Comedy": 15, "Documentary": 9, "Short": 9, "Talk-Show": 6, "Romance": 5,
+    "Family": 5, "News": 4, "Animation": 4, "Reality-TV": 4, "Music": 3, "Crime": 3,
+    "Action": 3, "Adventure": 2, "Game-Show": 2, "Adult": 2, "Sport": 1, "Fantasy": 1,
+    "Mystery": 1, "Horror": 1, "Thriller": 1, "History": 1, "Biography": 1, "Sci-Fi": 1,
+}
+PROFESSIONS = {
+    "actor": 25, "actress": 16, "miscellaneous": 10, "producer": 8, "writer": 7,
+    "camera_department": 5, "director": 5, "sound_department": 4, "editor": 4,
+    "composer": 3, "cinematographer": 3, "art_department": 3, "soundtrack": 2, "stunts": 2,
+}
+CATEGORIES = {
+    "actor": 26, "actress": 18, "self": 17, "writer": 8, "director": 7, "producer": 6,
+    "editor": 4, "composer": 3, "cinematographer": 3, "production_designer": 1,
+    "archive_footage": 1, "archive_sound": 1,
+}
+REGIONS = {
+    NULL: 12, "US": 14, "GB": 8, "DE": 8, "FR": 8, "IN": 7, "JP": 6, "ES": 6, "IT": 5,
+    "CA": 4, "BR": 4, "RU": 3, "PT": 3, "GR": 2, "HU": 2, "RO": 2, "XWW": 2, "SUHH": 1,
+}
+AKA_TYPES = {NULL: 40, "imdbDisplay": 45, "working": 5, "alternative": 5, "festival": 3, "dvd": 2}
+WORDS = (
+    "the love night man day last house life girl story time world blood dark city king war "
+    "dead lost black secret road home heart summer shadow dream fire journey return island "
+    "game river star family wild stranger angel ghost empire silence"
+).split()
+FIRST_NAMES = (
+    "John Mary James Anna Robert Maria Michael Elena David Sofia William Laura Richard Julia "
+    "Thomas Emma Charles Olga Daniel Yuki Pierre Ingrid Hans Giulia Carlos Aiko Raj Priya"
+).split()
+LAST_NAMES = (
+    "Smith Johnson Brown Garcia Miller Davis Martin Bernard Muller Schmidt Rossi Tanaka "
+    "Kumar Singh Ivanov Silva Santos Kowalski Nielsen Jansen Dubois Moreau Lopez Bergman"
+).split()
+
+
+class Weighted:
+    """
+    Weighted random choice among fixed values
+    """
+
+    def __init__(self, weights: dict[str, float]) -> None:
+        self.values = list(weights)
+        total = 0.0
+        self.cum_weights = []
+        for weight in weights.values():
+            total += weight
+            self.cum_weights.append(total)
+
+    def pick(self, rng: random.Random, k: int = 1) -> list[str]:
+        return rng.choices(self.values, cum_weights=self.cum_weights, k=k)
+
+
+def zipf_index(rng: random.Random, size: int) -> int:
+    """
+    Index in [0, size) with P(index) ~ 1 / (index + 1), in constant memory
+    """
+    return min(size - 1, int(math.exp(rng.random() * math.log(size + 1))) - 1)
+
+
+def geometric(rng: random.Random, mean: float) -> int:
+    """
+    Count >= 0 with the given mean, small counts are the most frequent
+    """
+    return int(math.log(1.0 - rng.random()) / math.log(mean / (mean + 1.0)))
+
+
+class SyntheticDatasets:
+    """
+    Generates the seven datasets of `dataset_paths`. Title and person ids
+    have random gaps like the real ones, they are kept in compact arrays
+    so memory only grows with 9 bytes per title and 8 per person.
+    """
+
+    def __init__(self, scale: float = 1.0, seed: int = 0) -> None:
+        self.seed = seed
+        rng = random.Random(seed)
+        self.title_ids = _make_ids(rng, max(1, round(TITLES_PER_SCALE * scale)))
+        self.person_ids = _make_ids(rng, max(1, round(PERSONS_PER_SCALE * scale)))
+        types = list(TITLE_TYPES)
+        picked = Weighted(TITLE_TYPES).pick(rng, len(self.title_ids))
+        self.title_types = array("b", (types.index(title_type) for title_type in picked))
+        series = types.index("tvSeries")
+        self.series_ids = array(
+            "q", (id_ for id_, type_ in zip(self.title_ids, self.title_types) if type_ == series)
+        )
+
+    def write(self, root: Path, config: Config, gzipped: bool = True) -> list[Path]:
+        """
+        :return: paths of the written files, '<dataset path>.gz' if gzipped
+        """
+        writers: dict[str, Callable[[random.Random], Iterator[Sequence[str]]]] = {
+            "film": self._title_basics,
+            "person": self._name_basics,
+            "principal": self._title_principals,
+            "alternative": self._title_akas,
+            "rating": self._title_ratings,
+            "crew": self._title_crew,
+            "episode": self._title_episode,
+        }
+        root.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for idx, (key, dataset_path) in enumerate(config["dataset_paths"].items()):
+            file_name = dataset_path.removesuffix(f".{config['dataset_file_ext']}")
+            path = root / (f"{file_name}.{config['dataset_file_ext']}" if gzipped else file_name)
+            with _open_output(path, gzipped) as output:
+                for row in writers[key](random.Random(f"{self.seed}:{idx}")):
+                    output.write("\t".join(row).encode())
+                    output.write(b"\n")
+            paths.append(path)
+        return paths
+
+    def _title_basics(self, rng: random.Random) -> Iterator[Sequence[str]]:
+        yield (
+            "tconst", "titleType", "primaryTitle", "originalTitle", "isAdult",
+            "startYear", "endYear", "runtimeMinutes", "genres",
+        )
+        genres = Weighted(GENRES)
+        types = list(TITLE_TYPES)
+        for title_id, type_idx in zip(self.title_ids, self.title_types):
+            title_type = types[type_idx]
+            title = _make_title(rng)
+            start_year = NULL if rng.random() < 0.1 else str(min(2025, 2026 - geometric(rng, 25)))
+            end_year = NULL
+            ended = title_type in ("tvSeries", "tvMiniSeries") and rng.random() < 0.5
+            if ended and start_year != NULL:
+                end_year = str(min(2025, int(start_year) + geometric(rng, 4)))
+            runtime = NULL if rng.random() < 0.6 else str(1 + geometric(rng, 40))
+            title_genres = NULL
+            if rng.random() >= 0.05:
+                title_genres = ",".join(sorted(set(genres.pick(rng, 1 + rng.randrange(3)))))
+            yield (
+                _tconst(title_id),
+                title_type,
+                title,
+                title if rng.random() < 0.9 else _make_title(rng),
+                "1" if rng.random() < 0.02 else "0",
+                start_year,
+                end_year,
+                runtime,
+                title_genres,
+            )
+
+    def _name_basics(self, rng: random.Random) -> Iterator[Sequence[str]]:
+        yield (
+            "nconst", "primaryName", "birthYear", "deathYear", "primaryProfession", "knownForTitles"
+        )
+        professions = Weighted(PROFESSIONS)
+        for person_id in self.person_ids:
+            birth_year = NULL if rng.random() < 0.9 else str(1850 + rng.randrange(160))
+            death_year = NULL
+            if birth_year != NULL and rng.random() < 0.4:
+                death_year = str(min(2025, int(birth_year) + 20 + rng.randrange(80)))
+            known_for = {self._pick_title(rng) for _ in range(rng.randrange(5))}
+            yield (
+                _nconst(person_id),
+                f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                birth_year,
+                death_year,
+                ",".join(dict.fromkeys(professions.pick(rng, rng.randrange(4)))),
+                ",".join(map(_tconst, sorted(known_for))) or NULL,
+            )
+
+    def _title_principals(self, rng: random.Random) -> Iterator[Sequence[str]]:
+        yield ("tconst", "ordering", "nconst", "category", "job", "characters")
+        categories = Weighted(CATEGORIES)
+        episode = list(TITLE_TYPES).index("tvEpisode")
+        for title_id, type_idx in zip(self.title_ids, self.title_types):
+            count = geometric(rng, 3.5 if type_idx == episode else 12.0)
+            for ordering in range(1, count + 1):
+                category = categories.pick(rng)[0]
+                acting = category in ("actor", "actress", "self")
+                yield (
+                    _tconst(title_id),
+                    str(ordering),
+                    _nconst(self.person_ids[zipf_index(rng, len(self.person_ids))]),
+                    category,
+                    NULL if acting or rng.random() < 0.7 else category.replace("_", " "),
+                    f'["{rng.choice(FIRST_NAMES)}"]' if acting and rng.random() < 0.8 else NULL,
+                )
+
+    def _title_akas(self, rng: random.Random) -> Iterator[Sequence[str]]:
+        yield (
+            "titleId", "ordering", "title", "region", "language", "types", "attributes",
+            "isOriginalTitle",
+        )
+        regions, aka_types = Weighted(REGIONS), Weighted(AKA_TYPES)
+        episode = list(TITLE_TYPES).index("tvEpisode")
+        for title_id, type_idx in zip(self.title_ids, self.title_types):
+            count = geometric(rng, 1.5 if type_idx == episode else 12.0)
+            for ordering in range(1, count + 1):
+                original = ordering == count
+                yield (
+                    _tconst(title_id),
+                    str(ordering),
+                    _make_title(rng),
+                    NULL if original else regions.pick(rng)[0],
+                    NULL if original or rng.random() < 0.85 else "en",
+                    "original" if original else aka_types.pick(rng)[0],
+                    NULL if rng.random() < 0.97 else "literal title",
+                    "1" if original else "0",
+                )
+
+    def _title_ratings(self, rng: random.Random) -> Iterator[Sequence[str]]:
+        yield ("tconst", "averageRating", "numVotes")
+        episode = list(TITLE_TYPES).index("tvEpisode")
+        for title_id, type_idx in zip(self.title_ids, self.title_types):
+            if rng.random() < (0.1 if type_idx == episode else 0.3):
+                rating = min(10.0, max(1.0, rng.gauss(6.8, 1.3)))
+                votes = int(rng.paretovariate(1.1) * 5)
+                yield _tconst(title_id), f"{rating:.1f}", str(votes)
+
+    def _title_crew(self, rng: random.Random) -> Iterator[Sequence[str]]:
+        yield ("tconst", "directors", "writers")
+        for title_id in self.title_ids:
+            directors = {self._pick_person(rng) for _ in range(geometric(rng, 1.0))}
+            writers = {self._pick_person(rng) for _ in range(geometric(rng, 1.2))}
+            yield (
+                _tconst(title_id),
+                ",".join(map(_nconst, sorted(directors))) or NULL,
+                ",".join(map(_nconst, sorted(writers))) or NULL,
+            )
+
+    def _title_episode(self, rng: random.Random) -> Iterator[Sequence[str]]:
+        yield ("tconst", "parentTconst", "seasonNumber", "episodeNumber")
+        if not self.series_ids:
+            return
+        episode = list(TITLE_TYPES).index("tvEpisode")
+        for title_id, type_idx in zip(self.title_ids, self.title_types):
+            if type_idx != episode:
+                continue
+            numbered = rng.random() < 0.8
+            yield (
+                _tconst(title_id),
+                _tconst(self.series_ids[zipf_index(rng, len(self.series_ids))]),
+                str(1 + geometric(rng, 2)) if numbered else NULL,
+                str(1 + rng.randrange(30)) if numbered else NULL,
+            )
+
+    def _pick_title(self, rng: random.Random) -> int:
+        return self.title_ids[zipf_index(rng, len(self.title_ids))]
+
+    def _pick_person(self, rng: random.Random) -> int:
+        return self.person_ids[zipf_index(rng, len(self.person_ids))]
+
+
+def _make_ids(rng: random.Random, count: int) -> array:
+    ids = array("q")
+    id_ = 0
+    for _ in range(count):
+        id_ += 1 + geometric(rng, 0.3)
+        ids.append(id_)
+    return ids
+
+
+def _make_title(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(1 + geometric(rng, 1.5))).capitalize()
+
+
+def _tconst(title_id: int) -> str:
+    return f"tt{title_id:07d}"
+
+
+def _nconst(person_id: int) -> str:
+    return f"nm{person_id:07d}"
+
+
+@contextmanager
+def _open_output(path: Path, gzipped: bool) -> Iterator[IO[bytes]]:
+    with open(path, "wb") as raw:
+        if not gzipped:
+            yield raw
+            return
+        # no file name and timestamp in the header, the output only depends on the seed
+        with gzip.GzipFile(filename="", mode="wb", fileobj=raw, compresslevel=6, mtime=0) as output:
+            yield output
+
+
+def main() -> None:
+    cmd_line_parser = ArgumentParser()
+    cmd_line_parser.add_argument("--root", "-r", type=Path, required=True)
+    cmd_line_parser.add_argument("--scale", type=float, default=1.0)
+    cmd_line_parser.add_argument("--seed", type=int, default=0)
+    cmd_line_parser.add_argument(
+        "--plain", action="store_true", help="Write .tsv files instead of .tsv.gz"
+    )
+    args = cmd_line_parser.parse_args()
+
+    datasets = SyntheticDatasets(args.scale, args.seed)
+    for path in datasets.write(args.root, get_config(CONFIG_PATH), gzipped=not args.plain):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@ from argparse import ArgumentParser
 from pathlib import Path
 from typing import cast
 
+from src.progress import REPORT_FILENAME, RunReport
 from src.types import CommandArgs
 from src.utils import get_config, get_data_sets, get_links
 
@@ -9,6 +10,8 @@ CONFIG = get_config(Path.cwd() / "config" / "config.yml")
 
 
 def main(cmd_args: CommandArgs) -> None:
+    report = RunReport()
+
     if cmd_args.download or cmd_args.extract:
         import urllib.request
 
@@ -21,7 +24,7 @@ def main(cmd_args: CommandArgs) -> None:
             urls=get_links(imdb_page_content, CONFIG), root=Path(cmd_args.root)
         )
 
-        handler = DataSetsHandler(data_sets)
+        handler = DataSetsHandler(data_sets, report=report)
 
         if cmd_args.download:
             handler.download()
@@ -29,18 +32,44 @@ def main(cmd_args: CommandArgs) -> None:
         if cmd_args.extract:
             handler.extract()
 
-    if cmd_args.parse:
+    if cmd_args.stream:
+        # parsed rows are copied into the database while parsing, no csv files in between
+        from src.dataset_loader import DatasetLoader
+        from src.dataset_parser import DatasetParser
+
+        loader = DatasetLoader(cmd_args, config=CONFIG, report=report)
+        loader.db_init()
+        loader.clean_up()
+        parser = DatasetParser(cmd_args, config=CONFIG, report=report)
+        parser.parse_dataset()
+        loader.bump_generation()
+
+    if cmd_args.parse and not cmd_args.stream:
         from src.dataset_parser import DatasetParser
 
-        parser = DatasetParser(cmd_args, config=CONFIG)
+        parser = DatasetParser(cmd_args, config=CONFIG, report=report)
         parser.parse_dataset()
 
-    if cmd_args.load:
+    if cmd_args.load and not cmd_args.stream:
         from src.dataset_loader import DatasetLoader
 
-        loader = DatasetLoader(cmd_args, config=CONFIG)
+        loader = DatasetLoader(cmd_args, config=CONFIG, report=report)
         loader.db_init()
-        loader.load_dataset()
+        if cmd_args.delta:
+            loader.load_delta()
+        else:
+            loader.load_dataset()
+
+    if cmd_args.rollback:
+        from src.dataset_loader import DatasetLoader
+
+        loader = DatasetLoader(cmd_args, config=CONFIG, report=report)
+        loader.db_init()
+        loader.rollback()
+
+    report.write(Path(cmd_args.root) / REPORT_FILENAME)
+    if not cmd_args.quiet:
+        print(report.summary())
 
 
 if __name__ == "__main__":
@@ -64,9 +93,102 @@ if __name__ == "__main__":
         default=None,
         help="Start parsing not from first table",
     )
+    cmd_line_parser.add_argument(
+        "--gzipped",
+        "-z",
+        action="store_true",
+        help="Parse the downloaded .gz files directly, --extract is not needed",
+    )
+    cmd_line_parser.add_argument(
+        "--workers",
+        "-w",
+        type=int,
+        default=1,
+        help="Parse every dataset in byte range shards using WORKERS processes",
+    )
+    cmd_line_parser.add_argument(
+        "--format",
+        "-f",
+        dest="output_format",
+        choices=["csv", "binary", "parquet"],
+        default="csv",
+        help="Format of the parsed chunk files, binary ones are loaded with COPY (FORMAT binary), "
+        "parquet ones are for analytics and can't be loaded",
+    )
+    cmd_line_parser.add_argument(
+        "--stream",
+        "-s",
+        action="store_true",
+        help="With --parse and --load, COPY parsed rows straight into the database",
+    )
+    cmd_line_parser.add_argument(
+        "--delta",
+        action="store_true",
+        help="Diff the parsed datasets against the previously loaded ones and load only the changes",
+    )
+    cmd_line_parser.add_argument(
+        "--bulk",
+        "-b",
+        action="store_true",
+        help="Load into UNLOGGED tables without indexes and foreign keys, "
+        "then build them in parallel and make the tables LOGGED",
+    )
+    cmd_line_parser.add_argument(
+        "--swap",
+        action="store_true",
+        help="Load into a shadow schema while the live tables stay readable, "
+        "then swap it in, keeping the previous tables for --rollback",
+    )
+    cmd_line_parser.add_argument(
+        "--rollback",
+        action="store_true",
+        help="Swap back the tables replaced by the last --swap",
+    )
+    cmd_line_parser.add_argument(
+        "--partitions",
+        type=int,
+        default=None,
+        help="Range partition principal and person_film by film_id into PARTITIONS tables, "
+        "parsed into and loaded from separate chunk files",
+    )
+    cmd_line_parser.add_argument(
+        "--memory-limit",
+        type=int,
+        default=None,
+        help="Keep the state of --parse within about MEMORY_LIMIT MiB, "
+        "spilling person_film, genre/profession mappings and errors to disk",
+    )
+    cmd_line_parser.add_argument(
+        "--checkpoint",
+        "-c",
+        action="store_true",
+        help="Resume an interrupted --parse/--load from the last parsed table and loaded chunk",
+    )
     cmd_line_parser.add_argument("--debug", "-dd", action="store_true")
     cmd_line_parser.add_argument("--quiet", "-q", action="store_true")
     args = cast(CommandArgs, cmd_line_parser.parse_args())
+    if args.stream and not (args.parse and args.load):
+        cmd_line_parser.error("--stream requires --parse and --load")
+    if args.output_format == "parquet" and args.load:
+        cmd_line_parser.error("parquet files can't be loaded, parse them without --load")
+    if args.delta and (args.stream or args.resume or args.output_format != "csv"):
+        cmd_line_parser.error("--delta works on csv files only, without --stream and --resume")
+    if args.bulk and (args.stream or args.checkpoint or args.resume):
+        cmd_line_parser.error(
+            "--bulk recreates all tables, it can't be combined with --stream, --checkpoint or --resume"
+        )
+    if args.swap and (args.stream or args.delta or args.resume):
+        cmd_line_parser.error("--swap can't be combined with --stream, --delta or --resume")
+    if args.rollback and args.load:
+        cmd_line_parser.error("--rollback can't be combined with --load")
+    if args.checkpoint and (args.stream or args.delta):
+        cmd_line_parser.error("--checkpoint can't be combined with --stream or --delta")
+    if args.partitions and args.stream:
+        cmd_line_parser.error("--partitions can't be combined with --stream")
+    if args.memory_limit is not None and args.memory_limit <= 0:
+        cmd_line_parser.error("--memory-limit must be a positive number of MiB")
+    if args.stream and args.resume:
+        cmd_line_parser.error("--stream can't be combined with --resume")
     main(args)
 
 # TODO: implement click for better cli experience
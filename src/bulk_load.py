@@ -0,0 +1,76 @@
+from typing import Any, Optional
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from src import models
+
+MAINTENANCE_WORK_MEM = "512MB"  # per index build, several run at once
+
+DIALECT = postgresql.dialect()
+
+
+def get_bulk_tables() -> list[Any]:
+    """
+    Tables written by the loader, parents first
+    """
+    return [
+        table
+        for table in models.db.metadata.sorted_tables
+        if table not in (models.LoadCheckpoint, models.DataGeneration)
+    ]
+
+
+def create_unlogged_table(table: Any) -> list[str]:
+    """
+    Create a table UNLOGGED without foreign keys, primary key and indexes,
+    so COPY neither writes WAL nor maintains any of them. The primary key is
+    dropped after creating the table to keep the SERIAL default of its id.
+    """
+    create = str(CreateTable(table, include_foreign_key_constraints=[]).compile(dialect=DIALECT)).strip()
+    statements = [create.replace("CREATE TABLE", "CREATE UNLOGGED TABLE", 1)]
+    if table.primary_key.columns:
+        statements.append(f"ALTER TABLE {table.name} DROP CONSTRAINT {table.name}_pkey")
+    return statements
+
+
+def create_index(index: Any, if_not_exists: bool = False) -> str:
+    statement = str(CreateIndex(index).compile(dialect=DIALECT))
+    if if_not_exists:
+        statement = statement.replace("CREATE INDEX", "CREATE INDEX IF NOT EXISTS", 1)
+    return statement
+
+
+def index_statements(table: Any) -> list[str]:
+    """
+    Primary key and indexes of a table, independent of all other tables
+    """
+    statements = [create_index(index) for index in table.indexes]
+    if table.primary_key.columns:
+        columns = ", ".join(column.name for column in table.primary_key.columns)
+        statements.insert(0, f"ALTER TABLE {table.name} ADD PRIMARY KEY ({columns})")
+    return statements
+
+
+def foreign_key_statements(table: Any, partitioned: bool = False) -> list[tuple[Optional[str], str]]:
+    """
+    Foreign keys of a table as pairs of statements: adding one NOT VALID
+    only touches the catalog, validating it scans the table but doesn't
+    block validating the other ones at the same time. Partitioned tables
+    don't support NOT VALID, their foreign keys are validated when added
+    by the second statement.
+    """
+    statements = []
+    for constraint in table.foreign_key_constraints:
+        columns = [element.parent.name for element in constraint.elements]
+        referred = [element.column.name for element in constraint.elements]
+        name = f"{table.name}_{'_'.join(columns)}_fkey"  # the name PostgreSQL gives it
+        add = (
+            f"ALTER TABLE {table.name} ADD CONSTRAINT {name} FOREIGN KEY ({', '.join(columns)}) "
+            f"REFERENCES {constraint.referred_table.name} ({', '.join(referred)})"
+        )
+        if partitioned:
+            statements.append((None, add))
+        else:
+            statements.append((f"{add} NOT VALID", f"ALTER TABLE {table.name} VALIDATE CONSTRAINT {name}"))
+    return statements
@@ -0,0 +1,102 @@
+import os
+import tempfile
+from array import array
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from src.edge_store import ID_BITS, ID_MASK, read_run
+
+ROW_SIZE = 6  # bytes of a (category id, entity id) row in the arrays
+
+
+class CategoryMapping:
+    """
+    Many-to-many mapping between dictionary encoded categories (genres,
+    professions) and entity ids, kept in two parallel typed arrays.
+    Category ids are assigned from 0 in the order categories are first seen.
+    With a `buffer_limit` the rows are appended to a run file in `spill_dir`
+    whenever the arrays exceed it, `rows` reads the runs back in order.
+    :param categories: ids of a previous run to keep, they must be 0..n-1
+    """
+
+    def __init__(
+        self,
+        categories: Optional[dict[str, int]] = None,
+        spill_dir: Optional[Path] = None,
+        name: str = "mapping",
+        buffer_limit: int = 0,
+    ) -> None:
+        self.categories: dict[str, int] = dict(categories or {})
+        self.category_ids = array("H")
+        self.entity_ids = array("i")
+        self.spill_dir = spill_dir
+        self.name = name
+        self.buffer_limit = buffer_limit
+        self._runs: list[Path] = []
+        self._spilled = 0
+
+    def add(self, category: str, entity_id: int) -> None:
+        self.category_ids.append(self.get_id(category))
+        self.entity_ids.append(entity_id)
+        if self.buffer_limit and len(self.entity_ids) * ROW_SIZE >= self.buffer_limit:
+            self._spill()
+
+    def add_all(self, categories: Iterable[str], entity_id: int) -> None:
+        for category in categories:
+            self.add(category, entity_id)
+
+    def get_id(self, category: str) -> int:
+        category_id = self.categories.get(category)
+        if category_id is None:
+            category_id = self.categories[category] = len(self.categories)
+        return category_id
+
+    def merge(self, other: "CategoryMapping") -> None:
+        """
+        Append the rows of another mapping, re-encoding its category ids
+        """
+        remap = [self.get_id(category) for category in other.categories]
+        if other._runs:
+            for category_id, entity_id in other.rows():
+                self.category_ids.append(remap[category_id])
+                self.entity_ids.append(entity_id)
+        else:
+            self.category_ids.extend(remap[category_id] for category_id in other.category_ids)
+            self.entity_ids.extend(other.entity_ids)
+        if self.buffer_limit and len(self.entity_ids) * ROW_SIZE >= self.buffer_limit:
+            self._spill()
+
+    def table_rows(self) -> Iterator[tuple[int, str]]:
+        for category, category_id in self.categories.items():
+            yield category_id, category
+
+    def rows(self) -> Iterator[tuple[int, int]]:
+        for run in self._runs:
+            for row in read_run(run):
+                yield row >> ID_BITS, row & ID_MASK
+        yield from zip(self.category_ids, self.entity_ids)
+
+    def __len__(self) -> int:
+        return self._spilled + len(self.entity_ids)
+
+    def clear(self) -> None:
+        self.categories = {}
+        self.category_ids = array("H")
+        self.entity_ids = array("i")
+        for run in self._runs:
+            run.unlink(missing_ok=True)
+        self._runs = []
+        self._spilled = 0
+
+    def _spill(self) -> None:
+        if self.spill_dir is None:
+            raise ValueError("CategoryMapping with a buffer_limit needs a spill_dir")
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        fd, run_path = tempfile.mkstemp(dir=self.spill_dir, prefix=f"{self.name}.", suffix=".run")
+        with os.fdopen(fd, "wb") as run_file:
+            rows = zip(self.category_ids, self.entity_ids)
+            array("q", (category_id << ID_BITS | entity_id for category_id, entity_id in rows)).tofile(run_file)
+        self._runs.append(Path(run_path))
+        self._spilled += len(self.entity_ids)
+        self.category_ids = array("H")
+        self.entity_ids = array("i")
@@ -0,0 +1,104 @@
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Optional
+
+from src.table_sink import ChunkInfo
+
+MANIFEST_FILENAME = "checkpoint.json"
+STATE_DIR = ".checkpoint"
+
+
+class Checkpoint:
+    """
+    Durable manifest of a run: for every dataset whether it is parsed and
+    the chunk files it produced (rows, size, crc32, loaded). It is rewritten
+    atomically after every change, so an interrupted run resumes from the
+    last finished dataset (parse) or chunk (load).
+    The parser state needed by later datasets (job ids, categories,
+    person_film runs) is kept in `state`, film/person ids in STATE_DIR.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.path = root / MANIFEST_FILENAME
+        self.state_dir = root / STATE_DIR
+        self.datasets: dict[str, dict[str, Any]] = {}
+        self.state: dict[str, Any] = {}
+
+    @classmethod
+    def load(cls, root: Path) -> "Checkpoint":
+        checkpoint = cls(root)
+        if checkpoint.path.exists():
+            with open(checkpoint.path) as manifest_file:
+                manifest = json.load(manifest_file)
+            checkpoint.datasets = manifest["datasets"]
+            checkpoint.state = manifest["state"]
+        return checkpoint
+
+    def reset(self) -> None:
+        self.datasets = {}
+        self.state = {}
+        shutil.rmtree(self.state_dir, ignore_errors=True)
+        self.save()
+
+    def save(self) -> None:
+        tmp_path = self.path.with_name(f"{self.path.name}.tmp")
+        with open(tmp_path, "w") as manifest_file:
+            json.dump({"datasets": self.datasets, "state": self.state}, manifest_file, indent=2)
+            manifest_file.flush()
+            os.fsync(manifest_file.fileno())
+        os.replace(tmp_path, self.path)
+
+    def record_chunks(self, dataset: str, chunks: list[ChunkInfo]) -> None:
+        entry = self.datasets.setdefault(dataset, {"parsed": False, "chunks": {}})
+        for chunk in chunks:
+            entry["chunks"][self.chunk_name(chunk.path)] = {
+                "rows": chunk.rows,
+                "size": chunk.size,
+                "checksum": chunk.checksum,
+                "loaded": False,
+            }
+
+    def mark_parsed(self, *datasets: str) -> None:
+        for dataset in datasets:
+            self.datasets.setdefault(dataset, {"parsed": False, "chunks": {}})["parsed"] = True
+        self.save()
+
+    def forget(self, *datasets: str) -> None:
+        for dataset in datasets:
+            self.datasets.pop(dataset, None)
+
+    def is_parsed(self, dataset: str) -> bool:
+        """
+        Dataset parsed and all its chunk files still as they were written
+        """
+        entry = self.datasets.get(dataset)
+        if entry is None or not entry["parsed"]:
+            return False
+        for name, chunk in entry["chunks"].items():
+            path = self.root / name
+            if not path.exists() or path.stat().st_size != chunk["size"]:
+                return False
+        return True
+
+    def get_chunk(self, path: Path) -> Optional[dict[str, Any]]:
+        name = self.chunk_name(path)
+        for entry in self.datasets.values():
+            if name in entry["chunks"]:
+                return entry["chunks"][name]
+        return None
+
+    def mark_loaded(self, path: Path) -> None:
+        chunk = self.get_chunk(path)
+        if chunk is not None:
+            chunk["loaded"] = True
+            self.save()
+
+    def state_path(self, name: str) -> Path:
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        return self.state_dir / name
+
+    def chunk_name(self, path: Path) -> str:
+        return str(Path(path).relative_to(self.root))
@@ -1,55 +1,159 @@
 import gzip
+import json
 import os
-import shutil
+import time
+from functools import partial
 from multiprocessing import Pool, cpu_count
-from os.path import exists
-from typing import List
+from multiprocessing.pool import ThreadPool
+from os.path import exists, getsize
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple, cast
 
 import requests
-from rich.progress import track
 from tqdm.auto import tqdm
 
+from src.progress import RunReport
 from src.utils import DataSet
 
 
+DOWNLOAD_CONNECTIONS = 4  # datasets downloaded at once
+DOWNLOAD_BLOCK_SIZE = 1 << 20
+DOWNLOAD_TIMEOUT = 60  # seconds without any data before a download fails
+EXTRACT_BLOCK_SIZE = 1 << 22  # 4 MiB of extracted data per write
+EXTRACT_SIZE_PER_PROCESS = 1 << 26  # 64 MiB of compressed input keep a process busy
+
+
 class DataSetsHandler:
-    def __init__(self, data_sets: List[DataSet]) -> None:
+    def __init__(
+        self,
+        data_sets: List[DataSet],
+        report: Optional[RunReport] = None,
+        connections: int = DOWNLOAD_CONNECTIONS,
+    ) -> None:
         self.data_sets = data_sets
+        self.report = report or RunReport()
+        self.connections = connections
 
     def download(self):
+        """
+        Download the datasets over at most `connections` connections at once,
+        unchanged ones are skipped and interrupted ones resumed
+        """
         print("Downloading ...")
-        for item in self.data_sets:
-            self._download_file(data_set=item)
+        threads = max(1, min(self.connections, len(self.data_sets)))
+        with self.report.stage("download") as stage, ThreadPool(threads) as pool:
+            results = pool.starmap(self._download_file, enumerate(self.data_sets))
+            for data_set, (downloaded, seconds) in zip(self.data_sets, results):
+                metrics = stage.dataset(data_set.gzipped.name)
+                metrics.bytes += downloaded
+                metrics.seconds += seconds
 
     @staticmethod
-    def _download_file(data_set: DataSet) -> None:
-        with requests.get(data_set.url, stream=True) as r:
-            total_length = int(r.headers.get("Content-Length") or "-1")
+    def _download_file(position: int, data_set: DataSet) -> Tuple[int, float]:
+        """
+        Download into '<gzipped>.part', renamed to `gzipped` once complete.
+        The ETag/Last-Modified of the response are kept in
+        '<gzipped>.download.json': a complete file is only downloaded again
+        if the server has a different one, a partial one is resumed with a
+        Range request if the server still has the same.
+        :return: bytes downloaded and seconds spent
+        """
+        started = time.perf_counter()
+        state = _load_download_state(data_set)
+        part = _get_part_path(data_set)
+        validator = state.get("etag") or state.get("last_modified")
+        headers = {}
+        offset = 0
+        if not state.get("complete") and part.exists() and validator:
+            offset = getsize(part)
+            headers.update({"Range": f"bytes={offset}-", "If-Range": validator})
+        elif state.get("complete") and exists(data_set.gzipped):
+            if state.get("etag"):
+                headers["If-None-Match"] = state["etag"]
+            if state.get("last_modified"):
+                headers["If-Modified-Since"] = state["last_modified"]
 
-            if total_length < 0:
-                raise RuntimeError("Negative Content Length")
+        with requests.get(data_set.url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as r:
+            if r.status_code == 304:
+                print(f"'{data_set.gzipped.name}' is unchanged, skipping")
+                return 0, time.perf_counter() - started
+            r.raise_for_status()
+            if r.status_code == 206:
+                if not r.headers.get("Content-Range", "").startswith(f"bytes {offset}-"):
+                    raise RuntimeError(f"Unexpected Content-Range for '{data_set.url}'")
+            else:
+                # no partial file, or it is of another version than the one served now
+                offset = 0
+                state = {
+                    "etag": r.headers.get("ETag"),
+                    "last_modified": r.headers.get("Last-Modified"),
+                    "complete": False,
+                }
+                _save_download_state(data_set, state)
 
-            with tqdm.wrapattr(
-                r.raw,
-                "read",
-                total=total_length,
+            length = r.headers.get("Content-Length")
+            total = offset + int(length) if length is not None else None
+            downloaded = 0
+            with tqdm(
+                total=total,
+                initial=offset,
+                unit="B",
+                unit_scale=True,
+                position=position,
                 desc=f"{data_set.url} -> {data_set.gzipped} ...",
-            ) as raw:
-                with open(data_set.gzipped, "wb") as output:
-                    shutil.copyfileobj(raw, output)
+            ) as progress_bar, open(part, "ab" if offset else "wb") as output:
+                for block in r.raw.stream(DOWNLOAD_BLOCK_SIZE, decode_content=False):
+                    output.write(block)
+                    downloaded += len(block)
+                    progress_bar.update(len(block))
+
+        if total is not None and getsize(part) != total:
+            raise RuntimeError(f"Download of '{data_set.url}' is incomplete, run it again to resume")
+        part.replace(data_set.gzipped)
+        state["complete"] = True
+        _save_download_state(data_set, state)
+        return downloaded, time.perf_counter() - started
 
     def extract(self) -> None:
+        """
+        Extract the datasets in parallel, biggest first, with one process
+        per EXTRACT_SIZE_PER_PROCESS of compressed input but no more than
+        files or CPUs. CPUs left over go to the threaded inflate of isal.
+        """
         print("Extracting ...")
-        with Pool(cpu_count()) as pool:
-            pool.map(self._extract_file, self.data_sets)
+        data_sets = sorted(self.data_sets, key=lambda data_set: getsize(data_set.gzipped), reverse=True)
+        total_size = sum(getsize(data_set.gzipped) for data_set in data_sets)
+        processes = max(1, min(cpu_count(), len(data_sets), -(-total_size // EXTRACT_SIZE_PER_PROCESS)))
+        threads = cpu_count() // processes
+        with self.report.stage("extract") as stage, Pool(processes) as pool:
+            seconds = pool.starmap(
+                partial(self._extract_file, threads=threads), enumerate(data_sets), chunksize=1
+            )
+            for data_set, extract_seconds in zip(data_sets, seconds):
+                metrics = stage.dataset(data_set.extracted.name)
+                metrics.bytes += getsize(data_set.gzipped)
+                metrics.seconds += extract_seconds
 
     @staticmethod
-    def _extract_file(data_set: DataSet) -> None:
-        print(f"{data_set.gzipped} -> {data_set.extracted} ...")
-        with gzip.open(data_set.gzipped) as zf:
-            with open(data_set.extracted, "w") as f:
-                for line in track(zf, description="[green]Extracting dataset ..."):
-                    f.write(line.decode())
+    def _extract_file(position: int, data_set: DataSet, threads: int = 1) -> float:
+        """
+        Inflate a dataset in EXTRACT_BLOCK_SIZE blocks, progress is the
+        share of the compressed file read so far
+        """
+        started = time.perf_counter()
+        with open(data_set.gzipped, "rb") as raw, _open_gzip(raw, threads) as zf, open(
+            data_set.extracted, "wb"
+        ) as f, tqdm(
+            total=getsize(data_set.gzipped),
+            unit="B",
+            unit_scale=True,
+            position=position,
+            desc=f"{data_set.gzipped} -> {data_set.extracted} ...",
+        ) as progress_bar:
+            while block := zf.read(EXTRACT_BLOCK_SIZE):
+                f.write(block)
+                progress_bar.update(raw.tell() - progress_bar.n)
+        return time.perf_counter() - started
 
     def cleanup(self) -> None:
         for data_set in self.data_sets:
@@ -58,3 +162,43 @@ class DataSetsHandler:
 
             if exists(data_set.extracted):
                 os.remove(data_set.extracted)
+
+            for path in (_get_part_path(data_set), _get_download_state_path(data_set)):
+                if exists(path):
+                    os.remove(path)
+
+
+def _open_gzip(raw: BinaryIO, threads: int = 1) -> BinaryIO:
+    """
+    Reader of a gzip stream using the optional `isal` package when it is
+    installed: its inflate is several times faster than zlib's, and with
+    more than one thread reading and inflating run in the background
+    """
+    try:
+        from isal import igzip, igzip_threaded
+    except ImportError:
+        return cast(BinaryIO, gzip.GzipFile(fileobj=raw))
+    if threads > 1:
+        return cast(BinaryIO, igzip_threaded.open(raw, "rb", threads=threads))
+    return cast(BinaryIO, igzip.IGzipFile(fileobj=raw))
+
+
+def _get_part_path(data_set: DataSet) -> Path:
+    return data_set.gzipped.with_name(f"{data_set.gzipped.name}.part")
+
+
+def _get_download_state_path(data_set: DataSet) -> Path:
+    return data_set.gzipped.with_name(f"{data_set.gzipped.name}.download.json")
+
+
+def _load_download_state(data_set: DataSet) -> Dict[str, Any]:
+    path = _get_download_state_path(data_set)
+    if not exists(path):
+        return {}
+    with open(path) as state_file:
+        return json.load(state_file)
+
+
+def _save_download_state(data_set: DataSet, state: Dict[str, Any]) -> None:
+    with open(_get_download_state_path(data_set), "w") as state_file:
+        json.dump(state, state_file)
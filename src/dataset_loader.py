@@ -1,12 +1,35 @@
+import queue
+import time
 from functools import partial
 from glob import glob
 from multiprocessing import Pool, cpu_count
+from multiprocessing.pool import ThreadPool
+from os.path import getsize
 from pathlib import Path
-from typing import List, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 
 import src.models as models
+from src.bulk_load import (
+    MAINTENANCE_WORK_MEM,
+    create_index,
+    create_unlogged_table,
+    foreign_key_statements,
+    get_bulk_tables,
+    index_statements,
+)
+from src.checkpoint import Checkpoint
+from src.delta import DELTA_TABLES, DeltaState, DeltaTable
+from src.partitioning import PARTITIONED_TABLES, Partitioning, get_chunk_table
+from src.pgcopy import PGCOPY_EXTENSION
+from src.progress import RunReport, StageMetrics
 from src.utils import Config
 
+COPY_STREAMS = cpu_count()  # loader processes, each running one COPY at a time
+LIVE_SCHEMA = "public"  # schema the GraphQL app reads
+SHADOW_SCHEMA = "imdb_shadow"  # loaded by --swap, then swapped in
+PREVIOUS_SCHEMA = "imdb_previous"  # generation swapped out, for --rollback
+SWAP_LOCK_TIMEOUT = "30s"  # max wait for readers of the live tables before a swap gives up
+
 
 def get_table_object(table):
     """
@@ -23,12 +46,17 @@ def get_table_object(table):
 
 
 class DatasetLoader:
-    def __init__(self, cmd_args, config: Config):
+    def __init__(self, cmd_args, config: Config, report: Optional[RunReport] = None):
         self.root = Path(cmd_args.root)
+        self.report = report or RunReport()
         self.db_uri = cmd_args.dburi
         self.resume = cmd_args.resume
         self.debug = cmd_args.debug
         self.quiet = cmd_args.quiet
+        self.resume_checkpoint = getattr(cmd_args, "checkpoint", None) or False
+        self.bulk = getattr(cmd_args, "bulk", None) or False
+        self.swap = getattr(cmd_args, "swap", None) or False
+        self.schema = SHADOW_SCHEMA if self.swap else None
 
         self.delimiter = config["dataset_delimiter"]
 
@@ -41,52 +69,454 @@ class DatasetLoader:
         self.engine = None
         self.connection = None
         self.metadata = None
+        self.checkpoint = Checkpoint.load(self.root)
+        self.partitioning = Partitioning.load(self.root)
+        self.loaded_chunks: Dict[str, Optional[int]] = {}
 
     def db_init(self):
-        self.engine = models.db.create_engine(self.db_uri)
+        if self.swap:
+            self._prepare_shadow_schema()
+        self.engine = _create_engine(self.db_uri, self.schema)
         self.connection = self.engine.raw_connection()
         self.metadata = models.db.metadata
         self.metadata.create_all(bind=self.engine)
-        self.metadata.reflect(bind=self.engine)
+        # indexes added to the models later aren't created by create_all for existing tables
+        for table in get_bulk_tables():
+            for index in table.indexes:
+                self.engine.execute(create_index(index, if_not_exists=True))
+        # only the model tables, partitions would end up in the metadata otherwise
+        self.metadata.reflect(bind=self.engine, only=list(self.metadata.tables))
 
     def load_dataset(self):
-        self.clean_up()
-        self._copy_table(models.JobModel.__tablename__)
-        for table_name, _ in self.dataset_paths:
-            self._copy_table(table_name)
-        self._copy_table(models.PersonFilm.name)
-        self._copy_table(models.ProfessionModel.__tablename__)
-        self._copy_table(models.ProfessionPerson.name)
-        self._copy_table(models.GenreModel.__tablename__)
-        self._copy_table(models.GenreFilm.name)
+        DeltaState(self.root).invalidate()
+        with self.report.stage("load") as stage:
+            if self.bulk:
+                self._create_unlogged_tables()
+            elif self.resume_checkpoint:
+                self.loaded_chunks = self._get_loaded_chunks()
+            else:
+                self.clean_up()
+            self._copy_tables(
+                stage,
+                [
+                    models.JobModel.__tablename__,
+                    *(table_name for table_name, _ in self.dataset_paths),
+                    models.PersonFilm.name,
+                    models.ProfessionModel.__tablename__,
+                    models.ProfessionPerson.name,
+                    models.GenreModel.__tablename__,
+                    models.GenreFilm.name,
+                ],
+            )
+        if self.bulk:
+            self._finish_bulk_load()
+        if self.swap:
+            with self.report.stage("swap"):
+                self._validate_shadow_tables()
+                self._swap_in(SHADOW_SCHEMA)
+        self.bump_generation()
+
+    def rollback(self):
+        """
+        Swap the generation replaced by the last --swap back in, the
+        replacing one becomes the previous generation
+        """
+        self._swap_in(PREVIOUS_SCHEMA)
+        self.bump_generation()
+
+    def bump_generation(self) -> int:
+        """
+        Count a change of the live tables in the data_generation table, so
+        the GraphQL app drops the responses it cached before
+        :return: the new generation
+        """
+        engine = _create_engine(self.db_uri)
+        try:
+            models.DataGeneration.create(bind=engine, checkfirst=True)
+            generation = engine.execute(
+                f"INSERT INTO {models.DataGeneration.name} (id, generation) VALUES (1, 1) "  # noqa: S608
+                "ON CONFLICT (id) DO UPDATE "
+                f"SET generation = {models.DataGeneration.name}.generation + 1, loaded_at = now() "
+                "RETURNING generation"
+            ).scalar()
+        finally:
+            engine.dispose()
+        if not self.quiet:
+            print(f"Loaded data generation {generation}")
+        return generation
+
+    def _prepare_shadow_schema(self):
+        """
+        Fresh schema the tables are loaded into while readers keep using the
+        live ones, kept when resuming a shadow load from its checkpoint
+        """
+        engine = _create_engine(self.db_uri)
+        try:
+            if not self.resume_checkpoint:
+                engine.execute(f"DROP SCHEMA IF EXISTS {SHADOW_SCHEMA} CASCADE")
+            engine.execute(f"CREATE SCHEMA IF NOT EXISTS {SHADOW_SCHEMA}")
+        finally:
+            engine.dispose()
+
+    def _validate_shadow_tables(self):
+        """
+        :raises RuntimeError: a loaded table is empty or doesn't have the rows
+        the parser wrote into its chunk files
+        """
+        with self.connection.cursor() as cursor:
+            for table in get_bulk_tables():
+                cursor.execute(f"SELECT count(*) FROM {table.name}")  # noqa: S608
+                rows = cursor.fetchone()[0]
+                expected = self._get_expected_rows(table.name)
+                if expected is not None and rows != expected:
+                    raise RuntimeError(f"'{table.name}' has {rows} rows instead of {expected}, not swapping it in")
+                if not rows and table.name in dict(self.dataset_paths):
+                    raise RuntimeError(f"'{table.name}' is empty, not swapping it in")
+        self.connection.rollback()
+
+    def _get_expected_rows(self, table_name) -> Optional[int]:
+        """
+        Rows of the chunk files of a table according to the checkpoint
+        manifest, None if it doesn't know all of them
+        """
+        chunks = [self.checkpoint.get_chunk(Path(path)) for path in glob(str(self.root / table_name / "*"))]
+        if None in chunks:
+            return None
+        return sum(chunk["rows"] for chunk in chunks)
+
+    def _swap_in(self, schema):
+        """
+        Move the tables of `schema` into the live schema and the live ones
+        into PREVIOUS_SCHEMA, in one transaction: readers see either all old
+        or all new tables. Indexes, constraints and sequences move with them.
+        """
+        swapped = f"{PREVIOUS_SCHEMA}_swap"
+        if not self.quiet:
+            print(f"Swapping the tables of '{schema}' into '{LIVE_SCHEMA}' ...")
+        engine = _create_engine(self.db_uri)
+        connection = engine.raw_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}'")
+                cursor.execute(f"CREATE SCHEMA {swapped}")
+                for table in get_bulk_tables():
+                    # partitions don't move with their partitioned table
+                    live = [table.name, *_get_partitions(cursor, LIVE_SCHEMA, table.name)]
+                    swapped_in = [table.name, *_get_partitions(cursor, schema, table.name)]
+                    for name in live:
+                        cursor.execute(f"ALTER TABLE IF EXISTS {LIVE_SCHEMA}.{name} SET SCHEMA {swapped}")
+                    for name in swapped_in:
+                        cursor.execute(f"ALTER TABLE {schema}.{name} SET SCHEMA {LIVE_SCHEMA}")
+                cursor.execute(f"DROP SCHEMA {schema} CASCADE")
+                cursor.execute(f"DROP SCHEMA IF EXISTS {PREVIOUS_SCHEMA} CASCADE")
+                cursor.execute(f"ALTER SCHEMA {swapped} RENAME TO {PREVIOUS_SCHEMA}")
+            connection.commit()
+        finally:
+            connection.close()
+            engine.dispose()
+
+    def _create_unlogged_tables(self):
+        """
+        Recreate the tables for a bulk load, see `bulk_load.create_unlogged_table`
+        """
+        tables = get_bulk_tables()
+        if not self.quiet:
+            print("Creating unlogged tables without indexes and foreign keys ...")
+        self.metadata.drop_all(bind=self.engine, tables=tables)
+        self.engine.execute(models.LoadCheckpoint.delete())
+        for table in tables:
+            if self._is_partitioned(table):
+                statements = self.partitioning.create_table(table, unlogged=True)
+            else:
+                statements = create_unlogged_table(table)
+            for statement in statements:
+                self.engine.execute(statement)
+
+    def _recreate_table(self, table):
+        """
+        Empty a table of PARTITIONED_TABLES by creating it again, partitioned
+        like the parsed chunk files or not at all
+        """
+        self.metadata.drop_all(bind=self.engine, tables=[table])
+        if not self._is_partitioned(table):
+            self.metadata.create_all(bind=self.engine, tables=[table])
+            return
+        for statement in [
+            *self.partitioning.create_table(table),
+            *self.partitioning.index_statements(table),
+            *self.partitioning.attach_statements(table),
+            *(add for _, add in foreign_key_statements(table, partitioned=True)),
+        ]:
+            self.engine.execute(statement)
+
+    def _is_partitioned(self, table) -> bool:
+        return self.partitioning is not None and table.name in PARTITIONED_TABLES
+
+    def _finish_bulk_load(self):
+        """
+        Build what the bulk load left out once all rows are copied: primary
+        keys and indexes, then foreign keys, in parallel across tables and
+        partitions. The tables are analyzed and made LOGGED last, parents
+        first, as a logged table can't reference an unlogged one. A
+        partitioned table is always logged, its foreign keys are added once
+        the tables they reference are logged, then its partitions are.
+        """
+        tables = get_bulk_tables()
+        partitioned = [table for table in tables if self._is_partitioned(table)]
+        with self.report.stage("index") as stage:
+            with stage.measure("indexes"):
+                indexes = [
+                    statement
+                    for table in tables
+                    for statement in (
+                        self.partitioning.index_statements(table)
+                        if table in partitioned
+                        else index_statements(table)
+                    )
+                ]
+                self._run_parallel("Building indexes", indexes)
+                for table in partitioned:
+                    for statement in self.partitioning.attach_statements(table):
+                        self.engine.execute(statement)
+            foreign_keys = [
+                statements
+                for table in tables
+                if table not in partitioned
+                for statements in foreign_key_statements(table)
+            ]
+            with stage.measure("foreign keys"):
+                for add, _ in foreign_keys:
+                    self.engine.execute(add)
+                self._run_parallel("Validating foreign keys", [validate for _, validate in foreign_keys])
+            with stage.measure("analyze"):
+                self._run_parallel("Analyzing tables", [f"ANALYZE {table.name}" for table in tables])
+            with stage.measure("logged"):
+                for table in tables:
+                    if table not in partitioned:
+                        self._execute(self.engine, f"ALTER TABLE {table.name} SET LOGGED")
+            for table in partitioned:
+                with stage.measure("foreign keys"):
+                    # validated while added, one at a time as adding locks the referenced tables
+                    for _, add in foreign_key_statements(table, partitioned=True):
+                        self._execute(self.engine, add)
+                with stage.measure("logged"):
+                    self._run_parallel(
+                        f"Logging the partitions of '{table.name}'",
+                        [f"ALTER TABLE {name} SET LOGGED" for name in self.partitioning.partition_names(table)],
+                    )
+
+    def _run_parallel(self, status, statements: List[str]):
+        if not self.quiet:
+            print(f"{status} ...")
+        threads = max(1, min(cpu_count(), len(statements)))
+        # a connection per thread, the pool of self.engine may be smaller
+        engine = _create_engine(self.db_uri, self.schema, pool_size=threads)
+        try:
+            with ThreadPool(threads) as pool:
+                pool.map(partial(self._execute, engine), statements)
+        finally:
+            engine.dispose()
+
+    @staticmethod
+    def _execute(engine, statement: str):
+        connection = engine.raw_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f"SET LOCAL maintenance_work_mem = '{MAINTENANCE_WORK_MEM}'")
+                cursor.execute(statement)
+            connection.commit()
+        finally:
+            connection.close()
+
+    def load_delta(self):
+        """
+        Apply the delta computed by the parser in one transaction, the tables
+        stay readable meanwhile. Without a previous snapshot everything is
+        loaded with `load_dataset` instead.
+        """
+        state = DeltaState(self.root)
+        if not state.next.exists():
+            raise FileNotFoundError(f"No parsed delta in '{state.next}', parse with --delta first")
+        if not state.has_snapshot:
+            self.load_dataset()
+            state.promote()
+            return
+
+        with self.report.stage("load") as stage:
+            with self.connection.cursor() as cursor:
+                for table in reversed(DELTA_TABLES):
+                    if state.deletes_path(table.name).exists():
+                        with stage.measure(table.name) as metrics:
+                            metrics.rows += self._delete_rows(cursor, table, state.deletes_path(table.name))
+                for table in DELTA_TABLES:
+                    if state.upserts_path(table.name).exists():
+                        with stage.measure(table.name) as metrics:
+                            metrics.rows += self._upsert_rows(cursor, table, state.upserts_path(table.name))
+                            metrics.bytes += getsize(state.upserts_path(table.name))
+            self.connection.commit()
+        state.promote()
+        self.bump_generation()
+
+    def _delete_rows(self, cursor, table: DeltaTable, path: Path) -> int:
+        keys = ", ".join(table.key_columns)
+        match = " AND ".join(f"{table.name}.{column} = deleted.{column}" for column in table.key_columns)
+        cursor.execute(
+            f"CREATE TEMP TABLE deleted ON COMMIT DROP AS SELECT {keys} FROM {table.name} WITH NO DATA"  # noqa: S608
+        )
+        with open(path) as deletes_file:
+            cursor.copy_from(deletes_file, "deleted", sep=self.delimiter)
+        cursor.execute(f"DELETE FROM {table.name} USING deleted WHERE {match}")  # noqa: S608
+        rows = cursor.rowcount
+        cursor.execute("DROP TABLE deleted")
+        return rows
+
+    def _upsert_rows(self, cursor, table: DeltaTable, path: Path) -> int:
+        cursor.execute(
+            f"CREATE TEMP TABLE upserted ON COMMIT DROP AS SELECT * FROM {table.name} WITH NO DATA"  # noqa: S608
+        )
+        with open(path) as upserts_file:
+            cursor.copy_from(upserts_file, "upserted", sep=self.delimiter)
+
+        values = [column for column in table.columns if column not in table.key_columns and column != table.surrogate]
+        rows = 0
+        if table.keyed and table.surrogate is None:
+            updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in values)
+            cursor.execute(
+                f"INSERT INTO {table.name} SELECT * FROM upserted "  # noqa: S608
+                f"ON CONFLICT ({', '.join(table.key_columns)}) DO UPDATE SET {updates}"
+            )
+            rows += cursor.rowcount
+        else:
+            match = " AND ".join(f"{table.name}.{column} = upserted.{column}" for column in table.key_columns)
+            if table.keyed:
+                updates = ", ".join(f"{column} = upserted.{column}" for column in values)
+                cursor.execute(f"UPDATE {table.name} SET {updates} FROM upserted WHERE {match}")  # noqa: S608
+                rows += cursor.rowcount
+            if table.surrogate is None:
+                cursor.execute(f"INSERT INTO {table.name} SELECT * FROM upserted")  # noqa: S608
+            else:
+                # row number ids aren't stable between snapshots, new rows are numbered after the last one
+                columns = ", ".join(column for column in table.columns if column != table.surrogate)
+                new_id = f"(SELECT coalesce(max({table.surrogate}), -1) FROM {table.name}) + row_number() OVER ()"
+                cursor.execute(
+                    f"INSERT INTO {table.name} ({table.surrogate}, {columns}) "  # noqa: S608
+                    f"SELECT {new_id}, {columns} FROM upserted "
+                    f"WHERE NOT EXISTS (SELECT 1 FROM {table.name} WHERE {match})"
+                )
+            rows += cursor.rowcount
+        cursor.execute("DROP TABLE upserted")
+        return rows
 
     def clean_up(self):
+        self.engine.execute(models.LoadCheckpoint.delete())
+        self.loaded_chunks = {}
         tables = self._get_sorted_tables(self.metadata.sorted_tables)
         for table in tables:
             table_obj = get_table_object(table)
             if not self.quiet:
                 print(f"Cleaning up table '{table_obj.name}' ...")
 
-            self.engine.execute(table_obj.delete())
+            if table_obj.name in PARTITIONED_TABLES:
+                self._recreate_table(table_obj)
+            else:
+                self.engine.execute(table_obj.delete())
 
             if table_obj.name == self.resume:
                 break
 
-    def _copy_table(self, table_name):
-        if not self.quiet:
-            print(f"Copying data to '{table_name}' table ...")
-        handler = partial(self._copy_file, self.db_uri, table_name)
-        with Pool(cpu_count()) as pool:
-            pool.map(handler, glob(str(self.root / table_name / "*")))
+    def _get_loaded_chunks(self) -> Dict[str, Optional[int]]:
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"SELECT chunk, checksum FROM {models.LoadCheckpoint.name}")  # noqa: S608
+            return dict(cursor.fetchall())
 
-    @staticmethod
-    def _copy_file(db_uri: str, table_name: str, file_name: str):
-        engine = models.db.create_engine(db_uri)
-        connection = engine.raw_connection()
-        with connection.cursor() as cursor:
-            with open(file_name, "r") as csv_file:
-                cursor.copy_from(csv_file, table_name, sep="\t")
-        connection.commit()
+    def _get_pending_chunks(self, table_name) -> List[Tuple[str, str, Optional[int]]]:
+        """
+        Chunk files of a table not committed yet, with their name and checksum
+        in the checkpoint manifest
+        :raises RuntimeError: a committed chunk file was parsed again since
+        """
+        pending = []
+        for file_name in sorted(glob(str(self.root / table_name / "*"))):
+            chunk_name = self.checkpoint.chunk_name(Path(file_name))
+            checksum = (self.checkpoint.get_chunk(Path(file_name)) or {}).get("checksum")
+            if chunk_name not in self.loaded_chunks:
+                pending.append((file_name, chunk_name, checksum))
+            elif self.loaded_chunks[chunk_name] != checksum:
+                raise RuntimeError(
+                    f"'{chunk_name}' changed since it was loaded, load again without --checkpoint"
+                )
+        return pending
+
+    def _get_dependencies(self, table_names: List[str]) -> Dict[str, Set[str]]:
+        """
+        Tables each table references with a foreign key, among `table_names`.
+        Bulk loaded tables have no foreign keys yet, they don't wait for any.
+        """
+        if self.bulk:
+            return {table_name: set() for table_name in table_names}
+        return {
+            table_name: {
+                foreign_key.column.table.name
+                for foreign_key in self.metadata.tables[table_name].foreign_keys
+                if foreign_key.column.table.name in table_names and foreign_key.column.table.name != table_name
+            }
+            for table_name in table_names
+        }
+
+    def _copy_tables(self, stage: StageMetrics, table_names: List[str]):
+        """
+        Copy the chunk files of all tables with one pool of COPY_STREAMS
+        processes, each keeping its own connection. A table is started as
+        soon as all the tables it references are loaded, the biggest chunks
+        of the started tables go first.
+        """
+        # datasets of the config without a model, like crew, have no chunk files
+        table_names = [table_name for table_name in table_names if table_name in self.metadata.tables]
+        waiting = self._get_dependencies(table_names)
+        pending = {table_name: self._get_pending_chunks(table_name) for table_name in table_names}
+        remaining: Dict[str, int] = {}
+        started: Dict[str, float] = {}
+        completed: "queue.Queue" = queue.Queue()
+
+        with Pool(COPY_STREAMS, initializer=_init_copy_worker, initargs=(self.db_uri, self.schema)) as pool:
+            while True:
+                for table_name in [table_name for table_name, count in remaining.items() if not count]:
+                    del remaining[table_name]
+                    stage.dataset(table_name).seconds += time.perf_counter() - started[table_name]
+                    for dependencies in waiting.values():
+                        dependencies.discard(table_name)
+                if not waiting and not remaining:
+                    break
+
+                ready = [table_name for table_name, dependencies in waiting.items() if not dependencies]
+                if ready:
+                    self._start_tables(pool, ready, pending, completed)
+                    for table_name in ready:
+                        del waiting[table_name]
+                        started[table_name] = time.perf_counter()
+                        remaining[table_name] = len(pending[table_name])
+                    continue
+                if not remaining:
+                    raise RuntimeError(f"Foreign keys between {sorted(waiting)} form a cycle")
+
+                result = completed.get()
+                if isinstance(result, BaseException):
+                    raise result
+                table_name, file_name, rows, size = result
+                self.checkpoint.mark_loaded(Path(file_name))
+                metrics = stage.dataset(table_name)
+                metrics.rows += rows
+                metrics.bytes += size
+                remaining[table_name] -= 1
+
+    def _start_tables(self, pool, table_names: List[str], pending, completed: "queue.Queue"):
+        chunks = []
+        for table_name in table_names:
+            if not self.quiet:
+                print(f"Copying data to '{table_name}' table ...")
+            chunks.extend((table_name, chunk) for chunk in pending[table_name])
+        for table_name, chunk in sorted(chunks, key=lambda task: getsize(task[1][0]), reverse=True):
+            pool.apply_async(_copy_chunk, (table_name, chunk), callback=completed.put, error_callback=completed.put)
 
     def _get_sorted_tables(self, tables):
         sorted_tables = []
@@ -104,3 +534,61 @@ class DatasetLoader:
         sorted_tables.insert(4, models.GenreModel)
 
         return sorted_tables
+
+
+_connection = None
+
+
+def _create_engine(db_uri: str, schema: Optional[str] = None, **kwargs):
+    """
+    Engine whose connections create and find the tables in `schema`
+    instead of the default search path
+    """
+    if schema is not None:
+        kwargs["connect_args"] = {"options": f"-c search_path={schema}"}
+    return models.db.create_engine(db_uri, **kwargs)
+
+
+def _get_partitions(cursor, schema: str, table_name: str) -> List[str]:
+    cursor.execute(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = inhrelid "
+        "JOIN pg_class parent ON parent.oid = inhparent "
+        "JOIN pg_namespace ON pg_namespace.oid = parent.relnamespace "
+        "WHERE nspname = %s AND parent.relname = %s ORDER BY 1",
+        (schema, table_name),
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _init_copy_worker(db_uri: str, schema: Optional[str] = None):
+    global _connection  # noqa: PLW0603
+    _connection = _create_engine(db_uri, schema).raw_connection()
+
+
+def _copy_chunk(table_name: str, chunk: Tuple[str, str, Optional[int]]) -> Tuple[str, str, int, int]:
+    """
+    COPY a chunk file and record it in the load_checkpoint table in the
+    same transaction, so a chunk is either loaded and recorded or neither.
+    Partition chunk files are copied straight into their partition.
+    """
+    file_name, chunk_name, checksum = chunk
+    copy_table = get_chunk_table(table_name, Path(file_name))
+    try:
+        with _connection.cursor() as cursor:
+            if f".{PGCOPY_EXTENSION}" in Path(file_name).suffixes:
+                with open(file_name, "rb") as binary_file:
+                    cursor.copy_expert(f"COPY {copy_table} FROM STDIN (FORMAT binary)", binary_file)
+            else:
+                with open(file_name, "r") as csv_file:
+                    cursor.copy_from(csv_file, copy_table, sep="\t")
+            rows = max(cursor.rowcount, 0)
+            cursor.execute(
+                f"INSERT INTO {models.LoadCheckpoint.name} (chunk, rows, checksum) VALUES (%s, %s, %s)",  # noqa: S608
+                (chunk_name, rows, checksum),
+            )
+        _connection.commit()
+    except Exception:
+        _connection.rollback()
+        raise
+    return table_name, file_name, rows, getsize(file_name)
@@ -1,21 +1,55 @@
-import csv
 import pprint
-import subprocess
-from collections import defaultdict
+import shutil
+import time
+from argparse import Namespace
+from array import array
+from collections import Counter, defaultdict
+from dataclasses import dataclass
 from functools import partial
-from multiprocessing import Pool, cpu_count
+from multiprocessing import Manager, Pool, cpu_count
 from os.path import getsize
 from pathlib import Path
-from typing import IO, Any, Callable, Generator, Iterable, Iterator, cast
+from typing import Any, Callable, Generator, Iterable, Iterator, Optional, Sequence, cast
 
 from src import models
-from src.types import CommandArgs
-from src.utils import Config, DataSetKeys, DataSetPaths, get_int, get_null, overwrite_upper_line
+from src.category_mapping import CategoryMapping
+from src.checkpoint import Checkpoint
+from src.dataset_scanner import (
+    INVALID_ID,
+    WHOLE_FILE,
+    Batch,
+    Shard,
+    TsvScanner,
+    count_rows,
+    parse_ids,
+    split_shards,
+)
+from src.delta import DELTA_TABLES, DeltaState
+from src.edge_store import BUFFER_LIMIT, SORT_OVERHEAD, EdgeStore
+from src.id_set import IdSet
+from src.partitioning import PARTITION_KEY, PARTITIONED_TABLES, Partitioning
+from src.pgcopy import PGCOPY_EXTENSION
+from src.progress import ProgressLine, RunReport, StageMetrics
+from src.table_sink import (
+    PARQUET_EXTENSION,
+    ChunkInfo,
+    ChunkedFileSink,
+    CopyStreamSink,
+    CsvSink,
+    ParquetSink,
+    PartitionedSink,
+    PgBinarySink,
+    TableSink,
+    write_all,
+)
+from src.types import CommandArgs, OutputFormat
+from src.utils import Config, DataSetKeys, DataSetPaths, get_null
 
 FILM = models.FilmModel.__tablename__
 PERSON = models.PersonModel.__tablename__
 PRINCIPAL = models.PrincipalModel.__tablename__
 RATING = models.RatingModel.__tablename__
+ALTERNATIVE = models.AlternativeModel.__tablename__
 PERSON_FILM = models.PersonFilm.name
 PROFESSION = models.ProfessionModel.__tablename__
 PERSON_PROFESSION = models.ProfessionPerson.name
@@ -23,232 +57,732 @@ GENRE = models.GenreModel.__tablename__
 GENRE_FILM = models.GenreFilm.name
 JOB = models.JobModel.__tablename__
 
-
-def get_csv_filename(csv_extension: str, root: Path, table_name: str) -> Path:
-    return root / f"{table_name}.{csv_extension}"
+SHARD_SIZE = 1 << 26  # 64 MiB of input per parallel parse task
+SPILL_DIR = ".spill"
+CHUNK_SIZE = 1 << 24  # 16 MiB, smaller outputs are written to fewer chunk files
+CSV_ROW_SIZE = 16  # rough csv size of a mapping row, to estimate its output size
+MAPPING_TABLES = {FILM: (GENRE, GENRE_FILM), PERSON: (PROFESSION, PERSON_PROFESSION)}
+ERRORS_LOG = "errors.log"
+ERROR_ROW_SIZE = 1 << 10  # rough size of a malformed row kept in `errors`
 
 
 class DatasetParser:
     root: Path
     errors: dict[str, list[Any]]
-    indices: dict[str, set[int]]
+    indices: dict[str, IdSet]
     debug: bool
     quiet: bool
     dataset_paths: DataSetPaths
     delimiter: str
     csv_extension: str
     film_filter: list[str]
-    profession_person: dict[str, list[int]]
-    genre_film: dict[str, list[int]]
-    person_film: set[tuple[int, int]]
+    profession_person: CategoryMapping
+    genre_film: CategoryMapping
+    person_film: EdgeStore
     jobs: dict[str, int]
-
-    def __init__(self, cmd_args: CommandArgs, config: Config) -> None:
+    workers: int
+    gzipped: bool
+    dataset_file_ext: str
+    stream: bool
+    db_uri: Optional[str]
+    output_format: OutputFormat
+    output_extension: str
+    delta: bool
+    categories: dict[str, dict[str, int]]
+    resume_checkpoint: bool
+    checkpoint: Checkpoint
+    parsed: set[str]
+    partitions: int
+    partitioning: Optional[Partitioning]
+    memory_limit: int
+    error_limit: int
+    report: RunReport
+
+    def __init__(
+        self, cmd_args: CommandArgs, config: Config, report: Optional[RunReport] = None
+    ) -> None:
         self.root = Path(cmd_args.root)
+        self.report = report or RunReport()
         self.errors = defaultdict(list)
-        self.indices = defaultdict(set)
+        self.indices = defaultdict(IdSet)
         self.debug = cmd_args.debug or False
         self.quiet = cmd_args.quiet or False
         self.dataset_paths = config["dataset_paths"]
         self.delimiter = config["dataset_delimiter"]
         self.csv_extension = config["csv_extension"]
         self.film_filter = config["film_filter"]
+        self.config = config
+        self.workers = getattr(cmd_args, "workers", None) or 1
+        self.gzipped = getattr(cmd_args, "gzipped", None) or False
+        self.dataset_file_ext = config["dataset_file_ext"]
+        self.stream = getattr(cmd_args, "stream", None) or False
+        self.db_uri = getattr(cmd_args, "dburi", None)
+        self.output_format = getattr(cmd_args, "output_format", None) or "csv"
+        self.output_extension = {
+            "csv": self.csv_extension,
+            "binary": PGCOPY_EXTENSION,
+            "parquet": PARQUET_EXTENSION,
+        }[self.output_format]
+
+        self.delta = getattr(cmd_args, "delta", None) or False
+        # genre, profession and job ids of the snapshot in the database are
+        # kept in delta mode, so unchanged rows referencing them stay unchanged
+        self.categories = DeltaState(self.root).load_categories() if self.delta else {}
+
+        # with a memory limit half of it goes to person_film (its sort peak
+        # included), an eighth to each genre/profession mapping and a
+        # sixteenth to the malformed rows, the rest is left for the id
+        # bitmaps (a few MB), the batches in flight and the interpreter
+        self.memory_limit = (getattr(cmd_args, "memory_limit", None) or 0) << 20
+        self.error_limit = self.memory_limit // 16 // ERROR_ROW_SIZE
+        self.profession_person = self._create_mapping(
+            PERSON_PROFESSION, self.categories.get(PROFESSION)
+        )
+        self.genre_film = self._create_mapping(GENRE_FILM, self.categories.get(GENRE))
+        self.person_film = EdgeStore(
+            self.root / SPILL_DIR,
+            PERSON_FILM,
+            self.memory_limit // 2 // SORT_OVERHEAD if self.memory_limit else BUFFER_LIMIT,
+        )
+        self.jobs = dict(self.categories.get(JOB, {}))
+        self._error_rows = 0
+        self._errors_mode = "w"
 
-        self.profession_person = defaultdict(list)
-        self.genre_film = defaultdict(list)
-        self.person_film = set()
-        self.jobs = {}
+        self.resume_checkpoint = getattr(cmd_args, "checkpoint", None) or False
+        self.checkpoint = Checkpoint.load(self.root) if self.resume_checkpoint else Checkpoint(self.root)
+        self.parsed = set()
+        self.partitions = getattr(cmd_args, "partitions", None) or 0
+        self.partitioning = None
 
     def parse_dataset(self) -> None:
-        for table_name, dataset_path in cast(dict[DataSetKeys,str],self.dataset_paths.items()):
-            parse_handler = self._get_parse_handler(cast(DataSetKeys,table_name))
-            dataset_iter = parse_handler(Path(self.root / dataset_path))
-            self._write_normalized_dataset(dataset_iter, dataset_path, table_name)
-
-        self._write_extra_data(PROFESSION, PERSON_PROFESSION, self.profession_person)
-        self._write_extra_data(GENRE, GENRE_FILM, self.genre_film)
-        self._write_data(PERSON_FILM, self.person_film)
-        self._write_data(JOB, [(value, key) for key, value in self.jobs.items()])
-
-        self._split_all()
-
-        with open("errors.log", "w") as ef:
+        with self.report.stage("parse") as stage:
+            if self.resume_checkpoint:
+                self._restore_checkpoint()
+            elif not self.stream:
+                self.checkpoint.reset()
+                shutil.rmtree(self.root / SPILL_DIR, ignore_errors=True)
+                Partitioning.remove(self.root)
+
+            if self.workers > 1:
+                self._parse_parallel(stage)
+            else:
+                for table_name, dataset_path in cast(dict[DataSetKeys,str],self.dataset_paths.items()):
+                    if table_name in self.parsed:
+                        self._print_skipped(dataset_path)
+                        continue
+                    parse_handler = self._get_parse_handler(cast(DataSetKeys,table_name))
+                    path = self._get_dataset_path(dataset_path)
+                    with stage.measure(table_name) as metrics:
+                        metrics.bytes += getsize(path)
+                        metrics.rows += self._write_normalized_dataset(
+                            parse_handler(path), dataset_path, table_name, metrics.bytes
+                        )
+                    self._write_mapping(stage, table_name)
+                    self._save_checkpoint(table_name)
+
+            if PERSON_FILM not in self.parsed:
+                with stage.measure(PERSON_FILM) as metrics:
+                    metrics.rows += self._write_data(PERSON_FILM, self.person_film)
+                    self.person_film.clear()
+                self._save_checkpoint(PERSON_FILM)
+            if not self.stream and JOB not in self.parsed:
+                # streamed jobs are inserted as soon as they are seen, see _on_new_job
+                with stage.measure(JOB) as metrics:
+                    metrics.rows += self._write_data(
+                        JOB, [(value, key) for key, value in self.jobs.items()], expected_size=0
+                    )
+                self._save_checkpoint(JOB)
+
+        if self.delta:
+            with self.report.stage("delta") as stage:
+                self._build_delta(stage)
+
+        if self.errors or self._errors_mode == "w":
+            self._write_errors()
+
+    def _create_mapping(self, name: str, categories: Optional[dict[str, int]]) -> CategoryMapping:
+        if not self.memory_limit:
+            return CategoryMapping(categories)
+        return CategoryMapping(categories, self.root / SPILL_DIR, name, self.memory_limit // 8)
+
+    def _add_errors(self, table_name: str, rows: list[Any]) -> None:
+        """
+        Keep malformed rows for errors.log, with a memory limit they are
+        appended to it whenever they exceed their share
+        """
+        self.errors[table_name].extend(rows)
+        self._error_rows += len(rows)
+        if self.error_limit and self._error_rows > self.error_limit:
+            self._write_errors()
+            self.errors.clear()
+            self._error_rows = 0
+
+    def _write_errors(self) -> None:
+        with open(ERRORS_LOG, self._errors_mode) as ef:
             pprint.pprint(dict(self.errors), ef)
-
-    def _get_parse_handler(self, table_name: DataSetKeys)->Callable[[Path],Generator[Any, None, None]]:
+        self._errors_mode = "a"
+
+    def _write_mapping(self, stage: StageMetrics, table_name: str) -> None:
+        """
+        Dump the genre/profession mapping as soon as its source dataset is
+        parsed, so it isn't held in memory for the rest of the run
+        """
+        if table_name not in MAPPING_TABLES:
+            return
+        table, mapper = MAPPING_TABLES[table_name]
+        mapping = self.genre_film if table_name == FILM else self.profession_person
+        with stage.measure(mapper) as metrics:
+            metrics.rows += self._write_extra_data(table, mapper, mapping)
+        self.categories[table] = mapping.categories
+        mapping.clear()
+
+    def _get_steps(self) -> list[str]:
+        """
+        Tables in the order they are parsed, every one depends on the previous
+        """
+        return [*self.dataset_paths, PERSON_FILM, JOB]
+
+    def _restore_checkpoint(self) -> None:
+        """
+        Skip the tables parsed by an interrupted run whose chunk files are
+        unchanged, and restore the state the remaining ones need. Everything
+        from the first table that isn't parsed on is parsed again.
+        """
+        parsed = []
+        for table_name in self._get_steps():
+            tables = [table_name, *MAPPING_TABLES.get(table_name, ())]
+            if not all(self.checkpoint.is_parsed(table) for table in tables):
+                break
+            parsed.append(table_name)
+
+        state = self.checkpoint.state
+        if not parsed or state.get("step") != parsed[-1]:
+            # the state is of another table than the last parsed one, start over
+            if not self.quiet and parsed:
+                print("Checkpoint doesn't match the parsed chunk files, parsing everything")
+            self.checkpoint.reset()
+            return
+
+        for table_name in self._get_steps()[len(parsed):]:
+            self.checkpoint.forget(table_name, *MAPPING_TABLES.get(table_name, ()))
+        for table_name in MAPPING_TABLES:
+            ids_path = self.checkpoint.state_path(f"{table_name}.ids")
+            if table_name in parsed and ids_path.exists():
+                self.indices[table_name] = IdSet.load(ids_path)
+        self.jobs.update(state["jobs"])
+        self.categories.update(state["categories"])
+        runs = [Path(run) for run in state["person_film_runs"]]
+        # runs spilled by the interrupted table aren't part of the checkpoint
+        for run in (self.root / SPILL_DIR).glob("*.run"):
+            if run not in runs:
+                run.unlink()
+        self.person_film.add_runs(runs)
+        self.parsed = set(parsed)
+
+    def _save_checkpoint(self, table_name: str) -> None:
+        """
+        Mark a table parsed with the state the following ones depend on:
+        film/person ids, job ids, categories and the person_film runs so far
+        """
+        if self.stream:
+            return
+        if table_name in MAPPING_TABLES:
+            self.indices[table_name].dump(self.checkpoint.state_path(f"{table_name}.ids"))
+        self.checkpoint.state.update(
+            step=table_name,
+            jobs=self.jobs,
+            categories=self.categories,
+            person_film_runs=[str(run) for run in self.person_film.flush()],
+        )
+        self.checkpoint.mark_parsed(table_name, *MAPPING_TABLES.get(table_name, ()))
+
+    def _record_chunks(self, table_name: str, sink: TableSink) -> None:
+        self.checkpoint.record_chunks(table_name, sink.chunks())
+
+    def _print_skipped(self, dataset_path: str) -> None:
+        if not self.quiet:
+            print(f"Skipping '{dataset_path}', it is parsed according to the checkpoint")
+
+    def _build_delta(self, stage: StageMetrics) -> None:
+        """
+        Diff the parsed tables against the snapshot in the database, the
+        loader applies the result with `load_delta`
+        """
+        state = DeltaState(self.root)
+        state.prepare()
+        self.categories[JOB] = self.jobs
+        state.write_categories(self.categories)
+        for table in DELTA_TABLES:
+            chunks = sorted((self.root / table.name).glob(f"{table.name}.{self.csv_extension}.*"))
+            if not chunks:
+                continue
+            with stage.measure(table.name) as metrics:
+                upserts, deletes = state.build(table, chunks, self.delimiter)
+                metrics.rows += upserts + deletes
+            if not self.quiet and state.has_snapshot:
+                print(f"Delta of '{table.name}': {upserts} upserted, {deletes} deleted rows")
+
+    def _get_dataset_path(self, dataset_path: str) -> Path:
+        """
+        Path of the extracted dataset, or of the downloaded .gz file
+        which is then read without extracting it to disk
+        """
+        path = Path(self.root / dataset_path)
+        if self.gzipped and not dataset_path.endswith(f".{self.dataset_file_ext}"):
+            return path.with_name(f"{path.name}.{self.dataset_file_ext}")
+        return path
+
+    def _get_parse_handler(self, table_name: DataSetKeys)->Callable[..., Generator[Any, None, None]]:
         return getattr(self, f"_parse_{table_name}")
 
     def _write_normalized_dataset(
-        self, dataset_iter: Iterator[tuple[str, int]], dataset_path: str, table_name: str
-    ):
-        output_filename = get_csv_filename(self.csv_extension, self.root, table_name)
-        with open(output_filename, "w") as dataset_out:
-            writer = self._get_csv_writer(dataset_out)
-            status_line = f"Parsing '{dataset_path}' into '{output_filename}' ..."
-            if not self.quiet:
-                print(f"{self._get_progress_line(status_line, 0)} ...")
-            for _, (data_line, progress) in enumerate(dataset_iter):
-                overwrite_upper_line(
-                    self._get_progress_line(status_line, progress), self.quiet
-                )
-                writer.writerow(data_line)
-            overwrite_upper_line(
-                f"{self._get_progress_line(status_line, 100)} done", self.quiet
-            )
+        self,
+        dataset_iter: Iterator[tuple[list[Any], float]],
+        dataset_path: str,
+        table_name: str,
+        expected_size: Optional[int] = None,
+    ) -> int:
+        with self._open_sink(table_name, expected_size=expected_size) as sink:
+            progress_line = ProgressLine(f"Parsing '{dataset_path}' into {sink} ...", self.quiet)
+            for data_lines, progress in dataset_iter:
+                sink.write_rows(data_lines)
+                progress_line.update(progress, len(data_lines))
+            progress_line.done()
+        self._record_chunks(table_name, sink)
+        return progress_line.rows
+
+    def _open_sink(
+        self, table_name: str, path: Optional[Path] = None, expected_size: Optional[int] = None
+    ) -> TableSink:
+        """
+        Destination of the parsed rows of a table: a COPY stream into the
+        database in stream mode, otherwise chunk files in '<root>/<table_name>'
+        :param path: single file to write instead of the chunk files
+        :param expected_size: rough output size in bytes, picks the number of chunks
+        """
+        if self.stream:
+            return CopyStreamSink(cast(str, self.db_uri), table_name, self.delimiter)
+        if self.partitions > 1 and table_name in PARTITIONED_TABLES:
+            if path is None:
+                self._prepare_chunks_dir(table_name)
+            return self._open_partitioned_sink(table_name, path or self._get_chunk_filename(table_name, 0))
+        if path is not None:
+            return self._open_file_sink(table_name, path)
+        self._prepare_chunks_dir(table_name)
+        return ChunkedFileSink(
+            self.root / table_name,
+            f"{table_name}.{self.output_extension}",
+            self._get_chunk_count(expected_size),
+            partial(self._open_file_sink, table_name),
+        )
 
-    @staticmethod
-    def _get_progress_line(status_line:str, progress:int) -> str:
-        return f"{status_line}: {progress:.2f}%"
+    def _open_file_sink(self, table_name: str, path: Path) -> TableSink:
+        if self.output_format == "binary":
+            return PgBinarySink(path, table_name)
+        if self.output_format == "parquet":
+            return ParquetSink(path, table_name)
+        return CsvSink(path, self.delimiter)
+
+    def _open_partitioned_sink(self, table_name: str, path: Path) -> TableSink:
+        """
+        Rows of every film_id range partition go to their own '<path>.pNN' file
+        """
+        columns = [column.name for column in models.db.metadata.tables[table_name].columns]
+        return PartitionedSink(
+            self._get_partitioning().bounds,
+            columns.index(PARTITION_KEY),
+            lambda idx: self._open_file_sink(table_name, path.with_name(f"{path.name}.p{idx:02d}")),
+        )
 
-    def _parse_film(self, dataset_path: Path) -> Generator[tuple[tuple[int, str, bool, str, str], float], None, None]:
-        for data, progress in self._parse_raw_dataset(dataset_path):
-            try:
-                if data["titleType"] not in self.film_filter:
-                    continue
+    def _get_partitioning(self) -> Partitioning:
+        """
+        Partition bounds splitting the parsed films evenly, computed once all
+        films are parsed and saved for the loader
+        """
+        if self.partitioning is None:
+            self.partitioning = Partitioning.from_ids(self.indices[FILM], self.partitions)
+            self.partitioning.save(self.root)
+        return self.partitioning
 
-                film_id = get_int(data["tconst"])
-                if film_id is None:
+    @staticmethod
+    def _get_chunk_count(expected_size: Optional[int]) -> int:
+        chunks = cpu_count()
+        if expected_size is not None:
+            chunks = min(chunks, -(-expected_size // CHUNK_SIZE))
+        return max(1, chunks)
+
+    def _scan(self, dataset_path: Path, table_name: str, shard: Shard) -> Generator[Batch, None, None]:
+        for batch in TsvScanner(dataset_path, self.delimiter, shard=shard):
+            if batch.malformed:
+                self._add_errors(table_name, batch.malformed)
+            yield batch
+
+    def _parse_film(self, dataset_path: Path, shard: Shard = WHOLE_FILE) -> Generator[tuple[list[tuple[int, str, bool, str, str]], float], None, None]:
+        film_filter = frozenset(self.film_filter)
+        for batch in self._scan(dataset_path, FILM, shard):
+            data_lines = []
+            for film_id, title_type, title, is_adult, start_year, runtime_minutes, genres in zip(
+                parse_ids(batch.column("tconst")),
+                batch.column("titleType"),
+                batch.column("primaryTitle"),
+                batch.column("isAdult"),
+                batch.column("startYear"),
+                batch.column("runtimeMinutes"),
+                batch.column("genres"),
+            ):
+                if title_type not in film_filter or film_id == INVALID_ID:
                     continue
-                
-                data_line = (
-                    film_id,
-                    data["primaryTitle"],
-                    bool(data["isAdult"]),
-                    get_null(data["startYear"]),
-                    get_null(data["runtimeMinutes"]),
+
+                data_lines.append(
+                    (film_id, title, is_adult == "1", get_null(start_year), get_null(runtime_minutes))
                 )
-                genres_from_dataset = get_null(data["genres"])
-            except KeyError:
-                self.errors[FILM].append(data)
-            else:
                 self.indices[FILM].add(film_id)
-                self._update_genres(genres_from_dataset, film_id)
-                yield data_line, progress
-
-    def _update_genres(self, genres_from_dataset: str, film_id: int):
-        for genre in genres_from_dataset.split(","):
-            self.genre_film[genre].append(film_id)
-
-    def _parse_person(self, dataset_path:Path) -> Generator[tuple[tuple[int, str, str, str], float], None, None]:
-        for data, progress in self._parse_raw_dataset(dataset_path):
-            try:
-                person_id = get_int(data["nconst"])
-                if person_id is None:
+                self.genre_film.add_all(get_null(genres).split(","), film_id)
+            yield data_lines, batch.progress
+
+    def _parse_person(self, dataset_path:Path, shard: Shard = WHOLE_FILE) -> Generator[tuple[list[tuple[int, str, str, str]], float], None, None]:
+        for batch in self._scan(dataset_path, PERSON, shard):
+            data_lines = []
+            for person_id, name, birth_year, death_year, professions, known_for_titles in zip(
+                parse_ids(batch.column("nconst")),
+                batch.column("primaryName"),
+                batch.column("birthYear"),
+                batch.column("deathYear"),
+                batch.column("primaryProfession"),
+                batch.column("knownForTitles"),
+            ):
+                if person_id == INVALID_ID:
                     continue
-                data_line = (
-                    person_id,
-                    data["primaryName"],
-                    get_null(data["birthYear"]),
-                    get_null(data["deathYear"]),
-                )
-                profession_from_dataset = get_null(data["primaryProfession"])
-            except KeyError:
-                self.errors[PERSON].append(data)
-            else:
-                self.indices[PERSON].add(person_id)
-                self._update_professions(profession_from_dataset, person_id)
-                yield data_line, progress
-
-                for film_id in self._get_film_ids(data):
-                    self.person_film.add((person_id, film_id))
 
-    def _update_professions(self, professions_from_dataset: str, person_id: int):
-        for profession in professions_from_dataset.split(","):
-            self.profession_person[profession].append(person_id)
-
-    def _get_film_ids(self, data:dict[str, str]) -> Generator[int, None, None]:
-        titles = [
-            get_int(el) for el in data["knownForTitles"].split(",") if get_int(el)
-        ]
-        for film_id in titles:
-            if film_id in self.indices[FILM]:
+                data_lines.append((person_id, name, get_null(birth_year), get_null(death_year)))
+                self.indices[PERSON].add(person_id)
+                self.profession_person.add_all(get_null(professions).split(","), person_id)
+                for film_id in self._get_film_ids(known_for_titles):
+                    self.person_film.add(person_id, film_id)
+            yield data_lines, batch.progress
+
+    def _get_film_ids(self, known_for_titles: str) -> Generator[int, None, None]:
+        film_ids = parse_ids(known_for_titles.split(","))
+        for film_id, is_film in zip(film_ids, self.indices[FILM].contains_many(film_ids)):
+            if is_film and film_id > 0:
                 yield film_id
 
-    def _parse_principal(self, dataset_path:Path) -> Generator[tuple[tuple[int, int, int, int], float], None, None]:
-        for idx, (data, progress) in enumerate(self._parse_raw_dataset(dataset_path)):
-            film_id, person_id = get_int(data["tconst"]), get_int(data["nconst"])
-            if film_id in self.indices[FILM] and person_id in self.indices[PERSON]:
-                job = data["category"]
-                self._update_jobs(job)
-                data_line = (idx, film_id, person_id, self.jobs[job])
-                yield data_line, progress
-                self.person_film.add((person_id, film_id))
+    def _parse_principal(self, dataset_path:Path, shard: Shard = WHOLE_FILE) -> Generator[tuple[list[tuple[int, int, int, int]], float], None, None]:
+        films, persons = self.indices[FILM], self.indices[PERSON]
+        for batch in self._scan(dataset_path, PRINCIPAL, shard):
+            data_lines = []
+            film_ids = parse_ids(batch.column("tconst"))
+            person_ids = parse_ids(batch.column("nconst"))
+            for idx, film_id, person_id, job, is_film, is_person in zip(
+                batch.row_numbers,
+                film_ids,
+                person_ids,
+                batch.column("category"),
+                films.contains_many(film_ids),
+                persons.contains_many(person_ids),
+            ):
+                if is_film and is_person:
+                    self._update_jobs(job)
+                    data_lines.append((idx, film_id, person_id, self.jobs[job]))
+                    self.person_film.add(person_id, film_id)
+            yield data_lines, batch.progress
 
     def _update_jobs(self, job: str) -> None:
         if job not in self.jobs:
             self.jobs[job] = len(self.jobs) + 1
+            self._on_new_job(self.jobs[job], job)
+
+    def _on_new_job(self, job_id: int, job: str) -> None:
+        """
+        In stream mode principal rows reach the database while parsing, so
+        the job they reference has to be committed first
+        """
+        if not self.stream:
+            return
+        connection = models.db.create_engine(self.db_uri).raw_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f"INSERT INTO {JOB} (id, job) VALUES (%s, %s)", (job_id, job))  # noqa: S608
+            connection.commit()
+        finally:
+            connection.close()
+
+    def _parse_rating(self, dataset_path:Path, shard: Shard = WHOLE_FILE) -> Generator[tuple[list[tuple[int, str, str, int]], float], None, None]:
+        films = self.indices[FILM]
+        for batch in self._scan(dataset_path, RATING, shard):
+            film_ids = parse_ids(batch.column("tconst"))
+            data_lines = [
+                (idx, average_rating, num_votes, film_id)
+                for idx, film_id, average_rating, num_votes, is_film in zip(
+                    batch.row_numbers,
+                    film_ids,
+                    batch.column("averageRating"),
+                    batch.column("numVotes"),
+                    films.contains_many(film_ids),
+                )
+                if is_film
+            ]
+            yield data_lines, batch.progress
+
+    def _parse_alternative(self, dataset_path: Path, shard: Shard = WHOLE_FILE) -> Generator[tuple[list[tuple[int, str, str, str, str, bool]], float], None, None]:
+        """
+        title.akas is the biggest dataset, it is filtered against the film
+        ids batch by batch without keeping anything of it in memory
+        """
+        films = self.indices[FILM]
+        for batch in self._scan(dataset_path, ALTERNATIVE, shard):
+            film_ids = parse_ids(batch.column("titleId"))
+            data_lines = [
+                (film_id, ordering, title, region, language, is_original_title == "1")
+                for film_id, ordering, title, region, language, is_original_title, is_film in zip(
+                    film_ids,
+                    batch.column("ordering"),
+                    batch.column("title"),
+                    batch.column("region"),
+                    batch.column("language"),
+                    batch.column("isOriginalTitle"),
+                    films.contains_many(film_ids),
+                )
+                if is_film
+            ]
+            yield data_lines, batch.progress
+
+    def _parse_parallel(self, stage: StageMetrics) -> None:
+        for table_name, dataset_path in self.dataset_paths.items():
+            if table_name in self.parsed:
+                self._print_skipped(dataset_path)
+        datasets = {
+            table_name: self._get_dataset_path(dataset_path)
+            for table_name, dataset_path in self.dataset_paths.items()
+            if table_name not in self.parsed
+        }
+        shards = {
+            table_name: split_shards(path, self._get_shard_count(path))
+            for table_name, path in datasets.items()
+        }
+        tasks = [
+            _ShardTask(table_name, datasets[table_name], shard)
+            for table_name, table_shards in shards.items()
+            for shard in table_shards
+        ]
 
-    def _parse_rating(self, dataset_path:Path) -> Generator[tuple[tuple[int, str, str, int], float], None, None]:
-        for idx, (data, progress) in enumerate(self._parse_raw_dataset(dataset_path)):
-            film_id = get_int(data["tconst"])
-            if film_id in self.indices[FILM]:
-                data_line = (idx, data["averageRating"], data["numVotes"], film_id)
-                yield data_line, progress
-
-    def _parse_raw_dataset(self, file_path:Path) -> Generator[tuple[dict[str, str], float], None, None]:
-        size = getsize(file_path)
-        read_size = 0
-        with open(file_path) as fd:
-            tsv_reader = csv.reader(fd, delimiter=self.delimiter)
-            headers = next(tsv_reader)
-            for line in tsv_reader:
-                read_size += len("".join(line)) + len(line)
-                data = dict(zip(headers, line))
-                yield data, (read_size / size) * 100
-
-    def _write_data(self, table_name: str, data: Iterable[Iterable[Any]]) -> None:
-        file_name = Path(self.root / f"{table_name}.{self.csv_extension}")
-        with Path.open(file_name, "w") as dataset_out:
-            print(f"Dumping to f'{file_name}' file ...")
-            writer = self._get_csv_writer(dataset_out)
-            writer.writerows(data)
-
-    def _write_extra_data(self, table: str, mapper: str, extra_data: dict[str, Any]):
-        table_filename = get_csv_filename(self.csv_extension, self.root, table)
-        mapper_filename = get_csv_filename(self.csv_extension, self.root, mapper)
-
-        with open(table_filename, "w") as table_file:
-            print(f"Dumping to {table_filename} and {mapper_filename} files ...")
-            table_writer = self._get_csv_writer(table_file)
-            with Path.open(mapper_filename, "w") as mapper_file:
-                mapper_writer = self._get_csv_writer(mapper_file)
-                for idx, (field, table_ids) in enumerate(extra_data.items()):
-                    table_writer.writerow([idx, field])
-                    mapper_writer.writerows((idx, table_id) for table_id in table_ids)
-
-    def _get_csv_writer(self, file_obj: IO[str]):
-        return csv.writer(file_obj, delimiter=self.delimiter)
-
-    def _split_all(self) -> None:
-        processes: int = cpu_count()
-        split_worker = partial(self._split_file, processes)
-
-        with Pool(processes) as pool:
-            pool.map(
-                split_worker,
-                self.root.glob(f"*.{self.csv_extension}"),
+        if self.stream:
+            # streamed shards are committed as they finish, so films and persons
+            # have to be in the database before the rows referencing them
+            waves = [
+                [task for task in tasks if task.table_name in (FILM, PERSON)],
+                [task for task in tasks if task.table_name not in (FILM, PERSON)],
+            ]
+        else:
+            waves = [tasks]
+
+        with Pool(self.workers) as pool:
+            index_results = list(self._run_tasks(
+                pool, partial(_index_shard, self.delimiter, self.film_filter), tasks, "Indexing"
+            ))
+
+        first_row: dict[str, int] = defaultdict(int)
+        chunks: dict[str, int] = defaultdict(int)
+        for idx, (task, (rows, ids)) in enumerate(zip(tasks, index_results)):
+            table_name = task.table_name
+            if table_name in (FILM, PERSON):
+                self.indices[table_name].union_update(ids)
+            tasks[idx] = _ShardTask(
+                table_name,
+                task.dataset_path,
+                Shard(task.shard.start, task.shard.end, first_row[table_name]),
+                self._get_chunk_filename(table_name, chunks[table_name]),
             )
-
-    @staticmethod
-    def _split_file(processes: int, path: Path) -> None:
-        chunks_dir = path.parent / path.stem
-        subprocess.call(["mkdir", "-p", str(chunks_dir)])  # noqa: S603, S607
-        lines_count = (
-            int(
-                subprocess.check_output(["wc", "-l", path]).split()[  # noqa: S603, S607
-                    0
-                ],
+            first_row[table_name] += rows
+            chunks[table_name] += 1
+
+        if not self.stream:
+            for table_name in datasets:
+                self._prepare_chunks_dir(table_name)
+            if self.partitions > 1:
+                self._get_partitioning()
+        remaining_shards = Counter(task.table_name for task in tasks)
+
+        with Manager() as manager:
+            shared_jobs, lock = manager.dict(self.jobs), manager.Lock()
+            worker_args = Namespace(
+                root=self.root,
+                debug=self.debug,
+                quiet=True,
+                stream=self.stream,
+                dburi=self.db_uri,
+                output_format=self.output_format,
+                partitions=self.partitions,
             )
-            // processes
-        ) + 1
-        subprocess.call(
-            [  # noqa: S603, S607
-                "split",
-                path,
-                "-d",
-                "-l",
-                str(lines_count),
-                f"{chunks_dir / path.name!s}.",
-            ],
+            with Pool(
+                self.workers,
+                initializer=_init_shard_parser,
+                initargs=(worker_args, self.config, dict(self.indices), shared_jobs, lock, self.partitioning),
+            ) as pool:
+                for wave in waves:
+                    for task, result in zip(wave, self._run_tasks(pool, _parse_shard, wave, "Parsing")):
+                        self._merge_shard_result(result)
+                        self.checkpoint.record_chunks(task.table_name, result.chunks)
+                        metrics = stage.dataset(task.table_name)
+                        metrics.rows += result.rows
+                        metrics.seconds += result.seconds
+                        remaining_shards[task.table_name] -= 1
+                        if not remaining_shards[task.table_name]:
+                            self._write_mapping(stage, task.table_name)
+                            self.jobs.update(shared_jobs)
+                            self._save_checkpoint(task.table_name)
+            self.jobs = dict(shared_jobs)
+
+        for table_name, path in datasets.items():
+            stage.dataset(table_name).bytes += getsize(path)
+
+    def _run_tasks(self, pool, worker: Callable[[Any], Any], tasks: list[Any], stage: str) -> Iterator[Any]:
+        progress_line = ProgressLine(
+            f"{stage} {len(tasks)} shards in {self.workers} processes ...", self.quiet
         )
-        Path.unlink(path)
+        for idx, result in enumerate(pool.imap(worker, tasks), 1):
+            progress_line.update(idx / len(tasks) * 100)
+            yield result
+        progress_line.done()
+
+    def _merge_shard_result(self, result: "_ShardResult") -> None:
+        for table_name, errors in result.errors.items():
+            self._add_errors(table_name, errors)
+        self.genre_film.merge(result.genre_film)
+        self.profession_person.merge(result.profession_person)
+        self.person_film.extend_packed(result.person_film)
+
+    def _get_shard_count(self, path: Path) -> int:
+        return max(1, min(self.workers * 4, -(-getsize(path) // SHARD_SIZE)))
+
+    def _get_chunk_filename(self, table_name: str, idx: int) -> Path:
+        return self.root / table_name / f"{table_name}.{self.output_extension}.{idx:02d}"
+
+    def _prepare_chunks_dir(self, table_name: str) -> None:
+        chunks_dir = self.root / table_name
+        chunks_dir.mkdir(parents=True, exist_ok=True)
+        for old_chunk in chunks_dir.glob(f"{table_name}.*"):
+            old_chunk.unlink()
+
+    def _write_data(
+        self, table_name: str, data: Iterable[Sequence[Any]], expected_size: Optional[int] = None
+    ) -> int:
+        with self._open_sink(table_name, expected_size=expected_size) as sink:
+            print(f"Dumping to {sink} ...")
+            write_all(sink, data)
+        self._record_chunks(table_name, sink)
+        return sink.rows
+
+    def _write_extra_data(self, table: str, mapper: str, extra_data: CategoryMapping) -> int:
+        # the table is closed first, the mapper rows reference it
+        with self._open_sink(table, expected_size=0) as table_sink:
+            print(f"Dumping to {table_sink} ...")
+            write_all(table_sink, extra_data.table_rows())
+        self._record_chunks(table, table_sink)
+        with self._open_sink(mapper, expected_size=len(extra_data) * CSV_ROW_SIZE) as mapper_sink:
+            print(f"Dumping to {mapper_sink} ...")
+            write_all(mapper_sink, extra_data.rows())
+        self._record_chunks(mapper, mapper_sink)
+        return mapper_sink.rows
+
+
+@dataclass(frozen=True)
+class _ShardTask:
+    table_name: str
+    dataset_path: Path
+    shard: Shard
+    output_path: Optional[Path] = None
+
+
+@dataclass
+class _ShardResult:
+    rows: int
+    seconds: float
+    errors: dict[str, list[Any]]
+    genre_film: CategoryMapping
+    profession_person: CategoryMapping
+    person_film: array
+    chunks: list[ChunkInfo]
+
+
+def _index_shard(delimiter: str, film_filter: list[str], task: _ShardTask) -> tuple[int, IdSet]:
+    """
+    First pass of the parallel parse: count the rows of a shard and collect
+    the film/person ids the other datasets are filtered on
+    """
+    ids = IdSet()
+    if task.table_name not in (FILM, PERSON):
+        return count_rows(task.dataset_path, task.shard), ids
+
+    rows = 0
+    titles = frozenset(film_filter)
+    for batch in TsvScanner(task.dataset_path, delimiter, shard=task.shard):
+        rows += len(batch) + len(batch.malformed)
+        if task.table_name == FILM:
+            batch_ids = zip(parse_ids(batch.column("tconst")), batch.column("titleType"))
+            ids.update(id_ for id_, title_type in batch_ids if title_type in titles and id_ != INVALID_ID)
+        else:
+            ids.update(id_ for id_ in parse_ids(batch.column("nconst")) if id_ != INVALID_ID)
+    return rows, ids
+
+
+class _ShardParser(DatasetParser):
+    """
+    DatasetParser living in a pool worker, job ids are shared between
+    all workers through a manager dict. It holds the state of one shard
+    (SHARD_SIZE of input) at a time, so it never spills with --memory-limit.
+    """
+
+    shared_jobs: dict[str, int]
+    lock: Any
+
+    def _update_jobs(self, job: str) -> None:
+        if job not in self.jobs:
+            with self.lock:
+                if job not in self.shared_jobs:
+                    self.shared_jobs[job] = len(self.shared_jobs) + 1
+                    self._on_new_job(self.shared_jobs[job], job)
+                self.jobs[job] = self.shared_jobs[job]
+
+
+_shard_parser: Optional[_ShardParser] = None
+
+
+def _init_shard_parser(
+    cmd_args: CommandArgs,
+    config: Config,
+    indices: dict[str, IdSet],
+    shared_jobs: dict[str, int],
+    lock: Any,
+    partitioning: Optional[Partitioning] = None,
+) -> None:
+    global _shard_parser  # noqa: PLW0603
+    _shard_parser = _ShardParser(cmd_args, config)
+    _shard_parser.indices.update(indices)
+    _shard_parser.shared_jobs = shared_jobs
+    _shard_parser.lock = lock
+    _shard_parser.partitioning = partitioning
+
+
+def _parse_shard(task: _ShardTask) -> _ShardResult:
+    started = time.perf_counter()
+    parser = cast(_ShardParser, _shard_parser)
+    handler = parser._get_parse_handler(cast(DataSetKeys, task.table_name))  # noqa: SLF001
+    with parser._open_sink(task.table_name, task.output_path) as sink:  # noqa: SLF001
+        for data_lines, _ in handler(task.dataset_path, task.shard):
+            sink.write_rows(data_lines)
+
+    result = _ShardResult(
+        rows=sink.rows,
+        seconds=time.perf_counter() - started,
+        errors=dict(parser.errors),
+        genre_film=parser.genre_film,
+        profession_person=parser.profession_person,
+        person_film=array("q", parser.person_film.packed()),
+        chunks=sink.chunks(),
+    )
+    parser.errors.clear()
+    parser.genre_film = CategoryMapping()
+    parser.profession_person = CategoryMapping()
+    parser.person_film.clear()
+    return result
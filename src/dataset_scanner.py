@@ -0,0 +1,221 @@
+import gzip
+from array import array
+from dataclasses import dataclass, field
+from itertools import repeat
+from os.path import getsize
+from pathlib import Path
+from typing import IO, Iterable, Iterator, Optional, Sequence, Union
+
+BLOCK_SIZE = 1 << 20  # 1 MiB per read, roughly 10k-40k IMDb rows
+INVALID_ID = -1
+GZIP_SUFFIX = ".gz"
+
+
+@dataclass
+class Batch:
+    """
+    A block of well formed rows stored column by column.
+    Rows with a wrong number of fields are kept apart in `malformed`.
+    """
+
+    headers: list[str]
+    columns: list[Sequence[str]]
+    row_numbers: Union[range, list[int]]
+    progress: float
+    malformed: list[dict[str, str]] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.row_numbers)
+
+    def column(self, name: str) -> Sequence[str]:
+        if not self.columns:
+            return ()
+        return self.columns[self.headers.index(name)]
+
+
+@dataclass(frozen=True)
+class Shard:
+    """
+    Line aligned byte range of a dataset file, `end=None` means end of file.
+    `first_row` is the number of data rows before `start`.
+    """
+
+    start: int = 0
+    end: Optional[int] = None
+    first_row: int = 0
+
+
+WHOLE_FILE = Shard()
+
+
+class TsvScanner:
+    """
+    Reads a TSV dataset in large byte blocks and yields `Batch` objects,
+    so the parse handlers work on whole columns instead of one dict per row.
+    """
+
+    def __init__(
+        self,
+        file_path: Path,
+        delimiter: str,
+        block_size: int = BLOCK_SIZE,
+        shard: Shard = WHOLE_FILE,
+    ) -> None:
+        self.file_path = file_path
+        self.delimiter = delimiter
+        self.block_size = block_size
+        self.shard = shard
+
+    @property
+    def compressed(self) -> bool:
+        return self.file_path.suffix == GZIP_SUFFIX
+
+    def __iter__(self) -> Iterator[Batch]:
+        with open(self.file_path, "rb") as raw:
+            fd: IO[bytes] = gzip.GzipFile(fileobj=raw) if self.compressed else raw
+            header_line = fd.readline()
+            headers = header_line.decode().rstrip("\r\n").split(self.delimiter)
+            start = max(self.shard.start, len(header_line))
+            if start > fd.tell():
+                fd.seek(start)
+
+            # progress is measured on the bytes of the file on disk,
+            # i.e. compressed bytes for .gz datasets
+            offset = 0 if self.compressed else start
+            end = self.shard.end if self.shard.end is not None else getsize(self.file_path)
+            size = max(end - offset, 1)
+            left = None if self.shard.end is None else self.shard.end - start
+
+            row_number = self.shard.first_row
+            remainder = b""
+            while block := fd.read(self.block_size if left is None else min(self.block_size, left)):
+                if left is not None:
+                    left -= len(block)
+                block = remainder + block
+                cut = block.rfind(b"\n") + 1
+                remainder = block[cut:]
+                if not cut:
+                    continue
+                progress = min((raw.tell() - offset) / size * 100, 100)
+                batch = self._make_batch(headers, block[:cut], row_number, progress)
+                row_number += len(batch) + len(batch.malformed)
+                yield batch
+
+            if remainder:
+                yield self._make_batch(headers, remainder, row_number, 100)
+
+    def _make_batch(self, headers: list[str], block: bytes, first_row: int, progress: float) -> Batch:
+        text = block.decode()
+        if "\r" in text:
+            text = text.replace("\r\n", "\n")
+        lines = [line for line in text.split("\n") if line]
+        width = len(headers)
+
+        # fast path: every line has exactly `width` fields, so one flat split
+        # can be sliced into columns without building a list per row
+        if list(map(str.count, lines, repeat(self.delimiter))).count(width - 1) == len(lines):
+            fields = self.delimiter.join(lines).split(self.delimiter) if lines else []
+            return Batch(
+                headers=headers,
+                columns=[fields[idx::width] for idx in range(width)],
+                row_numbers=range(first_row, first_row + len(lines)),
+                progress=progress,
+            )
+
+        rows = []
+        row_numbers = []
+        malformed = []
+        for row_number, line in enumerate(lines, first_row):
+            row = line.split(self.delimiter)
+            if len(row) == width:
+                rows.append(row)
+                row_numbers.append(row_number)
+            else:
+                malformed.append(dict(zip(headers, row)))
+
+        return Batch(
+            headers=headers,
+            columns=list(zip(*rows)),
+            row_numbers=row_numbers,
+            progress=progress,
+            malformed=malformed,
+        )
+
+
+def parse_ids(values: Iterable[str]) -> array:
+    """
+    Convert a column of string ids like tt0000002 into an int64 array,
+    ids which can't be converted become INVALID_ID
+    :param values: column of string ids
+    :return: array of integer ids
+    """
+    values = list(values)
+    try:
+        return array("q", [int(value[2:]) for value in values])
+    except ValueError:
+        return array("q", [_parse_id(value) for value in values])
+
+
+def _parse_id(value: str) -> int:
+    try:
+        return int(value[2:])
+    except ValueError:
+        return INVALID_ID
+
+
+def split_shards(file_path: Path, count: int) -> list[Shard]:
+    """
+    Split a dataset file into at most `count` line aligned byte ranges,
+    the header line is never part of a shard. Gzipped datasets can't be
+    split and are returned as a single shard.
+    :param file_path: dataset file
+    :param count: wanted number of shards
+    :return: shards with `first_row` left at 0
+    """
+    if file_path.suffix == GZIP_SUFFIX:
+        return [WHOLE_FILE]
+
+    size = getsize(file_path)
+    with open(file_path, "rb") as fd:
+        boundaries = [len(fd.readline())]
+        for idx in range(1, count):
+            offset = max(size * idx // count, boundaries[-1])
+            fd.seek(offset)
+            if offset > boundaries[-1]:
+                fd.readline()
+            if fd.tell() >= size:
+                break
+            if fd.tell() > boundaries[-1]:
+                boundaries.append(fd.tell())
+    boundaries.append(size)
+    return [Shard(start, end) for start, end in zip(boundaries, boundaries[1:]) if end > start]
+
+
+def count_rows(file_path: Path, shard: Shard, block_size: int = BLOCK_SIZE) -> int:
+    """
+    Count the lines of a shard without parsing them
+    :param file_path: dataset file
+    :param shard: line aligned byte range
+    :return: number of lines in the shard
+    """
+    if file_path.suffix == GZIP_SUFFIX:
+        with gzip.open(file_path, "rb") as fd:
+            fd.readline()
+            return _count_lines(fd, None, block_size)
+
+    with open(file_path, "rb") as fd:
+        fd.seek(shard.start)
+        if shard.end is None:
+            return _count_lines(fd, None, block_size)
+        return _count_lines(fd, shard.end - shard.start, block_size)
+
+
+def _count_lines(fd: IO[bytes], left: Optional[int], block_size: int) -> int:
+    rows = 0
+    last = b"\n"
+    while block := fd.read(block_size if left is None else min(block_size, left)):
+        if left is not None:
+            left -= len(block)
+        rows += block.count(b"\n")
+        last = block[-1:]
+    return rows + (last != b"\n")
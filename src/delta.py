@@ -0,0 +1,228 @@
+import csv
+import json
+import shutil
+import zlib
+from dataclasses import dataclass
+from functools import cached_property
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional
+
+from src import models
+from src.edge_store import EdgeStore, read_run
+
+DELTA_DIR = ".delta"
+CATEGORIES_FILENAME = "categories.json"
+HASH_BITS = 32
+
+
+@dataclass(frozen=True)
+class DeltaTable:
+    """
+    How rows of a table are fingerprinted and matched between snapshots.
+    Keyed tables fingerprint a row as its integer key packed with a hash of
+    the other columns, so a changed row is an update. Other tables are
+    compared as a whole, their columns packed in `key_bits` wide fields.
+    """
+
+    name: str
+    key_columns: tuple[str, ...]
+    key_bits: tuple[int, ...]
+    keyed: bool = True
+    # row number ids of the parser, not stable between snapshots, so they are
+    # neither compared nor kept, inserted rows are renumbered by the loader
+    surrogate: Optional[str] = None
+
+    @cached_property
+    def columns(self) -> list[str]:
+        return [column.name for column in models.db.metadata.tables[self.name].columns]
+
+    @cached_property
+    def _key_indexes(self) -> list[int]:
+        return [self.columns.index(column) for column in self.key_columns]
+
+    @cached_property
+    def _content_indexes(self) -> list[int]:
+        return [
+            idx
+            for idx, column in enumerate(self.columns)
+            if column not in self.key_columns and column != self.surrogate
+        ]
+
+    def get_entry(self, row: list[str]) -> int:
+        key = pack_key([int(row[idx]) for idx in self._key_indexes], self.key_bits)
+        if not self.keyed:
+            return key
+        content = "\t".join([row[idx] for idx in self._content_indexes])
+        return key << HASH_BITS | zlib.crc32(content.encode())
+
+    def get_key(self, entry: int) -> tuple[int, ...]:
+        if self.keyed:
+            entry >>= HASH_BITS
+        return unpack_key(entry, self.key_bits)
+
+
+DELTA_TABLES = [
+    DeltaTable(models.JobModel.__tablename__, ("id",), (31,)),
+    DeltaTable(models.GenreModel.__tablename__, ("id",), (31,)),
+    DeltaTable(models.ProfessionModel.__tablename__, ("id",), (31,)),
+    DeltaTable(models.FilmModel.__tablename__, ("id",), (31,)),
+    DeltaTable(models.PersonModel.__tablename__, ("id",), (31,)),
+    DeltaTable(models.RatingModel.__tablename__, ("film_id",), (31,), surrogate="id"),
+    DeltaTable(
+        models.PrincipalModel.__tablename__,
+        ("film_id", "person_id", "job_id"),
+        (31, 27, 5),
+        keyed=False,
+        surrogate="id",
+    ),
+    # compared by key only, a title edited in place is picked up by the next full load
+    DeltaTable(models.AlternativeModel.__tablename__, ("film_id", "ordering"), (31, 32), keyed=False),
+    DeltaTable(models.PersonFilm.name, ("person_id", "film_id"), (31, 32), keyed=False),
+    DeltaTable(models.GenreFilm.name, ("genre_id", "film_id"), (31, 32), keyed=False),
+    DeltaTable(models.ProfessionPerson.name, ("profession_id", "person_id"), (31, 32), keyed=False),
+]  # parents first, deletes are applied in reverse order
+
+
+def pack_key(values: list[int], bits: tuple[int, ...]) -> int:
+    key = 0
+    for value, width in zip(values, bits):
+        if not 0 <= value < 1 << width:
+            raise ValueError(f"{value} doesn't fit the {width} bits of a delta key")
+        key = key << width | value
+    return key
+
+
+def unpack_key(key: int, bits: tuple[int, ...]) -> tuple[int, ...]:
+    values = []
+    for width in reversed(bits):
+        values.append(key & ((1 << width) - 1))
+        key >>= width
+    return tuple(reversed(values))
+
+
+def difference(left: Iterable[int], right: Iterable[int]) -> Iterator[int]:
+    """
+    Values of the ascending `left` missing from the ascending `right`
+    """
+    right_iter = iter(right)
+    current = next(right_iter, None)
+    for value in left:
+        while current is not None and current < value:
+            current = next(right_iter, None)
+        if current != value:
+            yield value
+
+
+def _keys(entries: Iterable[int]) -> Iterator[int]:
+    return (entry >> HASH_BITS for entry in entries)
+
+
+class DeltaState:
+    """
+    Fingerprints of the snapshot in the database ('current') and of the last
+    parsed one ('next'), with the rows to upsert and the keys to delete
+    turning the former into the latter. The loader promotes 'next' to
+    'current' once it is applied.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.dir = root / DELTA_DIR
+        self.current = self.dir / "current"
+        self.next = self.dir / "next"
+
+    @property
+    def has_snapshot(self) -> bool:
+        return (self.current / CATEGORIES_FILENAME).exists()
+
+    def load_categories(self) -> dict[str, dict[str, int]]:
+        if not self.has_snapshot:
+            return {}
+        with open(self.current / CATEGORIES_FILENAME) as categories_file:
+            return json.load(categories_file)
+
+    def prepare(self) -> None:
+        shutil.rmtree(self.next, ignore_errors=True)
+        self.next.mkdir(parents=True)
+
+    def write_categories(self, categories: dict[str, dict[str, int]]) -> None:
+        with open(self.next / CATEGORIES_FILENAME, "w") as categories_file:
+            json.dump(categories, categories_file)
+
+    def fingerprint_path(self, directory: Path, table_name: str) -> Path:
+        return directory / f"{table_name}.fp"
+
+    def upserts_path(self, table_name: str) -> Path:
+        return self.next / f"{table_name}.upserts.csv"
+
+    def deletes_path(self, table_name: str) -> Path:
+        return self.next / f"{table_name}.deletes.csv"
+
+    def build(self, table: DeltaTable, chunks: list[Path], delimiter: str) -> tuple[int, int]:
+        """
+        Fingerprint the parsed chunks of a table and diff them against the
+        current snapshot. The chunks are read twice, first for the
+        fingerprints, then for the rows of the changed ones, so memory only
+        grows with the number of changes.
+        :return: number of upserted rows and deleted keys
+        """
+        new_path = self.fingerprint_path(self.next, table.name)
+        fingerprints = EdgeStore(self.next / ".spill", table.name)
+        for rows in _read_chunks(chunks, delimiter):
+            fingerprints.extend_packed(table.get_entry(row) for row in rows)
+        fingerprints.dump(new_path)
+        fingerprints.clear()
+
+        old_path = self.fingerprint_path(self.current, table.name)
+        if not self.has_snapshot or not old_path.exists():
+            return 0, 0  # nothing to diff against, the loader loads the chunks in full
+
+        changed = set(difference(read_run(new_path), read_run(old_path)))
+        if table.keyed:
+            deleted: Iterable[int] = difference(_keys(read_run(old_path)), _keys(read_run(new_path)))
+            deleted_keys = ((key,) for key in deleted)
+        else:
+            deleted_keys = map(table.get_key, difference(read_run(old_path), read_run(new_path)))
+
+        upserts = 0
+        with open(self.upserts_path(table.name), "w", newline="") as upserts_file:
+            writer = csv.writer(upserts_file, delimiter=delimiter)
+            for rows in _read_chunks(chunks, delimiter):
+                changed_rows = [row for row in rows if table.get_entry(row) in changed]
+                writer.writerows(changed_rows)
+                upserts += len(changed_rows)
+
+        with open(self.deletes_path(table.name), "w", newline="") as deletes_file:
+            writer = csv.writer(deletes_file, delimiter=delimiter)
+            deletes = 0
+            for key in deleted_keys:
+                writer.writerow(key)
+                deletes += 1
+        return upserts, deletes
+
+    def promote(self) -> None:
+        """
+        Make the applied snapshot the current one
+        """
+        for path in self.next.glob("*.csv"):
+            path.unlink()
+        shutil.rmtree(self.next / ".spill", ignore_errors=True)
+        shutil.rmtree(self.current, ignore_errors=True)
+        self.next.rename(self.current)
+
+    def invalidate(self) -> None:
+        """
+        Forget the current snapshot, the database was loaded without delta
+        """
+        shutil.rmtree(self.current, ignore_errors=True)
+
+
+def _read_chunks(chunks: list[Path], delimiter: str) -> Iterator[list[list[str]]]:
+    for chunk in chunks:
+        with open(chunk, newline="") as chunk_file:
+            rows: list[Any] = []
+            for row in csv.reader(chunk_file, delimiter=delimiter):
+                rows.append(row)
+                if len(rows) >= 10_000:
+                    yield rows
+                    rows = []
+            yield rows
@@ -0,0 +1,164 @@
+import heapq
+import os
+import tempfile
+from array import array
+from itertools import groupby
+from pathlib import Path
+from typing import Iterable, Iterator
+
+BUFFER_LIMIT = 1 << 28  # 256 MiB of packed edges (32M) before a run is spilled
+READ_SIZE = 1 << 16  # edges read at once from every run while merging
+SORT_OVERHEAD = 7  # peak memory of sorting a buffer as Python ints (~6x), in buffer sizes
+MERGE_FAN_IN = 16  # spilled runs merged into one before there are more
+ID_BITS = 32
+ID_MASK = (1 << ID_BITS) - 1
+
+
+class EdgeStore:
+    """
+    Set of (left id, right id) pairs packed into an int64 buffer. Duplicates
+    are removed by sorting; once the buffer exceeds `buffer_limit` bytes it is
+    written to `spill_dir` as a sorted run, and iterating merges all runs.
+    Sorting a buffer temporarily needs SORT_OVERHEAD times its size as Python
+    ints, so `buffer_limit` also bounds that peak. Every MERGE_FAN_IN runs
+    spilled since the last `flush` are merged into one, which keeps the read
+    buffers of the final merge small however small `buffer_limit` is.
+    """
+
+    def __init__(self, spill_dir: Path, name: str = "edges", buffer_limit: int = BUFFER_LIMIT) -> None:
+        self.spill_dir = spill_dir
+        self.name = name
+        self.buffer_limit = buffer_limit
+        self._buffer = array("q")
+        self._runs: list[Path] = []
+        self._flushed = 0  # runs handed out by `flush` or taken over, never merged again
+
+    def add(self, left: int, right: int) -> None:
+        self._buffer.append(left << ID_BITS | right)
+        if self._buffer.itemsize * len(self._buffer) >= self.buffer_limit:
+            self._spill()
+
+    def extend_packed(self, edges: Iterable[int]) -> None:
+        self._buffer.extend(edges)
+        if self._buffer.itemsize * len(self._buffer) >= self.buffer_limit:
+            self._spill()
+
+    def packed(self) -> Iterator[int]:
+        """
+        Yields all packed edges once, in ascending order
+        """
+        self._buffer = _sorted_unique(self._buffer)
+        if not self._runs:
+            yield from self._buffer
+            return
+
+        yield from _merge([self._buffer, *(read_run(run) for run in self._runs)])
+
+    def __iter__(self) -> Iterator[tuple[int, int]]:
+        for edge in self.packed():
+            yield edge >> ID_BITS, edge & ID_MASK
+
+    def dump(self, path: Path) -> int:
+        """
+        Write all packed edges in ascending order, `read_run` reads them back
+        :return: number of edges written
+        """
+        count = 0
+        with open(path, "wb") as dump_file:
+            edges = array("q")
+            for edge in self.packed():
+                edges.append(edge)
+                if len(edges) >= READ_SIZE:
+                    edges.tofile(dump_file)
+                    count += len(edges)
+                    edges = array("q")
+            edges.tofile(dump_file)
+            count += len(edges)
+        return count
+
+    def flush(self) -> list[Path]:
+        """
+        Spill the buffered edges, so all edges are in the returned run files
+        """
+        if self._buffer:
+            self._spill()
+        self._flushed = len(self._runs)
+        return list(self._runs)
+
+    def add_runs(self, runs: Iterable[Path]) -> None:
+        """
+        Take over the run files of a previous `flush`
+        """
+        self._runs.extend(runs)
+        self._flushed = len(self._runs)
+
+    @property
+    def runs(self) -> int:
+        return len(self._runs)
+
+    def clear(self) -> None:
+        self._buffer = array("q")
+        for run in self._runs:
+            run.unlink(missing_ok=True)
+        self._runs = []
+        self._flushed = 0
+
+    def _spill(self) -> None:
+        self._runs.append(self._write_run(_sorted_unique(self._buffer)))
+        self._buffer = array("q")
+        if len(self._runs) - self._flushed >= MERGE_FAN_IN:
+            self._compact()
+
+    def _compact(self) -> None:
+        """
+        Merge the runs spilled since the last `flush` into one. Flushed runs
+        are referenced by a checkpoint and stay as they are.
+        """
+        runs = self._runs[self._flushed :]
+        merged = self._write_run(_merge([read_run(run) for run in runs]))
+        for run in runs:
+            run.unlink()
+        self._runs[self._flushed :] = [merged]
+
+    def _write_run(self, edges: Iterable[int]) -> Path:
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        fd, run_path = tempfile.mkstemp(dir=self.spill_dir, prefix=f"{self.name}.", suffix=".run")
+        with os.fdopen(fd, "wb") as run_file:
+            if isinstance(edges, array):
+                edges.tofile(run_file)
+                return Path(run_path)
+            block = array("q")
+            for edge in edges:
+                block.append(edge)
+                if len(block) >= READ_SIZE:
+                    block.tofile(run_file)
+                    block = array("q")
+            block.tofile(run_file)
+        return Path(run_path)
+
+
+def _sorted_unique(edges: array) -> array:
+    # no set: it would need another few times the buffer size next to the sorted list
+    return array("q", (edge for edge, _ in groupby(sorted(edges))))
+
+
+def _merge(runs: list[Iterable[int]]) -> Iterator[int]:
+    """
+    Yields the edges of ascending runs once, in ascending order
+    """
+    return (edge for edge, _ in groupby(heapq.merge(*runs)))
+
+
+def read_run(run: Path) -> Iterator[int]:
+    """
+    Yields the packed edges of a sorted run or dump file
+    """
+    with open(run, "rb") as run_file:
+        while True:
+            edges = array("q")
+            try:
+                edges.fromfile(run_file, READ_SIZE)
+            except EOFError:
+                yield from edges
+                return
+            yield from edges
@@ -0,0 +1,115 @@
+from pathlib import Path
+from typing import Iterable, Iterator
+
+SPLIT_BLOCK_SIZE = 1 << 12  # bytes of the bitmap counted at once by `split`
+
+
+class IdSet:
+    """
+    Set of non negative integer ids (the numeric part of tt/nm ids) kept as a
+    dense bitmap. IMDb ids are dense, so 30M ids take ~4 MB instead of the
+    gigabytes a `set[int]` needs.
+    """
+
+    def __init__(self, ids: Iterable[int] = ()) -> None:
+        self._bits = bytearray()
+        self._count = 0
+        self.update(ids)
+
+    def add(self, id_: int) -> None:
+        if id_ < 0:
+            raise ValueError(f"Negative id {id_} can't be stored in IdSet")
+        byte, mask = id_ >> 3, 1 << (id_ & 7)
+        if byte >= len(self._bits):
+            self._grow(byte)
+        if not self._bits[byte] & mask:
+            self._bits[byte] |= mask
+            self._count += 1
+
+    def update(self, ids: Iterable[int]) -> None:
+        for id_ in ids:
+            self.add(id_)
+
+    def union_update(self, other: "IdSet") -> None:
+        if len(other._bits) > len(self._bits):
+            self._grow(len(other._bits) - 1)
+        merged = int.from_bytes(self._bits, "little") | int.from_bytes(other._bits, "little")
+        self._bits[:] = merged.to_bytes(len(self._bits), "little")
+        self._count = merged.bit_count()
+
+    def contains_many(self, ids: Iterable[int]) -> list[bool]:
+        """
+        Batch membership test
+        :param ids: integer ids, negative ids are never members
+        :return: list of flags in the order of ids
+        """
+        bits = self._bits
+        size = len(bits) << 3
+        return [
+            0 <= id_ < size and bool(bits[id_ >> 3] & (1 << (id_ & 7))) for id_ in ids
+        ]
+
+    def __contains__(self, id_: object) -> bool:
+        if not isinstance(id_, int) or id_ < 0 or id_ >> 3 >= len(self._bits):
+            return False
+        return bool(self._bits[id_ >> 3] & (1 << (id_ & 7)))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[int]:
+        for byte_idx, byte in enumerate(self._bits):
+            if byte:
+                base = byte_idx << 3
+                for bit in range(8):
+                    if byte & (1 << bit):
+                        yield base + bit
+
+    def split(self, parts: int) -> list[int]:
+        """
+        Ids splitting the set into `parts` ranges of about the same size,
+        blocks of the bitmap are skipped by their popcount
+        :return: first id of every range but the first one, ascending
+        """
+        ranks = [self._count * part // parts for part in range(1, parts)]
+        bounds = []
+        seen = 0
+        for start in range(0, len(self._bits), SPLIT_BLOCK_SIZE):
+            block = int.from_bytes(self._bits[start : start + SPLIT_BLOCK_SIZE], "little")
+            count = block.bit_count()
+            while ranks and ranks[0] < seen + count:
+                bounds.append(self._select(start, ranks.pop(0) - seen))
+            seen += count
+        return bounds
+
+    def _select(self, byte_idx: int, rank: int) -> int:
+        """
+        The `rank`-th (from 0) id from byte `byte_idx` on
+        """
+        while rank >= self._bits[byte_idx].bit_count():
+            rank -= self._bits[byte_idx].bit_count()
+            byte_idx += 1
+        byte = self._bits[byte_idx]
+        for bit in range(8):
+            if byte & (1 << bit):
+                if not rank:
+                    return byte_idx << 3 | bit
+                rank -= 1
+        raise AssertionError("unreachable")
+
+    def dump(self, path: Path) -> None:
+        path.write_bytes(self._bits)
+
+    @classmethod
+    def load(cls, path: Path) -> "IdSet":
+        ids = cls()
+        ids._bits = bytearray(path.read_bytes())
+        ids._count = int.from_bytes(ids._bits, "little").bit_count()
+        return ids
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._bits)
+
+    def _grow(self, byte: int) -> None:
+        self._bits.extend(bytes(max(byte + 1, 2 * len(self._bits)) - len(self._bits)))
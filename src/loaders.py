@@ -0,0 +1,115 @@
+from collections import defaultdict
+from typing import Any, Callable, Hashable
+
+from promise import Promise
+from promise.dataloader import DataLoader
+from sqlalchemy import func
+from sqlalchemy.orm import aliased
+
+from src.pagination import Page
+
+LOADERS_KEY = "loaders"
+
+
+class ModelLoader(DataLoader):  # type: ignore[misc]
+    """
+    Instances of a model by id. The ids requested on one level of a query
+    are loaded with a single `IN (...)` query, instances requested before
+    come from the cache.
+    """
+
+    def __init__(self, model: Any) -> None:
+        super().__init__()
+        self.model = model
+
+    def batch_load_fn(self, ids: list[int]) -> Promise:  # pylint: disable=method-hidden
+        query = self.model.query.filter(self.model.id.in_(ids))
+        instances = {instance.id: instance for instance in query}
+        return Promise.resolve([instances.get(id_) for id_ in ids])
+
+
+class RelatedLoader(DataLoader):  # type: ignore[misc]
+    """
+    Lists of instances related to keys, e.g. the persons of films: `query`
+    selects the instances with all filters applied and `key` is the column
+    relating them to a key. All keys of one level are loaded with a single
+    query filtered by `key IN (...)`.
+    """
+
+    def __init__(self, query: Any, key: Any) -> None:
+        super().__init__()
+        self.query = query
+        self.key = key
+
+    def batch_load_fn(self, keys: list[Any]) -> Promise:  # pylint: disable=method-hidden
+        related = defaultdict(list)
+        for instance, key in self.query.add_columns(self.key).filter(self.key.in_(keys)):
+            related[key].append(instance)
+        return Promise.resolve([related[key] for key in keys])
+
+
+class PageLoader(DataLoader):  # type: ignore[misc]
+    """
+    One `page` of the lists related to keys, like RelatedLoader: the rows of
+    all keys are numbered per key in page order by a window function and the
+    first `page.size + 1` of every key are loaded with a single query
+    """
+
+    def __init__(self, query: Any, key: Any, page: Page) -> None:
+        super().__init__()
+        self.query = query
+        self.key = key
+        self.page = page
+
+    def batch_load_fn(self, keys: list[Any]) -> Promise:  # pylint: disable=method-hidden
+        query = self.query.filter(self.key.in_(keys))
+        condition = self.page.where()
+        if condition is not None:
+            query = query.filter(condition)
+        row_number = func.row_number().over(partition_by=self.key, order_by=self.page.order_by())
+        subquery = query.add_columns(
+            self.key.label("key"), row_number.label("row_number")
+        ).subquery()
+        node = aliased(self.query.column_descriptions[0]["entity"], subquery)
+        rows = (
+            self.query.session.query(node, subquery.c.key)
+            .filter(subquery.c.row_number <= self.page.size + 1)
+            .order_by(subquery.c.key, subquery.c.row_number)
+        )
+        pages = defaultdict(list)
+        for instance, key in rows:
+            pages[key].append(instance)
+        return Promise.resolve([pages[key] for key in keys])
+
+
+class Loaders:
+    """
+    DataLoaders of one GraphQL request by name, so everything they load is
+    cached for the rest of the request and no longer
+    """
+
+    def __init__(self) -> None:
+        self._loaders: dict[Hashable, DataLoader] = {}
+
+    def get(self, name: Hashable, create: Callable[[], DataLoader]) -> DataLoader:
+        loader = self._loaders.get(name)
+        if loader is None:
+            loader = self._loaders[name] = create()
+        return loader
+
+
+def get_loaders(context: Any) -> Loaders:
+    """
+    Loaders of the request being executed, kept in its context: the Flask
+    request GraphQLView passes, or a dict given to `schema.execute`.
+    Without a context every field gets loaders of its own.
+    """
+    if context is None:
+        return Loaders()
+    if isinstance(context, dict):
+        return context.setdefault(LOADERS_KEY, Loaders())
+    loaders = getattr(context, LOADERS_KEY, None)
+    if loaders is None:
+        loaders = Loaders()
+        setattr(context, LOADERS_KEY, loaders)
+    return loaders
@@ -6,20 +6,38 @@ db = SQLAlchemy()
 
 PersonFilm = db.Table(
     "person_film",
-    db.Column("person_id", db.Integer, db.ForeignKey("person.id")),
-    db.Column("film_id", db.Integer, db.ForeignKey("film.id")),
+    db.Column("person_id", db.Integer, db.ForeignKey("person.id"), index=True),
+    db.Column("film_id", db.Integer, db.ForeignKey("film.id"), index=True),
 )
 
 ProfessionPerson = db.Table(
     "profession_person",
     db.Column("profession_id", db.Integer, db.ForeignKey("profession.id")),
-    db.Column("person_id", db.Integer, db.ForeignKey("person.id")),
+    db.Column("person_id", db.Integer, db.ForeignKey("person.id"), index=True),
 )
 
 GenreFilm = db.Table(
     "genre_film",
     db.Column("genre_id", db.Integer, db.ForeignKey("genre.id")),
-    db.Column("film_id", db.Integer, db.ForeignKey("film.id")),
+    db.Column("film_id", db.Integer, db.ForeignKey("film.id"), index=True),
+)
+
+# chunk files committed by DatasetLoader, a load with --checkpoint skips them
+LoadCheckpoint = db.Table(
+    "load_checkpoint",
+    db.Column("chunk", db.String, primary_key=True),
+    db.Column("rows", db.BigInteger),
+    db.Column("checksum", db.BigInteger),
+    db.Column("loaded_at", db.DateTime(timezone=True), server_default=db.func.now()),
+)
+
+# single row counting the loads of the live tables, cached GraphQL responses
+# of an older generation are stale
+DataGeneration = db.Table(
+    "data_generation",
+    db.Column("id", db.Integer, primary_key=True),
+    db.Column("generation", db.BigInteger, nullable=False),
+    db.Column("loaded_at", db.DateTime(timezone=True), server_default=db.func.now()),
 )
 
 
@@ -45,6 +63,7 @@ class FilmModel(db.Model):
     genres = db.relationship(
         "GenreModel", secondary=GenreFilm, cascade="delete,all", back_populates="films"
     )
+    alternatives = db.relationship("AlternativeModel", backref="film", cascade="delete,all")
 
 
 class PersonModel(db.Model):
@@ -88,8 +107,9 @@ class PrincipalModel(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
 
-    film_id = db.Column(db.Integer, db.ForeignKey("film.id"))
-    person_id = db.Column(db.Integer, db.ForeignKey("person.id"))
+    film_id = db.Column(db.Integer, db.ForeignKey("film.id"), index=True)
+    person_id = db.Column(db.Integer, db.ForeignKey("person.id"), index=True)
+    # like genre_id and profession_id, too few distinct values for an index to pay off
     job_id = db.Column(db.Integer, db.ForeignKey("job.id"))
 
     job = db.relationship("JobModel", uselist=False, back_populates="principals")
@@ -102,7 +122,33 @@ class RatingModel(db.Model):
     average_rating = db.Column(db.Float)
     num_votes = db.Column(db.Integer)
 
-    film_id = db.Column(db.Integer, db.ForeignKey("film.id"))
+    film_id = db.Column(db.Integer, db.ForeignKey("film.id"), index=True)
+
+
+class AlternativeModel(db.Model):
+    """
+    Alternative (regional, translated, original) titles of a film from
+    title.akas, without its free text `types` and `attributes` columns
+    """
+
+    __tablename__ = "alternative"
+
+    # the primary key index also serves the lookups by film
+    film_id = db.Column(db.Integer, db.ForeignKey("film.id"), primary_key=True)
+    ordering = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    title = db.Column(db.String, nullable=False)
+    region = db.Column(db.String(4))
+    language = db.Column(db.String(3))
+    is_original_title = db.Column(db.Boolean)
+
+    # case insensitive prefix searches of `lower(title) LIKE 'abc%'` are index range scans
+    __table_args__ = (
+        db.Index(
+            "ix_alternative_title",
+            db.func.lower(title).label("title_lower"),
+            postgresql_ops={"title_lower": "text_pattern_ops"},
+        ),
+    )
 
 
 class ProfessionModel(db.Model):
@@ -0,0 +1,142 @@
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Sequence
+
+import graphene
+from graphql import GraphQLError
+from sqlalchemy import and_, tuple_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+
+class CountableConnection(graphene.relay.Connection):
+    """
+    Relay connection with the total number of nodes, counted only when the
+    field is requested
+    """
+
+    class Meta:
+        abstract = True
+
+    total_count = graphene.Int()
+
+    def resolve_total_count(self, _):
+        return self.count()
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode()).decode()
+
+
+def decode_cursor(cursor: str, size: int) -> list[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, binascii.Error):
+        raise GraphQLError(f"Invalid cursor '{cursor}'") from None
+    if not isinstance(values, list) or len(values) != size:
+        raise GraphQLError(f"Invalid cursor '{cursor}'")
+    return values
+
+
+@dataclass(frozen=True)
+class Page:
+    """
+    One page of a connection in keyset order: the cursor of a node holds its
+    values of the `order` columns, which end with a unique one, and the
+    next page starts right after it with `(columns) > (values)`. An index on
+    the first column serves every page as cheaply as the first, however deep.
+    """
+
+    order: tuple[Any, ...]
+    size: int
+    forward: bool = True
+    position: Optional[list[Any]] = None
+
+    @classmethod
+    def from_args(
+        cls,
+        order: Sequence[Any],
+        first: Optional[int] = None,
+        after: Optional[str] = None,
+        last: Optional[int] = None,
+        before: Optional[str] = None,
+    ) -> "Page":
+        if first is not None and last is not None:
+            raise GraphQLError("Pass either 'first' or 'last', not both")
+        if (first is not None and before) or (last is not None and after):
+            raise GraphQLError("Pass 'first' with 'after' or 'last' with 'before'")
+        forward = last is None and not before
+        size = first if forward else last
+        if size is None:
+            size = DEFAULT_PAGE_SIZE
+        if not 0 < size <= MAX_PAGE_SIZE:
+            raise GraphQLError(f"Page size must be between 1 and {MAX_PAGE_SIZE}, got {size}")
+        cursor = after if forward else before
+        position = decode_cursor(cursor, len(order)) if cursor else None
+        return cls(tuple(order), size, forward, position)
+
+    def where(self) -> Optional[Any]:
+        """
+        Keyset condition of the nodes after (before) the cursor
+        """
+        if self.position is None:
+            return None
+        first_column, first_value = self.order[0], self.position[0]
+        if len(self.order) == 1:
+            return first_column > first_value if self.forward else first_column < first_value
+        columns, values = tuple_(*self.order), tuple_(*self.position)
+        # the bound on the first column alone is what an index on it can use
+        if self.forward:
+            return and_(first_column >= first_value, columns > values)
+        return and_(first_column <= first_value, columns < values)
+
+    def order_by(self) -> list[Any]:
+        return [column if self.forward else column.desc() for column in self.order]
+
+    def apply(self, query: Any) -> Any:
+        """
+        The query limited to the nodes of the page and one more, which tells
+        whether there is another page
+        """
+        condition = self.where()
+        if condition is not None:
+            query = query.filter(condition)
+        return query.order_by(*self.order_by()).limit(self.size + 1)
+
+    def connection(self, connection_type: Any, nodes: list[Any], count: Callable[[], int]) -> Any:
+        """
+        :param nodes: result of the query returned by `apply`
+        :param count: number of nodes on all pages, for `totalCount`
+        """
+        more = len(nodes) > self.size
+        nodes = nodes[: self.size]
+        if not self.forward:
+            nodes.reverse()
+        edges = [
+            connection_type.Edge(node=node, cursor=encode_cursor(self.get_values(node)))
+            for node in nodes
+        ]
+        page_info = graphene.relay.PageInfo(
+            has_next_page=more if self.forward else self.position is not None,
+            has_previous_page=self.position is not None if self.forward else more,
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+        )
+        connection = connection_type(edges=edges, page_info=page_info)
+        connection.count = count
+        return connection
+
+    def get_values(self, node: Any) -> list[Any]:
+        return [getattr(node, column.key) for column in self.order]
+
+
+def paginate(connection_type: Any, query: Any, order: Sequence[Any], **args: Any) -> Any:
+    """
+    Connection of one page of the query in keyset `order`
+    :param args: first, after, last and before of the connection field
+    """
+    page = Page.from_args(order, **args)
+    return page.connection(connection_type, page.apply(query).all(), query.order_by(None).count)
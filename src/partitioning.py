@@ -0,0 +1,123 @@
+import json
+import re
+from bisect import bisect_right
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional
+
+from src import models
+from src.bulk_load import DIALECT, create_index
+from src.id_set import IdSet
+
+PARTITIONS_FILENAME = "partitions.json"
+PARTITION_KEY = "film_id"
+PARTITIONED_TABLES = (models.PrincipalModel.__tablename__, models.PersonFilm.name)
+
+_PARTITION_SUFFIX = re.compile(r"\.p(\d+)")
+
+
+@dataclass(frozen=True)
+class Partitioning:
+    """
+    Range partitions of the biggest tables (PARTITIONED_TABLES) on film_id.
+    `bounds` are the first film ids of partitions 1..n-1, picked by the parser
+    so every partition holds about as many films. The parser writes the rows
+    of a partition into their own chunk files ('<table>.csv.00.p03'), which
+    the loader copies straight into the partition table ('<table>_p03').
+    """
+
+    bounds: tuple[int, ...]
+
+    @classmethod
+    def from_ids(cls, film_ids: IdSet, partitions: int) -> "Partitioning":
+        return cls(tuple(sorted(set(film_ids.split(partitions)))))
+
+    @property
+    def count(self) -> int:
+        return len(self.bounds) + 1
+
+    def get_partition(self, film_id: int) -> int:
+        return bisect_right(self.bounds, film_id)
+
+    def save(self, root: Path) -> None:
+        with open(root / PARTITIONS_FILENAME, "w") as partitions_file:
+            json.dump({"key": PARTITION_KEY, "bounds": list(self.bounds)}, partitions_file)
+
+    @classmethod
+    def load(cls, root: Path) -> Optional["Partitioning"]:
+        path = root / PARTITIONS_FILENAME
+        if not path.exists():
+            return None
+        with open(path) as partitions_file:
+            return cls(tuple(json.load(partitions_file)["bounds"]))
+
+    @staticmethod
+    def remove(root: Path) -> None:
+        (root / PARTITIONS_FILENAME).unlink(missing_ok=True)
+
+    def partition_names(self, table: Any) -> list[str]:
+        return [partition_name(table.name, idx) for idx in range(self.count)]
+
+    def create_table(self, table: Any, unlogged: bool = False) -> list[str]:
+        """
+        The partitioned table and its partitions, without primary key,
+        indexes and foreign keys. A primary key of a partitioned table would
+        have to include film_id, so every partition gets its own instead.
+        Only the partitions are UNLOGGED, a partitioned table has no storage
+        and stays unlogged when set LOGGED.
+        """
+        persistence = "UNLOGGED " if unlogged else ""
+        columns = ", ".join(
+            f"{column.name} {column.type.compile(dialect=DIALECT)}" + ("" if column.nullable else " NOT NULL")
+            for column in table.columns
+        )
+        statements = [f"CREATE TABLE {table.name} ({columns}) PARTITION BY RANGE ({PARTITION_KEY})"]
+        lower = "MINVALUE"
+        for idx, upper in enumerate([*map(str, self.bounds), "MAXVALUE"]):
+            statements.append(
+                f"CREATE {persistence}TABLE {partition_name(table.name, idx)} PARTITION OF {table.name} "
+                f"FOR VALUES FROM ({lower}) TO ({upper})"
+            )
+            lower = upper
+        return statements
+
+    def index_statements(self, table: Any) -> list[str]:
+        """
+        Primary key and indexes of every partition, independent of each other
+        """
+        statements = []
+        for idx in range(self.count):
+            name = partition_name(table.name, idx)
+            if table.primary_key.columns:
+                columns = ", ".join(column.name for column in table.primary_key.columns)
+                statements.append(f"ALTER TABLE {name} ADD PRIMARY KEY ({columns})")
+            for index in table.indexes:
+                columns = ", ".join(column.name for column in index.columns)
+                statements.append(f"CREATE INDEX {index.name}_p{idx:02d} ON {name} ({columns})")
+        return statements
+
+    def attach_statements(self, table: Any) -> list[str]:
+        """
+        Indexes of the partitioned table made of the partition indexes
+        """
+        statements = []
+        for index in table.indexes:
+            statements.append(create_index(index).replace(f" ON {table.name} ", f" ON ONLY {table.name} ", 1))
+            statements.extend(
+                f"ALTER INDEX {index.name} ATTACH PARTITION {index.name}_p{idx:02d}" for idx in range(self.count)
+            )
+        return statements
+
+
+def partition_name(table_name: str, idx: int) -> str:
+    return f"{table_name}_p{idx:02d}"
+
+
+def get_chunk_table(table_name: str, chunk: Path) -> str:
+    """
+    Table a chunk file is copied into: its partition for partition chunks
+    """
+    match = _PARTITION_SUFFIX.fullmatch(chunk.suffix)
+    if table_name in PARTITIONED_TABLES and match:
+        return partition_name(table_name, int(match.group(1)))
+    return table_name
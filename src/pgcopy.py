@@ -0,0 +1,103 @@
+import struct
+from typing import Any, Callable, Iterable, Sequence
+
+from sqlalchemy import Boolean, Column, Float, Integer, SmallInteger
+
+from src.utils import to_bool
+
+HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+TRAILER = struct.pack("!h", -1)
+NULL = struct.pack("!i", -1)
+PGCOPY_EXTENSION = "pgcopy"
+NULL_VALUE = "\\N"  # NULL marker of the text format, kept for the same rows
+
+_INT2 = struct.Struct("!ih")
+_INT4 = struct.Struct("!ii")
+_FLOAT8 = struct.Struct("!id")
+_BOOL = struct.Struct("!i?")
+_LENGTH = struct.Struct("!i")
+
+Encoder = Callable[[Any], bytes]
+
+
+def _encode_smallint(value: Any) -> bytes:
+    return _INT2.pack(2, int(value))
+
+
+def _encode_int(value: Any) -> bytes:
+    return _INT4.pack(4, int(value))
+
+
+def _encode_float(value: Any) -> bytes:
+    return _FLOAT8.pack(8, float(value))
+
+
+def _encode_bool(value: Any) -> bytes:
+    return _BOOL.pack(1, to_bool(value))
+
+
+def _encode_text(value: Any) -> bytes:
+    data = str(value).encode()
+    return _LENGTH.pack(len(data)) + data
+
+
+def _nullable(encode: Encoder) -> Encoder:
+    def encode_nullable(value: Any) -> bytes:
+        if value is None or value == NULL_VALUE:
+            return NULL
+        return encode(value)
+
+    return encode_nullable
+
+
+def get_encoder(column: Column) -> Encoder:
+    if isinstance(column.type, Boolean):
+        encode = _encode_bool
+    elif isinstance(column.type, SmallInteger):
+        encode = _encode_smallint
+    elif isinstance(column.type, Integer):
+        encode = _encode_int
+    elif isinstance(column.type, Float):
+        encode = _encode_float
+    else:
+        encode = _encode_text
+    return _nullable(encode)
+
+
+class RowEncoder:
+    """
+    Encodes rows as tuples of the PostgreSQL binary COPY format, column
+    types are taken from the table definition in `models`.
+    Rows of integer-only tables (principal, person_film, ...) are packed
+    with a single struct call.
+    """
+
+    def __init__(self, columns: Sequence[Column]) -> None:
+        self.encoders = [get_encoder(column) for column in columns]
+        self._count = struct.pack("!h", len(columns))
+        self._fixed = None
+        if all(type(column.type) is Integer for column in columns):
+            self._fixed = struct.Struct("!h" + "ii" * len(columns))
+            # field count followed by (length, value) pairs, values are filled in per row
+            self._fixed_args: list[Any] = [len(columns)] + [4, 0] * len(columns)
+
+    def encode(self, row: Sequence[Any]) -> bytes:
+        return self.encode_rows([row])
+
+    def encode_rows(self, rows: Iterable[Sequence[Any]]) -> bytes:
+        if self._fixed is None:
+            return b"".join(map(self._encode_fields, rows))
+
+        pack, args = self._fixed.pack, self._fixed_args
+        encoded = []
+        for row in rows:
+            args[2::2] = row
+            try:
+                encoded.append(pack(*args))
+            except struct.error:
+                # NULL or non int values
+                encoded.append(self._encode_fields(row))
+        return b"".join(encoded)
+
+    def _encode_fields(self, row: Sequence[Any]) -> bytes:
+        return self._count + b"".join(encode(value) for encode, value in zip(self.encoders, row))
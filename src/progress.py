@@ -0,0 +1,132 @@
+import json
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterator
+
+from src.utils import overwrite_upper_line
+
+REFRESH_INTERVAL = 0.2
+REPORT_FILENAME = "run_report.json"
+
+
+class ProgressLine:
+    """
+    Status line which is re-rendered at most every `interval` seconds,
+    however often `update` is called
+    """
+
+    def __init__(self, status_line: str, quiet: bool = False, interval: float = REFRESH_INTERVAL) -> None:
+        self.status_line = status_line
+        self.quiet = quiet
+        self.interval = interval
+        self.rows = 0
+        self.started = time.perf_counter()
+        self._rendered_at = self.started
+        if not quiet:
+            print(f"{self._format(0)} ...")
+
+    def update(self, progress: float, rows: int = 0) -> None:
+        self.rows += rows
+        if self.quiet:
+            return
+        now = time.perf_counter()
+        if now - self._rendered_at >= self.interval:
+            self._rendered_at = now
+            overwrite_upper_line(self._format(progress))
+
+    def done(self) -> None:
+        overwrite_upper_line(f"{self._format(100)} done", self.quiet)
+
+    def _format(self, progress: float) -> str:
+        elapsed = time.perf_counter() - self.started
+        rate = f", {self.rows / elapsed:,.0f} rows/s" if self.rows and elapsed else ""
+        return f"{self.status_line}: {progress:.2f}%{rate}"
+
+
+@dataclass
+class DatasetMetrics:
+    rows: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "seconds": round(self.seconds, 3),
+            "rows_per_sec": round(self.rows / self.seconds, 1) if self.seconds else None,
+            "bytes_per_sec": round(self.bytes / self.seconds, 1) if self.seconds else None,
+        }
+
+
+@dataclass
+class StageMetrics:
+    seconds: float = 0.0
+    datasets: dict[str, DatasetMetrics] = field(default_factory=dict)
+
+    def dataset(self, name: str) -> DatasetMetrics:
+        return self.datasets.setdefault(name, DatasetMetrics())
+
+    @contextmanager
+    def measure(self, name: str) -> Iterator[DatasetMetrics]:
+        metrics = self.dataset(name)
+        started = time.perf_counter()
+        try:
+            yield metrics
+        finally:
+            metrics.seconds += time.perf_counter() - started
+
+    def to_dict(self) -> dict[str, Any]:
+        totals = DatasetMetrics(
+            rows=sum(metrics.rows for metrics in self.datasets.values()),
+            bytes=sum(metrics.bytes for metrics in self.datasets.values()),
+            seconds=self.seconds,
+        )
+        return {
+            **totals.to_dict(),
+            "datasets": {name: metrics.to_dict() for name, metrics in self.datasets.items()},
+        }
+
+
+@dataclass
+class RunReport:
+    """
+    Timings and throughput of every stage (download, extract, parse,
+    load) of a run, written as JSON at the end
+    """
+
+    started: float = field(default_factory=time.time)
+    stages: dict[str, StageMetrics] = field(default_factory=dict)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageMetrics]:
+        metrics = self.stages.setdefault(name, StageMetrics())
+        started = time.perf_counter()
+        try:
+            yield metrics
+        finally:
+            metrics.seconds += time.perf_counter() - started
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "seconds": round(sum(stage.seconds for stage in self.stages.values()), 3),
+            "stages": {name: stage.to_dict() for name, stage in self.stages.items()},
+        }
+
+    def write(self, path: Path) -> None:
+        with open(path, "w") as report_file:
+            json.dump(self.to_dict(), report_file, indent=2)
+
+    def summary(self) -> str:
+        lines = [f"{'stage':<10}{'seconds':>10}{'rows':>14}{'rows/s':>12}{'MB/s':>10}"]
+        for name, stage in self.stages.items():
+            totals = stage.to_dict()
+            rows_per_sec = totals["rows_per_sec"] or 0
+            mb_per_sec = (totals["bytes_per_sec"] or 0) / 1e6
+            lines.append(
+                f"{name:<10}{stage.seconds:>10.1f}{totals['rows']:>14,}{rows_per_sec:>12,.0f}{mb_per_sec:>10.1f}"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,228 @@
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from flask import Response, request
+from flask_graphql import GraphQLView
+from graphql import parse, print_ast
+from graphql.error import GraphQLSyntaxError
+from graphql_server import HttpQueryError
+from sqlalchemy import select
+from sqlalchemy.exc import ProgrammingError
+
+from src import models
+from src.utils import ResponseCacheConfig
+
+CACHE_SIZE = 1024  # responses
+CACHE_TTL = 3600.0  # seconds
+GENERATION_INTERVAL = 1.0  # seconds between reads of the data generation
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def normalize_query(query: str) -> Optional[str]:
+    """
+    The query document printed from its AST, so queries differing only in
+    whitespace and comments are the same. None for documents that don't
+    parse or have operations other than queries, which are never cached.
+    """
+    try:
+        document = parse(query)
+    except GraphQLSyntaxError:
+        return None
+    operations = [getattr(definition, "operation", "query") for definition in document.definitions]
+    if any(operation != "query" for operation in operations):
+        return None
+    return print_ast(document)
+
+
+def get_cache_key(params: dict[str, Any]) -> Optional[str]:
+    """
+    Key of a GraphQL request by its normalized query, variables and
+    operation name, None if it can't be cached
+    """
+    query = normalize_query(params.get("query") or "")
+    if query is None:
+        return None
+    variables = params.get("variables") or None
+    if isinstance(variables, str):
+        try:
+            variables = json.loads(variables)
+        except ValueError:
+            return None
+    key = json.dumps([query, variables, params.get("operationName")], sort_keys=True)
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    LRU cache of encoded GraphQL responses of one data generation: all of
+    them are dropped as soon as a newer generation is seen, and each one
+    when it's older than `ttl` seconds. With `path` the responses are
+    written there by `save` and read back on start.
+    """
+
+    def __init__(
+        self,
+        size: int = CACHE_SIZE,
+        ttl: float = CACHE_TTL,
+        path: Optional[Path] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.size = size
+        self.ttl = ttl
+        self.path = path
+        self.clock = clock
+        self.generation: Optional[int] = None
+        self._responses: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+        if path is not None and path.exists():
+            self._load(path)
+
+    def __len__(self) -> int:
+        return len(self._responses)
+
+    def get(self, key: str, generation: int) -> Optional[str]:
+        with self._lock:
+            self._set_generation(generation)
+            cached = self._responses.get(key)
+            if cached is None:
+                return None
+            expires_at, response = cached
+            if expires_at <= self.clock():
+                del self._responses[key]
+                return None
+            self._responses.move_to_end(key)
+            return response
+
+    def set(self, key: str, generation: int, response: str) -> None:
+        with self._lock:
+            self._set_generation(generation)
+            self._responses[key] = (self.clock() + self.ttl, response)
+            self._responses.move_to_end(key)
+            while len(self._responses) > self.size:
+                self._responses.popitem(last=False)
+
+    def save(self) -> None:
+        """
+        Write the responses to `path`, replacing the previous file at once
+        """
+        if self.path is None:
+            return
+        with self._lock:
+            state = {"generation": self.generation, "responses": list(self._responses.items())}
+        tmp_path = self.path.with_name(f"{self.path.name}.tmp")
+        tmp_path.write_text(json.dumps(state))
+        os.replace(tmp_path, self.path)
+
+    def _load(self, path: Path) -> None:
+        try:
+            state = json.loads(path.read_text())
+        except ValueError:
+            return  # written by an older version or broken, start empty
+        now = self.clock()
+        self.generation = state["generation"]
+        for key, (expires_at, response) in state["responses"][-self.size :]:
+            if expires_at > now:
+                self._responses[key] = (expires_at, response)
+
+    def _set_generation(self, generation: int) -> None:
+        if generation != self.generation:
+            self._responses.clear()
+            self.generation = generation
+
+
+class GenerationCounter:
+    """
+    Generation of the data bumped by DatasetLoader after every load, read
+    from the database at most every `interval` seconds so cached responses
+    are served without a query. Responses may be stale for that long after
+    a load.
+    """
+
+    def __init__(
+        self, interval: float = GENERATION_INTERVAL, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.interval = interval
+        self.clock = clock
+        self._generation = 0
+        self._read_at: Optional[float] = None
+
+    def get(self, engine: Any) -> int:
+        now = self.clock()
+        if self._read_at is None or now - self._read_at >= self.interval:
+            self._generation = self._read(engine)
+            self._read_at = now
+        return self._generation
+
+    @staticmethod
+    def _read(engine: Any) -> int:
+        column = models.DataGeneration.c.generation
+        try:
+            return engine.execute(select([column])).scalar() or 0
+        except ProgrammingError:
+            return 0  # nothing loaded since the table was added
+
+
+class CachedGraphQLView(GraphQLView):
+    """
+    GraphQLView answering repeated queries from a ResponseCache until the
+    data generation changes. Only successful single queries are cached,
+    GraphiQL pages and batches always run.
+    """
+
+    cache: Optional[ResponseCache] = None
+    generation: Optional[GenerationCounter] = None
+
+    def dispatch_request(self) -> Response:
+        key = self.get_cache_key()
+        if key is None:
+            return super().dispatch_request()
+        generation = self.generation.get(models.db.engine)
+        response = self.cache.get(key, generation)
+        if response is not None:
+            return Response(response, status=200, content_type="application/json")
+
+        result = super().dispatch_request()
+        if result.status_code == 200:
+            response = result.get_data(as_text=True)
+            if not json.loads(response).get("errors"):
+                self.cache.set(key, generation, response)
+        return result
+
+    def get_cache_key(self) -> Optional[str]:
+        if self.cache is None or request.method not in ("GET", "POST"):
+            return None
+        if request.args.get("pretty"):
+            return None
+        if request.method == "GET" and self.should_display_graphiql():
+            return None
+        try:
+            data = self.parse_body()
+        except HttpQueryError:
+            return None  # answered with an error by the view
+        if not isinstance(data, dict):
+            return None
+        return get_cache_key({**request.args.to_dict(), **data})
+
+
+def create_cache(config: ResponseCacheConfig) -> tuple[ResponseCache, GenerationCounter]:
+    """
+    Cache and generation of the `response_cache` section of the config,
+    a persisted cache is saved when the process exits
+    """
+    path = config.get("path")
+    cache = ResponseCache(
+        size=config.get("size", CACHE_SIZE),
+        ttl=config.get("ttl", CACHE_TTL),
+        path=Path(path).expanduser() if path else None,
+    )
+    if cache.path is not None:
+        atexit.register(cache.save)
+    return cache, GenerationCounter(config.get("generation_interval", GENERATION_INTERVAL))
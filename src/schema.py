@@ -1,11 +1,64 @@
 from typing import Optional
 import graphene
 from graphene_sqlalchemy import SQLAlchemyObjectType
-from sqlalchemy.sql.functions import count
+from sqlalchemy.sql.functions import count, func
 
 import src.models as models
+from src.loaders import ModelLoader, PageLoader, RelatedLoader, get_loaders
+from src.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, CountableConnection, Page, paginate
 
-QUERY_LIMIT = 50
+QUERY_LIMIT = DEFAULT_PAGE_SIZE
+
+
+def load_model(info, model, id_):
+    """
+    Instance of a model by id, batched with all others of the same model
+    requested on this level and cached for the request
+    """
+    return get_loaders(info.context).get(model, lambda: ModelLoader(model)).load(id_)
+
+
+def load_page(info, name, query, key, parent_id, connection_type, args):
+    """
+    Connection of the nodes related to a parent, the same page of the
+    nodes of all parents on this level is loaded with one query
+    :param name: field, the loader is shared by the parents with the same arguments
+    """
+    page = Page.from_args([query.column_descriptions[0]["entity"].id], **args)
+    loader = get_loaders(info.context).get(
+        (name, tuple(sorted(args.items()))), lambda: PageLoader(query, key, page)
+    )
+    count = query.filter(key == parent_id).order_by(None).count
+    return loader.load(parent_id).then(lambda nodes: page.connection(connection_type, nodes, count))
+
+
+def filter_films(query, search: Optional[str] = None, genre: Optional[str] = None, period=None):
+    """
+    Films matching the filters of the films connections, without joins so
+    every film is one row to paginate
+    """
+    return (
+        query.filter(models.FilmModel.title.ilike(search) if search else True)
+        .filter(models.FilmModel.genres.any(models.GenreModel.genre == genre) if genre else True)
+        .filter(
+            models.FilmModel.start_year.between(period[0], period[1]) if period else True
+        )
+    )
+
+
+def filter_persons(query, search: Optional[str] = None, profession: Optional[str] = None):
+    """
+    Persons matching the filters of the persons connections, without joins
+    """
+    return query.filter(models.PersonModel.name.ilike(search) if search else True).filter(
+        models.PersonModel.professions.any(models.ProfessionModel.profession == profession)
+        if profession
+        else True
+    )
+
+
+def get_limit(limit: int) -> int:
+    return min(limit, MAX_PAGE_SIZE)
 
 
 class ActiveSQLAlchemyObjectType(SQLAlchemyObjectType):
@@ -20,21 +73,42 @@ class FilmType(ActiveSQLAlchemyObjectType):
     persons = graphene.List(
         lambda: PersonType, search=graphene.String(), profession=graphene.String()
     )
+    persons_connection = graphene.relay.ConnectionField(
+        lambda: PersonConnection, search=graphene.String(), profession=graphene.String()
+    )
 
     def resolve_persons(
         self, info, search: Optional[str] = None, profession: Optional[str] = None
     ):
-        query = PersonType.get_query(info)
-        return (
-            query.join(models.ProfessionPerson)
-            .join(models.ProfessionModel)
-            .join(models.PersonFilm)
-            .join(models.FilmModel)
-            .filter(models.PersonModel.name.ilike(search) if search else True)
-            .filter(
-                models.ProfessionModel.profession == profession if profession else True
+        def create_loader():
+            query = PersonType.get_query(info)
+            return RelatedLoader(
+                query.join(models.ProfessionPerson)
+                .join(models.ProfessionModel)
+                .join(models.PersonFilm)
+                .filter(models.PersonModel.name.ilike(search) if search else True)
+                .filter(
+                    models.ProfessionModel.profession == profession if profession else True
+                ),
+                models.PersonFilm.c.film_id,
             )
-            .filter(models.FilmModel.id == self.id)
+
+        loaders = get_loaders(info.context)
+        return loaders.get(("film.persons", search, profession), create_loader).load(self.id)
+
+    def resolve_persons_connection(
+        self, info, search: Optional[str] = None, profession: Optional[str] = None, **args
+    ):
+        query = filter_persons(PersonType.get_query(info), search, profession)
+        query = query.join(models.PersonFilm)
+        return load_page(
+            info,
+            ("film.persons_connection", search, profession),
+            query,
+            models.PersonFilm.c.film_id,
+            self.id,
+            PersonConnection,
+            args,
         )
 
 
@@ -48,22 +122,47 @@ class PersonType(ActiveSQLAlchemyObjectType):
         genre=graphene.String(),
         period=graphene.List(graphene.Int),
     )
+    films_connection = graphene.relay.ConnectionField(
+        lambda: FilmConnection,
+        search=graphene.String(),
+        genre=graphene.String(),
+        period=graphene.List(graphene.Int),
+    )
 
     def resolve_films(self, info, search: str = None, genre: str = None, period=None):
-        query = FilmType.get_query(info)
-        return (
-            query.join(models.GenreFilm)
-            .join(models.GenreModel)
-            .join(models.PersonFilm)
-            .join(models.PersonModel)
-            .filter(models.FilmModel.title.ilike(search) if search else True)
-            .filter(models.GenreModel.genre == genre if genre else True)
-            .filter(
-                models.FilmModel.start_year.between(period[0], period[1])
-                if period
-                else True
+        def create_loader():
+            query = FilmType.get_query(info)
+            return RelatedLoader(
+                query.join(models.GenreFilm)
+                .join(models.GenreModel)
+                .join(models.PersonFilm)
+                .filter(models.FilmModel.title.ilike(search) if search else True)
+                .filter(models.GenreModel.genre == genre if genre else True)
+                .filter(
+                    models.FilmModel.start_year.between(period[0], period[1])
+                    if period
+                    else True
+                ),
+                models.PersonFilm.c.person_id,
             )
-            .filter(models.PersonModel.id == self.id)
+
+        loaders = get_loaders(info.context)
+        period_key = tuple(period) if period else None
+        return loaders.get(("person.films", search, genre, period_key), create_loader).load(self.id)
+
+    def resolve_films_connection(
+        self, info, search: str = None, genre: str = None, period=None, **args
+    ):
+        query = filter_films(FilmType.get_query(info), search, genre, period)
+        query = query.join(models.PersonFilm)
+        return load_page(
+            info,
+            ("person.films_connection", search, genre, tuple(period) if period else None),
+            query,
+            models.PersonFilm.c.person_id,
+            self.id,
+            FilmConnection,
+            args,
         )
 
 
@@ -78,14 +177,35 @@ class PrincipalType(ActiveSQLAlchemyObjectType):
     person: models.PersonModel = PersonType()
     film: models.FilmModel = FilmType()
 
-    def resolve_name(self, _):
-        return self.person.name
+    def resolve_person(self, info):
+        return load_model(info, models.PersonModel, self.person_id)
+
+    def resolve_film(self, info):
+        return load_model(info, models.FilmModel, self.film_id)
 
-    def resolve_title(self, _):
-        return self.film.title
+    def resolve_name(self, info):
+        return load_model(info, models.PersonModel, self.person_id).then(lambda person: person.name)
 
-    def resolve_job(self, _):
-        return self.job.job
+    def resolve_title(self, info):
+        return load_model(info, models.FilmModel, self.film_id).then(lambda film: film.title)
+
+    def resolve_job(self, info):
+        return load_model(info, models.JobModel, self.job_id).then(lambda job: job.job)
+
+
+class FilmConnection(CountableConnection):
+    class Meta:
+        node = FilmType
+
+
+class PersonConnection(CountableConnection):
+    class Meta:
+        node = PersonType
+
+
+class PrincipalConnection(CountableConnection):
+    class Meta:
+        node = PrincipalType
 
 
 class JobType(ActiveSQLAlchemyObjectType):
@@ -98,6 +218,16 @@ class RatingType(ActiveSQLAlchemyObjectType):
         model = models.RatingModel
 
 
+class RatingConnection(CountableConnection):
+    class Meta:
+        node = RatingType
+
+
+class AlternativeType(ActiveSQLAlchemyObjectType):
+    class Meta:
+        model = models.AlternativeModel
+
+
 class GenreType(ActiveSQLAlchemyObjectType):
     class Meta:
         model = models.GenreModel
@@ -117,7 +247,16 @@ class Query(graphene.ObjectType):
         period=graphene.List(graphene.Int),
         limit=graphene.Int(),
     )
+    films_connection = graphene.relay.ConnectionField(
+        lambda: FilmConnection,
+        search=graphene.String(),
+        genre=graphene.String(),
+        period=graphene.List(graphene.Int),
+    )
     common_films = graphene.List(lambda: FilmType, names=graphene.List(graphene.String))
+    common_films_connection = graphene.relay.ConnectionField(
+        lambda: FilmConnection, names=graphene.List(graphene.String, required=True)
+    )
     person = graphene.List(lambda: PersonType, id=graphene.ID())
     persons = graphene.List(
         lambda: PersonType,
@@ -125,9 +264,15 @@ class Query(graphene.ObjectType):
         profession=graphene.String(),
         limit=graphene.Int(),
     )
+    persons_connection = graphene.relay.ConnectionField(
+        lambda: PersonConnection, search=graphene.String(), profession=graphene.String()
+    )
     common_persons = graphene.List(
         lambda: PersonType, titles=graphene.List(graphene.String)
     )
+    common_persons_connection = graphene.relay.ConnectionField(
+        lambda: PersonConnection, titles=graphene.List(graphene.String, required=True)
+    )
     principals = graphene.List(
         lambda: PrincipalType,
         person_id=graphene.ID(),
@@ -135,7 +280,20 @@ class Query(graphene.ObjectType):
         job=graphene.String(),
         limit=graphene.Int(),
     )
+    principals_connection = graphene.relay.ConnectionField(
+        lambda: PrincipalConnection,
+        person_id=graphene.ID(),
+        film_id=graphene.ID(),
+        job=graphene.String(),
+    )
     ratings = graphene.List(lambda: RatingType, limit=graphene.Int())
+    ratings_connection = graphene.relay.ConnectionField(lambda: RatingConnection)
+    alternatives = graphene.List(
+        lambda: AlternativeType,
+        search=graphene.String(required=True),
+        region=graphene.String(),
+        limit=graphene.Int(),
+    )
     genres = graphene.List(GenreType, search=graphene.String())
     professions = graphene.List(ProfessionType, search=graphene.String())
 
@@ -164,9 +322,15 @@ class Query(graphene.ObjectType):
                 if period
                 else True
             )
-            .limit(limit)
+            .limit(get_limit(limit))
         )
 
+    def resolve_films_connection(
+        self, info, search: str = None, genre: str = None, period=None, **args
+    ):
+        query = filter_films(FilmType.get_query(info), search, genre, period)
+        return paginate(FilmConnection, query, [models.FilmModel.id], **args)
+
     def resolve_common_films(self, info, names):
         person_ids = [
             n.id
@@ -182,6 +346,10 @@ class Query(graphene.ObjectType):
             .having(count(models.FilmModel.id) == len(names))
         )
 
+    def resolve_common_films_connection(self, info, names, **args):
+        query = Query.resolve_common_films(self, info, names)
+        return paginate(FilmConnection, query, [models.FilmModel.id], **args)
+
     def resolve_person(self, info, id):
         query = PersonType.get_query(info)
         return query.filter(models.PersonModel.id == id)
@@ -197,9 +365,13 @@ class Query(graphene.ObjectType):
             .filter(
                 models.ProfessionModel.profession == profession if profession else True
             )
-            .limit(limit)
+            .limit(get_limit(limit))
         )
 
+    def resolve_persons_connection(self, info, search: str = None, profession=None, **args):
+        query = filter_persons(PersonType.get_query(info), search, profession)
+        return paginate(PersonConnection, query, [models.PersonModel.id], **args)
+
     def resolve_common_persons(self, info, titles):
         film_ids = [
             t.id
@@ -215,6 +387,10 @@ class Query(graphene.ObjectType):
             .having(count(models.PersonModel.id) == len(titles))
         )
 
+    def resolve_common_persons_connection(self, info, titles, **args):
+        query = Query.resolve_common_persons(self, info, titles)
+        return paginate(PersonConnection, query, [models.PersonModel.id], **args)
+
     def resolve_principals(
         self, info, person_id=None, film_id=None, job=None, limit=QUERY_LIMIT
     ):
@@ -226,12 +402,37 @@ class Query(graphene.ObjectType):
             .filter(models.PrincipalModel.film_id == film_id if film_id else True)
             .join(models.JobModel)
             .filter(models.JobModel.job == job if job else True)
-            .limit(limit)
+            .limit(get_limit(limit))
         )
 
+    def resolve_principals_connection(
+        self, info, person_id=None, film_id=None, job=None, **args
+    ):
+        query = Query.resolve_principals(self, info, person_id, film_id, job).limit(None)
+        return paginate(PrincipalConnection, query, [models.PrincipalModel.id], **args)
+
     def resolve_ratings(self, info, limit=QUERY_LIMIT):
         query = RatingType.get_query(info)
-        return query.limit(limit)
+        return query.limit(get_limit(limit))
+
+    def resolve_ratings_connection(self, info, **args):
+        query = RatingType.get_query(info)
+        return paginate(RatingConnection, query, [models.RatingModel.id], **args)
+
+    def resolve_alternatives(self, info, search: str, region: str = None, limit=QUERY_LIMIT):
+        """
+        Alternative titles starting with `search`, case insensitive. A prefix
+        is matched with the index on lower(title), a pattern with a leading
+        wildcard would have to scan all alternative titles.
+        """
+        query = AlternativeType.get_query(info)
+        return (
+            query.filter(
+                func.lower(models.AlternativeModel.title).startswith(search.lower(), autoescape=True)
+            )
+            .filter(models.AlternativeModel.region == region if region else True)
+            .limit(get_limit(limit))
+        )
 
     def resolve_genres(self, info, search: str = None):
         query = GenreType.get_query(info)
@@ -0,0 +1,374 @@
+import csv
+import io
+import queue
+import threading
+import zlib
+from bisect import bisect_right
+from dataclasses import dataclass
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Callable, Iterable, Optional, Sequence
+
+from src.pgcopy import HEADER, NULL_VALUE, TRAILER, RowEncoder
+from src.utils import to_bool
+
+QUEUE_SIZE = 16  # formatted batches buffered per COPY stream before the parser blocks
+ROW_GROUP_SIZE = 1 << 18  # rows per Parquet row group
+PARQUET_EXTENSION = "parquet"
+
+
+class TableSink:
+    """
+    Destination of the rows of one table produced by DatasetParser
+    """
+
+    rows: int = 0
+
+    def write_rows(self, rows: Iterable[Sequence[Any]]) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        raise NotImplementedError
+
+    def chunks(self) -> list["ChunkInfo"]:
+        """
+        Files written by the sink, for the checkpoint manifest
+        """
+        return []
+
+    def abort(self) -> None:
+        self.close()
+
+    def __enter__(self) -> "TableSink":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType],
+    ) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+@dataclass(frozen=True)
+class ChunkInfo:
+    path: Path
+    rows: int
+    size: int
+    checksum: Optional[int] = None
+
+
+class _FileSink(TableSink):
+    """
+    Sink writing one file, keeping the crc32 of everything written
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.rows = 0
+        self.checksum = 0
+        self._file = open(path, "wb")  # noqa: SIM115
+
+    def _write(self, data: bytes) -> None:
+        self.checksum = zlib.crc32(data, self.checksum)
+        self._file.write(data)
+
+    def close(self) -> None:
+        self._file.close()
+
+    def chunks(self) -> list[ChunkInfo]:
+        return [ChunkInfo(self.path, self.rows, self.path.stat().st_size, self.checksum)]
+
+    def __str__(self) -> str:
+        return f"'{self.path}' file"
+
+
+class CsvSink(_FileSink):
+    def __init__(self, path: Path, delimiter: str) -> None:
+        super().__init__(path)
+        self.delimiter = delimiter
+
+    def write_rows(self, rows: Iterable[Sequence[Any]]) -> None:
+        buffer = io.StringIO()
+        rows = list(rows)
+        csv.writer(buffer, delimiter=self.delimiter).writerows(rows)
+        self._write(buffer.getvalue().encode())
+        self.rows += len(rows)
+
+
+class PgBinarySink(_FileSink):
+    """
+    Writes rows in the PostgreSQL binary COPY format, the loader ingests
+    them with `COPY ... FROM STDIN (FORMAT binary)` so the server doesn't
+    parse any text
+    """
+
+    def __init__(self, path: Path, table_name: str) -> None:
+        from src import models
+
+        super().__init__(path)
+        self._encoder = RowEncoder(list(models.db.metadata.tables[table_name].columns))
+        self._write(HEADER)
+
+    def write_rows(self, rows: Iterable[Sequence[Any]]) -> None:
+        rows = list(rows)
+        self._write(self._encoder.encode_rows(rows))
+        self.rows += len(rows)
+
+    def close(self) -> None:
+        self._write(TRAILER)
+        super().close()
+
+
+class ParquetSink(TableSink):
+    """
+    Writes rows into a Parquet file with the column types of the table in
+    `models`, for analytics outside of the database. Rows are buffered and
+    written one row group at a time, string columns are dictionary encoded.
+    Needs the optional `pyarrow` package.
+    """
+
+    def __init__(self, path: Path, table_name: str, row_group_size: int = ROW_GROUP_SIZE) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        from src import models
+
+        columns = list(models.db.metadata.tables[table_name].columns)
+        self.path = path
+        self.rows = 0
+        self.row_group_size = row_group_size
+        self._pa = pa
+        self._converters = [_get_converter(column) for column in columns]
+        self._schema = pa.schema([(column.name, _get_arrow_type(pa, column)) for column in columns])
+        strings = [field.name for field in self._schema if pa.types.is_string(field.type)]
+        self._writer = pq.ParquetWriter(path, self._schema, use_dictionary=strings or False, compression="zstd")
+        self._buffer: list[Sequence[Any]] = []
+
+    def write_rows(self, rows: Iterable[Sequence[Any]]) -> None:
+        self._buffer.extend(rows)
+        if len(self._buffer) >= self.row_group_size:
+            self._flush()
+
+    def close(self) -> None:
+        self._flush()
+        self._writer.close()
+
+    def chunks(self) -> list[ChunkInfo]:
+        return [ChunkInfo(self.path, self.rows, self.path.stat().st_size)]
+
+    def _flush(self) -> None:
+        if not self._buffer:
+            return
+        arrays = [
+            self._pa.array([convert(value) for value in values], type=field.type)
+            for convert, values, field in zip(self._converters, zip(*self._buffer), self._schema)
+        ]
+        self._writer.write_table(
+            self._pa.Table.from_arrays(arrays, schema=self._schema), row_group_size=self.row_group_size
+        )
+        self.rows += len(self._buffer)
+        self._buffer = []
+
+    def __str__(self) -> str:
+        return f"'{self.path}' file"
+
+
+def _get_arrow_type(pa: Any, column: Any) -> Any:
+    from sqlalchemy import Boolean, Float, Integer, SmallInteger
+
+    if isinstance(column.type, Boolean):
+        return pa.bool_()
+    if isinstance(column.type, SmallInteger):
+        return pa.int16()
+    if isinstance(column.type, Integer):
+        return pa.int32()
+    if isinstance(column.type, Float):
+        return pa.float64()
+    return pa.string()
+
+
+def _get_converter(column: Any) -> Callable[[Any], Any]:
+    from sqlalchemy import Boolean, Float, Integer
+
+    if isinstance(column.type, Boolean):
+        convert: Callable[[Any], Any] = to_bool
+    elif isinstance(column.type, Integer):
+        convert = int
+    elif isinstance(column.type, Float):
+        convert = float
+    else:
+        convert = str
+    return lambda value: None if value is None or value == NULL_VALUE else convert(value)
+
+
+class ChunkedFileSink(TableSink):
+    """
+    Spreads rows over `chunks` files '<chunks_dir>/<file_name>.00', '.01', ...
+    one batch at a time in round robin, so the loader can COPY them in parallel
+    :param open_chunk: creates the sink writing one chunk file
+    """
+
+    def __init__(
+        self, chunks_dir: Path, file_name: str, chunks: int, open_chunk: Callable[[Path], TableSink]
+    ) -> None:
+        chunks_dir.mkdir(parents=True, exist_ok=True)
+        self.chunks_dir = chunks_dir
+        self.rows = 0
+        self._sinks = [open_chunk(chunks_dir / f"{file_name}.{idx:02d}") for idx in range(chunks)]
+        self._next = 0
+
+    def write_rows(self, rows: Iterable[Sequence[Any]]) -> None:
+        rows = list(rows)
+        if not rows:
+            return
+        self._sinks[self._next].write_rows(rows)
+        self._next = (self._next + 1) % len(self._sinks)
+        self.rows += len(rows)
+
+    def close(self) -> None:
+        for sink in self._sinks:
+            sink.close()
+
+    def chunks(self) -> list[ChunkInfo]:
+        return [chunk for sink in self._sinks for chunk in sink.chunks()]
+
+    def __str__(self) -> str:
+        return f"'{self.chunks_dir}' ({len(self._sinks)} chunk files)"
+
+
+class PartitionedSink(TableSink):
+    """
+    Routes every row to the sink of its range partition, by the value of
+    column `key`
+    :param bounds: first values of partitions 1..n-1, ascending
+    :param open_partition: creates the sink of a partition by its index
+    """
+
+    def __init__(self, bounds: Sequence[int], key: int, open_partition: Callable[[int], TableSink]) -> None:
+        self.bounds = list(bounds)
+        self.key = key
+        self.rows = 0
+        self._sinks = [open_partition(idx) for idx in range(len(self.bounds) + 1)]
+
+    def write_rows(self, rows: Iterable[Sequence[Any]]) -> None:
+        partitions: list[list[Sequence[Any]]] = [[] for _ in self._sinks]
+        for row in rows:
+            partitions[bisect_right(self.bounds, row[self.key])].append(row)
+        for sink, partition in zip(self._sinks, partitions):
+            if partition:
+                sink.write_rows(partition)
+                self.rows += len(partition)
+
+    def close(self) -> None:
+        for sink in self._sinks:
+            sink.close()
+
+    def chunks(self) -> list[ChunkInfo]:
+        return [chunk for sink in self._sinks for chunk in sink.chunks()]
+
+    def __str__(self) -> str:
+        return f"{len(self._sinks)} partitions ({self._sinks[0]}, ...)"
+
+
+class _QueueReader(io.TextIOBase):
+    """
+    File-like object handed to `cursor.copy_from`, it reads the batches
+    the parser puts into a bounded queue
+    """
+
+    def __init__(self, batches: "queue.Queue[Optional[str]]") -> None:
+        self.batches = batches
+        self.failed = False
+
+    def read(self, size: Optional[int] = -1) -> str:  # noqa: ARG002
+        batch = self.batches.get()
+        if batch is None:
+            if self.failed:
+                raise RuntimeError("Parsing failed, aborting COPY")
+            return ""
+        return batch
+
+    def readline(self, size: Optional[int] = -1) -> str:
+        return self.read(size)
+
+
+class CopyStreamSink(TableSink):
+    """
+    Streams rows into `COPY table FROM STDIN` running in its own thread and
+    connection. The queue between parser and COPY is bounded, so a slow
+    database throttles the parser instead of buffering the whole table.
+    Rows are committed when the sink is closed.
+    """
+
+    def __init__(self, db_uri: str, table_name: str, delimiter: str, queue_size: int = QUEUE_SIZE) -> None:
+        from src import models
+
+        self.table_name = table_name
+        self.delimiter = delimiter
+        self.rows = 0
+        self._batches: "queue.Queue[Optional[str]]" = queue.Queue(maxsize=queue_size)
+        self._reader = _QueueReader(self._batches)
+        self._error: Optional[BaseException] = None
+        self._connection = models.db.create_engine(db_uri).raw_connection()
+        self._thread = threading.Thread(target=self._copy, name=f"copy-{table_name}", daemon=True)
+        self._thread.start()
+
+    def write_rows(self, rows: Iterable[Sequence[Any]]) -> None:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter=self.delimiter)
+        rows = list(rows)
+        writer.writerows(rows)
+        self.rows += len(rows)
+        if self._error is not None:
+            raise RuntimeError(f"COPY into '{self.table_name}' failed") from self._error
+        self._batches.put(buffer.getvalue())
+
+    def close(self) -> None:
+        self._batches.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise RuntimeError(f"COPY into '{self.table_name}' failed") from self._error
+
+    def abort(self) -> None:
+        self._reader.failed = True
+        self._batches.put(None)
+        self._thread.join()
+
+    def _copy(self) -> None:
+        try:
+            with self._connection.cursor() as cursor:
+                cursor.copy_from(self._reader, self.table_name, sep=self.delimiter)
+            self._connection.commit()
+        except Exception as error:  # noqa: BLE001
+            self._error = error
+            self._connection.rollback()
+            if not self._reader.failed:
+                # unblock a parser waiting on the full queue until it closes the sink
+                while self._batches.get() is not None:
+                    pass
+        finally:
+            self._connection.close()
+
+    def __str__(self) -> str:
+        return f"'{self.table_name}' table"
+
+
+def write_all(sink: TableSink, rows: Iterable[Sequence[Any]], batch_size: int = 10_000) -> int:
+    """
+    Write rows to a sink in batches
+    :return: number of rows written
+    """
+    batch: list[Sequence[Any]] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            sink.write_rows(batch)
+            batch = []
+    if batch:
+        sink.write_rows(batch)
+    return sink.rows
@@ -3,6 +3,7 @@ from typing import Literal, Optional
 
 
 ResumeOptions = Literal["name", "principal", "rating"]
+OutputFormat = Literal["csv", "binary", "parquet"]
 
 
 class CommandArgs(Namespace):
@@ -15,3 +16,14 @@ class CommandArgs(Namespace):
     resume: Optional[ResumeOptions]
     debug: Optional[bool]
     quiet: Optional[bool]
+    workers: Optional[int]
+    gzipped: Optional[bool]
+    stream: Optional[bool]
+    output_format: Optional[OutputFormat]
+    delta: Optional[bool]
+    checkpoint: Optional[bool]
+    bulk: Optional[bool]
+    swap: Optional[bool]
+    rollback: Optional[bool]
+    partitions: Optional[int]
+    memory_limit: Optional[int]
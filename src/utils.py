@@ -4,7 +4,7 @@ import sys
 import tempfile
 import urllib.parse
 from pathlib import Path
-from typing import Any, Literal, Optional, TypedDict, Union, cast
+from typing import Any, Literal, NotRequired, Optional, TypedDict, Union, cast
 from bs4 import ResultSet
 
 import yaml
@@ -26,6 +26,13 @@ class DataSetPaths(TypedDict):
 DataSetKeys = Literal["film","person","principal","alternative","rating","crew","episode"]
 
 
+class ResponseCacheConfig(TypedDict, total=False):
+    size: int
+    ttl: float
+    path: Optional[str]
+    generation_interval: float
+
+
 class Config(TypedDict):
     data_sets_url: str
     dataset_file_ext: str
@@ -34,6 +41,7 @@ class Config(TypedDict):
     default_database_uri: str
     csv_extension: str
     film_filter: list[str]
+    response_cache: NotRequired[ResponseCacheConfig]
 
 
 def get_config(config_path: Path) -> Config:
@@ -109,3 +117,12 @@ def get_null(value: str) -> str:
     if value.strip() not in ["\\N", ""]:
         return value
     return "0"
+
+
+def to_bool(value: object) -> bool:
+    """
+    Boolean from a parsed value, either a bool or its text form
+    """
+    if isinstance(value, bool):
+        return value
+    return value in ("1", "True", "t")
@@ -0,0 +1,49 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.category_mapping import ROW_SIZE, CategoryMapping
+
+
+class TestCategoryMapping(unittest.TestCase):
+    def setUp(self):
+        self.mapping = CategoryMapping()
+        self.mapping.add_all(["Short", "Drama"], 1)
+        self.mapping.add_all(["Drama"], 2)
+
+    def test_first_seen_ids(self):
+        self.assertEqual(list(self.mapping.table_rows()), [(0, "Short"), (1, "Drama")])
+        self.assertEqual(list(self.mapping.rows()), [(0, 1), (1, 1), (1, 2)])
+        self.assertEqual(len(self.mapping), 3)
+
+    def test_merge_reencodes_categories(self):
+        other = CategoryMapping()
+        other.add_all(["Comedy", "Short"], 3)
+        self.mapping.merge(other)
+        self.assertEqual(
+            list(self.mapping.table_rows()), [(0, "Short"), (1, "Drama"), (2, "Comedy")]
+        )
+        self.assertEqual(list(self.mapping.rows())[3:], [(2, 3), (0, 3)])
+
+    def test_clear(self):
+        self.mapping.clear()
+        self.assertEqual(len(self.mapping), 0)
+        self.assertEqual(list(self.mapping.table_rows()), [])
+
+    def test_spilled_rows(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            spill_dir = Path(tmp_dir)
+            mapping = CategoryMapping(spill_dir=spill_dir, buffer_limit=4 * ROW_SIZE)
+            expected = []
+            for entity_id in range(1, 11):
+                categories = ["Drama", "Short", "Comedy"][: entity_id % 3 + 1]
+                mapping.add_all(categories, entity_id)
+                expected.extend((mapping.get_id(category), entity_id) for category in categories)
+            self.mapping.merge(mapping)
+            self.assertGreater(len(list(spill_dir.iterdir())), 1)
+            self.assertEqual(list(mapping.rows()), expected)
+            self.assertEqual(len(mapping), len(expected))
+            self.assertEqual(len(self.mapping), 3 + len(expected))
+
+            mapping.clear()
+            self.assertEqual(list(spill_dir.iterdir()), [])
@@ -0,0 +1,50 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.checkpoint import Checkpoint
+from src.table_sink import ChunkInfo
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp_dir.name)
+        self.chunk = self.root / "film" / "film.csv.00"
+        self.chunk.parent.mkdir()
+        self.chunk.write_text("1\tCarmencita\n")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_save_and_load(self):
+        checkpoint = Checkpoint(self.root)
+        checkpoint.record_chunks("film", [ChunkInfo(self.chunk, 1, self.chunk.stat().st_size, 42)])
+        checkpoint.state["jobs"] = {"actor": 1}
+        checkpoint.mark_parsed("film")
+        checkpoint.mark_loaded(self.chunk)
+
+        loaded = Checkpoint.load(self.root)
+        self.assertTrue(loaded.is_parsed("film"))
+        self.assertFalse(loaded.is_parsed("person"))
+        self.assertEqual(loaded.state, {"jobs": {"actor": 1}})
+        self.assertEqual(
+            loaded.get_chunk(self.chunk), {"rows": 1, "size": 13, "checksum": 42, "loaded": True}
+        )
+
+    def test_changed_chunk_isnt_parsed(self):
+        checkpoint = Checkpoint(self.root)
+        checkpoint.record_chunks("film", [ChunkInfo(self.chunk, 1, self.chunk.stat().st_size)])
+        checkpoint.mark_parsed("film")
+        self.chunk.write_text("1\tCarmen\n")
+        self.assertFalse(checkpoint.is_parsed("film"))
+        self.chunk.unlink()
+        self.assertFalse(checkpoint.is_parsed("film"))
+
+    def test_reset(self):
+        checkpoint = Checkpoint(self.root)
+        checkpoint.state_path("film.ids").write_bytes(b"\x01")
+        checkpoint.mark_parsed("film")
+        checkpoint.reset()
+        self.assertFalse(checkpoint.state_dir.exists())
+        self.assertEqual(Checkpoint.load(self.root).datasets, {})
@@ -1,5 +1,12 @@
+import gzip
+import importlib.util
+import shutil
+import tempfile
 import unittest
+from argparse import Namespace
+from contextlib import ExitStack
 from pathlib import Path
+from typing import Optional
 from unittest import mock
 
 from src.dataset_parser import DatasetParser
@@ -8,8 +15,10 @@ from tests.utils import get_root_dir, CONFIG_REL_PATH, DATASETS_REL_PATH
 
 CONFIG = get_config(get_root_dir() / CONFIG_REL_PATH)
 DATASET_DIR = get_root_dir() / DATASETS_REL_PATH
+PARSED_DATASETS = ["film", "person", "principal", "alternative", "rating"]
 EXPECTED_DATA = {
     "principal.csv": 10,
+    "alternative.csv": 12,
     "profession.csv": 6,
     "profession_person.csv": 25,
     "rating.csv": 8,
@@ -55,6 +64,98 @@ class TestDataSetParser(unittest.TestCase):
             path.unlink()
 
 
+def parse_datasets(interrupt: Optional[str] = None, **cmd_args) -> dict[str, list[str]]:
+    config = dict(CONFIG)
+    config["dataset_paths"] = {
+        key: value for key, value in CONFIG["dataset_paths"].items() if key in PARSED_DATASETS
+    }
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root = Path(tmp_dir)
+        for path in DATASET_DIR.glob("*.tsv"):
+            if cmd_args.get("gzipped"):
+                (root / f"{path.name}.gz").write_bytes(gzip.compress(path.read_bytes()))
+            else:
+                shutil.copy(path, root)
+        args = Namespace(root=root, debug=False, quiet=True, **cmd_args)
+        if interrupt is None:
+            DatasetParser(args, config).parse_dataset()
+        else:
+            parse_interrupted(args, config, interrupt)
+        return {
+            chunks_dir.name: sorted(line for chunk in chunks_dir.iterdir() for line in read_chunk(chunk))
+            for chunks_dir in root.iterdir()
+            if chunks_dir.is_dir() and not chunks_dir.name.startswith(".")
+        }
+
+
+def parse_interrupted(args: Namespace, config, interrupt: str) -> None:
+    """
+    Parse until the `interrupt` dataset fails, then resume from the checkpoint,
+    parsing one of the datasets before it again fails
+    """
+    with mock.patch.object(DatasetParser, f"_parse_{interrupt}", side_effect=RuntimeError("interrupted")):
+        try:
+            DatasetParser(args, config).parse_dataset()
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError(f"parsing '{interrupt}' wasn't interrupted")
+
+    with ExitStack() as stack:
+        for table_name in PARSED_DATASETS[: PARSED_DATASETS.index(interrupt)]:
+            stack.enter_context(
+                mock.patch.object(DatasetParser, f"_parse_{table_name}", side_effect=AssertionError(table_name))
+            )
+        DatasetParser(Namespace(**vars(args), checkpoint=True), config).parse_dataset()
+
+
+def read_chunk(chunk: Path) -> list[str]:
+    if chunk.name.split(".")[1] != "parquet":
+        return chunk.read_text().splitlines()
+    import pyarrow.parquet as pq
+
+    columns = pq.read_table(chunk).to_pydict().values()
+    return ["\t".join("\\N" if value is None else str(value) for value in row) for row in zip(*columns)]
+
+
+class TestParseDatasets(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tables = parse_datasets()
+
+    def test_row_counts(self):
+        for file_name, rows in EXPECTED_DATA.items():
+            self.assertEqual(len(self.tables[Path(file_name).stem]), rows, file_name)
+
+    def test_parallel_parse(self):
+        self.assertEqual(parse_datasets(workers=2), self.tables)
+
+    @unittest.skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow is not installed")
+    def test_parquet_output(self):
+        self.assertEqual(parse_datasets(output_format="parquet"), self.tables)
+        self.assertEqual(parse_datasets(output_format="parquet", workers=2), self.tables)
+
+    def test_partitions(self):
+        self.assertEqual(parse_datasets(partitions=3), self.tables)
+        self.assertEqual(parse_datasets(partitions=3, workers=2), self.tables)
+
+    def test_resume_from_checkpoint(self):
+        self.assertEqual(parse_datasets(interrupt="rating"), self.tables)
+        self.assertEqual(parse_datasets(interrupt="principal", workers=2), self.tables)
+
+    def test_memory_limit(self):
+        # 1 MiB spread over a few rows: edges, mapping rows and errors are spilled all the time
+        with mock.patch("src.dataset_parser.SORT_OVERHEAD", 1 << 18), mock.patch(
+            "src.category_mapping.ROW_SIZE", 1 << 16
+        ), mock.patch("src.dataset_parser.ERROR_ROW_SIZE", 1 << 15):
+            self.assertEqual(parse_datasets(memory_limit=1), self.tables)
+            self.assertEqual(parse_datasets(memory_limit=1, workers=2), self.tables)
+            self.assertEqual(parse_datasets(interrupt="principal", memory_limit=1), self.tables)
+
+    def test_gzipped_datasets(self):
+        self.assertEqual(parse_datasets(gzipped=True), self.tables)
+        self.assertEqual(parse_datasets(gzipped=True, workers=2), self.tables)
+
 # TODO: Cover all the rest of cases with different args
 # TODO: Increase dataset size in several times
 # TODO: Fix cleanup
@@ -0,0 +1,68 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.dataset_scanner import INVALID_ID, TsvScanner, count_rows, parse_ids, split_shards
+from tests.utils import get_root_dir, DATASETS_REL_PATH
+
+DATASET_DIR = get_root_dir() / DATASETS_REL_PATH
+
+
+def scan_column(path: Path, name: str, **kwargs) -> list[str]:
+    return [value for batch in TsvScanner(path, "\t", **kwargs) for value in batch.column(name)]
+
+
+class TestTsvScanner(unittest.TestCase):
+    def test_columns(self):
+        batches = list(TsvScanner(DATASET_DIR / "title.ratings.tsv", "\t"))
+        self.assertEqual(batches[0].headers, ["tconst", "averageRating", "numVotes"])
+        self.assertEqual(batches[0].column("averageRating")[0], "5.8")
+        self.assertEqual(
+            [row for batch in batches for row in batch.row_numbers], list(range(9))
+        )
+        self.assertEqual(batches[-1].progress, 100)
+
+    def test_malformed_rows(self):
+        batches = list(TsvScanner(DATASET_DIR / "title.basics.tsv", "\t"))
+        malformed = [row for batch in batches for row in batch.malformed]
+        self.assertEqual(sum(len(batch) for batch in batches), 8)
+        self.assertEqual(len(malformed), 1)
+        self.assertEqual(malformed[0]["tconst"], "tt0000009")
+        self.assertNotIn("genres", malformed[0])
+
+    def test_small_blocks(self):
+        path = DATASET_DIR / "title.principals.tsv"
+        self.assertGreater(len(list(TsvScanner(path, "\t", block_size=64))), 2)
+        self.assertEqual(
+            scan_column(path, "nconst", block_size=64), scan_column(path, "nconst")
+        )
+
+    def test_crlf_line_endings(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "crlf.tsv"
+            path.write_bytes(b"a\tb\r\n1\t2\r\n3\t4")
+            self.assertEqual(scan_column(path, "b"), ["2", "4"])
+
+
+class TestSplitShards(unittest.TestCase):
+    def test_shards_cover_all_rows(self):
+        path = DATASET_DIR / "title.principals.tsv"
+        shards = split_shards(path, 4)
+        self.assertEqual(len(shards), 4)
+        self.assertEqual(sum(count_rows(path, shard) for shard in shards), 10)
+        self.assertEqual(
+            [value for shard in shards for value in scan_column(path, "nconst", shard=shard)],
+            scan_column(path, "nconst"),
+        )
+
+    def test_more_shards_than_lines(self):
+        path = DATASET_DIR / "title.ratings.tsv"
+        shards = split_shards(path, 100)
+        self.assertLessEqual(len(shards), 9)
+        self.assertEqual(sum(count_rows(path, shard) for shard in shards), 9)
+
+
+class TestParseIds(unittest.TestCase):
+    def test_parse_ids(self):
+        self.assertEqual(list(parse_ids(["tt0000002", "nm0000010"])), [2, 10])
+        self.assertEqual(list(parse_ids(["tt0000002", "\\N"])), [2, INVALID_ID])
@@ -0,0 +1,32 @@
+import unittest
+
+from src.delta import DELTA_TABLES, difference, pack_key, unpack_key
+
+
+class TestDelta(unittest.TestCase):
+    def test_difference(self):
+        self.assertEqual(list(difference([1, 3, 5, 7], [0, 3, 4, 7, 9])), [1, 5])
+        self.assertEqual(list(difference([1, 2], [])), [1, 2])
+        self.assertEqual(list(difference([], [1])), [])
+
+    def test_pack_key(self):
+        bits = (31, 27, 5)
+        key = pack_key([36_000_000, 15_000_000, 12], bits)
+        self.assertLess(key, 1 << 63)
+        self.assertEqual(unpack_key(key, bits), (36_000_000, 15_000_000, 12))
+        with self.assertRaises(ValueError):
+            pack_key([1, 1, 32], bits)
+
+    def test_entries(self):
+        tables = {table.name: table for table in DELTA_TABLES}
+        rating = tables["rating"]
+        entry = rating.get_entry(["0", "5.8", "1396", "1"])
+        self.assertEqual(rating.get_key(entry), (1,))
+        # the row number id isn't part of the fingerprint, the content is
+        self.assertEqual(rating.get_entry(["7", "5.8", "1396", "1"]), entry)
+        updated = rating.get_entry(["0", "5.8", "1400", "1"])
+        self.assertNotEqual(updated, entry)
+        self.assertEqual(rating.get_key(updated), (1,))
+
+        principal = tables["principal"]
+        self.assertEqual(principal.get_key(principal.get_entry(["3", "1", "9", "4"])), (1, 9, 4))
@@ -1,14 +1,20 @@
+import json
+import tempfile
 import threading
 import unittest
+from pathlib import Path
 
 from src.utils import get_data_sets
 from src.dataset_handler import DataSetsHandler
 from tests.utils import (
     FakeHTTPServer,
+    Handler,
+    TEST_ETAG,
     TEST_HTTP_PORT,
     TEST_TVS_DATA,
     TEST_FILENAME,
     TEST_FILENAME_INVALID,
+    generate_gzipped_tvs_file_stream,
 )
 
 
@@ -39,6 +45,43 @@ class TestDownloadAndExtractDataset(unittest.TestCase):
             with open(data_set) as f:
                 self.assertEqual(TEST_TVS_DATA, f.read().strip("\n"))
 
+    def test_conditional_download(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            downloader = self._get_downloader(tmp_dir)
+            downloader.download()
+            gzipped = downloader.data_sets[0].gzipped
+            downloaded_at = gzipped.stat().st_mtime_ns
+
+            downloader.download()
+            self.assertEqual(Handler.requests[-1]["If-None-Match"], TEST_ETAG)
+            self.assertEqual(gzipped.stat().st_mtime_ns, downloaded_at)
+            # bytes of the first download only
+            metrics = downloader.report.stages["download"].datasets[gzipped.name]
+            self.assertEqual(metrics.bytes, len(generate_gzipped_tvs_file_stream()))
+
+    def test_resume_download(self):
+        data = generate_gzipped_tvs_file_stream()
+        # a partial download of the served version is resumed, one of another version restarted
+        for etag, partial in ((TEST_ETAG, data[:100]), ('"outdated"', b"x" * 100)):
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                downloader = self._get_downloader(tmp_dir)
+                gzipped = downloader.data_sets[0].gzipped
+                gzipped.with_name(f"{gzipped.name}.part").write_bytes(partial)
+                gzipped.with_name(f"{gzipped.name}.download.json").write_text(
+                    json.dumps({"etag": etag, "complete": False})
+                )
+                downloader.download()
+                self.assertEqual(Handler.requests[-1]["Range"], "bytes=100-")
+                self.assertEqual(Handler.requests[-1]["If-Range"], etag)
+                self.assertEqual(gzipped.read_bytes(), data)
+
+    @staticmethod
+    def _get_downloader(root):
+        return DataSetsHandler(
+            get_data_sets(urls=[f"http://127.0.0.1:{TEST_HTTP_PORT}/{TEST_FILENAME}"], root=Path(root)),
+            connections=2,
+        )
+
     def test_invalid_data_set_filename(self):
         with self.assertRaises(ValueError):
             data_sets = get_data_sets(
@@ -0,0 +1,65 @@
+import random
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.edge_store import MERGE_FAN_IN, EdgeStore, read_run
+
+
+class TestEdgeStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.spill_dir = Path(self.tmp_dir.name) / "spill"
+        rng = random.Random(7)
+        self.edges = [(rng.randrange(1, 500), rng.randrange(1, 30_000_000)) for _ in range(5_000)]
+        self.edges += self.edges[:1_000]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_deduplicated_in_memory(self):
+        store = EdgeStore(self.spill_dir)
+        for edge in self.edges:
+            store.add(*edge)
+        self.assertEqual(list(store), sorted(set(self.edges)))
+        self.assertEqual(store.runs, 0)
+
+    def test_spilled_runs_are_merged(self):
+        store = EdgeStore(self.spill_dir, buffer_limit=8 * 700)
+        for edge in self.edges:
+            store.add(*edge)
+        self.assertGreater(store.runs, 1)
+        self.assertEqual(list(store), sorted(set(self.edges)))
+
+        store.clear()
+        self.assertEqual(list(store), [])
+        self.assertEqual(list(self.spill_dir.iterdir()), [])
+
+    def test_extend_packed(self):
+        source = EdgeStore(self.spill_dir)
+        for edge in self.edges:
+            source.add(*edge)
+        target = EdgeStore(self.spill_dir)
+        target.extend_packed(source.packed())
+        target.extend_packed(source.packed())
+        self.assertEqual(list(target), sorted(set(self.edges)))
+
+    def test_dump(self):
+        store = EdgeStore(self.spill_dir, buffer_limit=8 * 700)
+        for edge in self.edges:
+            store.add(*edge)
+        dump_path = Path(self.tmp_dir.name) / "edges.dump"
+        self.assertEqual(store.dump(dump_path), len(set(self.edges)))
+        self.assertEqual(list(read_run(dump_path)), list(store.packed()))
+
+    def test_spilled_runs_are_compacted(self):
+        store = EdgeStore(self.spill_dir, buffer_limit=8 * 50)
+        for edge in self.edges[:2_000]:
+            store.add(*edge)
+        flushed = store.flush()
+        for edge in self.edges[2_000:]:
+            store.add(*edge)
+        self.assertLess(store.runs, len(flushed) + MERGE_FAN_IN)
+        self.assertTrue(all(run.exists() for run in flushed))
+        self.assertEqual(list(store), sorted(set(self.edges)))
+        self.assertEqual(len(list(self.spill_dir.iterdir())), store.runs)
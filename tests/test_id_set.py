@@ -0,0 +1,53 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.id_set import IdSet
+
+
+class TestIdSet(unittest.TestCase):
+    def setUp(self):
+        self.ids = IdSet([1, 8, 9, 30_000_000])
+
+    def test_membership(self):
+        for id_ in [1, 8, 9, 30_000_000]:
+            self.assertIn(id_, self.ids)
+        for id_ in [0, 2, 7, 29_999_999, 30_000_001, -1]:
+            self.assertNotIn(id_, self.ids)
+
+    def test_contains_many(self):
+        self.assertEqual(
+            self.ids.contains_many([9, 10, -1, 40_000_000, 30_000_000]),
+            [True, False, False, False, True],
+        )
+
+    def test_len_and_iter(self):
+        self.ids.add(9)
+        self.assertEqual(len(self.ids), 4)
+        self.assertEqual(list(self.ids), [1, 8, 9, 30_000_000])
+        self.assertLess(self.ids.nbytes, 8_000_000)
+
+    def test_union_update(self):
+        other = IdSet([2, 9, 40_000_000])
+        self.ids.union_update(other)
+        self.assertEqual(list(self.ids), [1, 2, 8, 9, 30_000_000, 40_000_000])
+        self.assertEqual(len(self.ids), 6)
+
+    def test_negative_id(self):
+        with self.assertRaises(ValueError):
+            self.ids.add(-1)
+
+    def test_split(self):
+        ids = IdSet(range(0, 200_000, 2))
+        bounds = ids.split(4)
+        self.assertEqual(bounds, [50_000, 100_000, 150_000])
+        self.assertEqual(self.ids.split(2), [9])
+        self.assertEqual(IdSet().split(3), [])
+
+    def test_dump_and_load(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "ids"
+            self.ids.dump(path)
+            loaded = IdSet.load(path)
+        self.assertEqual(list(loaded), list(self.ids))
+        self.assertEqual(len(loaded), 4)
@@ -0,0 +1,45 @@
+import struct
+import unittest
+
+from src import models
+from src.pgcopy import NULL, RowEncoder
+
+
+def columns(table_name):
+    return list(models.db.metadata.tables[table_name].columns)
+
+
+class TestRowEncoder(unittest.TestCase):
+    def test_integer_table(self):
+        encoder = RowEncoder(columns("principal"))
+        expected = struct.pack("!hiiiiiiii", 4, 4, 7, 4, 1, 4, 9, 4, 2)
+        self.assertEqual(encoder.encode((7, 1, 9, 2)), expected)
+        self.assertEqual(encoder.encode(("7", 1, 9, "\\N")), expected[:-8] + NULL)
+
+    def test_typed_columns(self):
+        encoder = RowEncoder(columns("film"))
+        row = encoder.encode((2, "Le clown", False, "1892", "\\N"))
+        self.assertEqual(
+            row,
+            struct.pack("!hii", 5, 4, 2)
+            + struct.pack("!i", 8) + b"Le clown"
+            + struct.pack("!i?", 1, False)
+            + struct.pack("!ii", 4, 1892)
+            + NULL,
+        )
+
+        encoder = RowEncoder(columns("alternative"))
+        self.assertEqual(
+            encoder.encode((1, "3", "Carmencita", "US", "\\N", False)),
+            struct.pack("!hiiih", 6, 4, 1, 2, 3)
+            + struct.pack("!i", 10) + b"Carmencita"
+            + struct.pack("!i", 2) + b"US"
+            + NULL
+            + struct.pack("!i?", 1, False),
+        )
+
+        encoder = RowEncoder(columns("rating"))
+        self.assertEqual(
+            encoder.encode((0, "5.8", "1396", 1)),
+            struct.pack("!hiiidiiii", 4, 4, 0, 8, 5.8, 4, 1396, 4, 1),
+        )
@@ -0,0 +1,51 @@
+import io
+import json
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from src.progress import ProgressLine, RunReport
+
+
+class TestProgressLine(unittest.TestCase):
+    def test_rate_limited_rendering(self):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            progress_line = ProgressLine("Parsing ...", interval=3600)
+            for idx in range(10_000):
+                progress_line.update(idx / 100, rows=1)
+            progress_line.done()
+        lines = output.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(progress_line.rows, 10_000)
+        self.assertTrue(lines[-1].endswith("done"))
+
+    def test_quiet(self):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            progress_line = ProgressLine("Parsing ...", quiet=True, interval=0)
+            progress_line.update(50, rows=5)
+            progress_line.done()
+        self.assertEqual(output.getvalue(), "")
+
+
+class TestRunReport(unittest.TestCase):
+    def test_write(self):
+        report = RunReport()
+        with report.stage("parse") as stage:
+            with stage.measure("film") as metrics:
+                metrics.rows += 10
+                metrics.bytes += 100
+        with report.stage("load") as stage:
+            stage.dataset("film").rows += 10
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "report.json"
+            report.write(path)
+            data = json.loads(path.read_text())
+
+        self.assertEqual(list(data["stages"]), ["parse", "load"])
+        self.assertEqual(data["stages"]["parse"]["rows"], 10)
+        self.assertEqual(data["stages"]["parse"]["datasets"]["film"]["bytes"], 100)
+        self.assertIsNotNone(data["stages"]["parse"]["datasets"]["film"]["rows_per_sec"])
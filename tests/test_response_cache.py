@@ -0,0 +1,90 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.response_cache import GenerationCounter, ResponseCache, get_cache_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_lru(self):
+        cache = ResponseCache(size=2, clock=self.clock)
+        cache.set("a", 1, "A")
+        cache.set("b", 1, "B")
+        self.assertEqual(cache.get("a", 1), "A")
+        cache.set("c", 1, "C")
+        self.assertIsNone(cache.get("b", 1))
+        self.assertEqual(cache.get("a", 1), "A")
+        self.assertEqual(cache.get("c", 1), "C")
+
+    def test_ttl(self):
+        cache = ResponseCache(ttl=10, clock=self.clock)
+        cache.set("a", 1, "A")
+        self.clock.now += 9
+        self.assertEqual(cache.get("a", 1), "A")
+        self.clock.now += 1
+        self.assertIsNone(cache.get("a", 1))
+        self.assertEqual(len(cache), 0)
+
+    def test_generation(self):
+        cache = ResponseCache(clock=self.clock)
+        cache.set("a", 1, "A")
+        cache.set("b", 1, "B")
+        self.assertIsNone(cache.get("a", 2))
+        self.assertEqual(len(cache), 0)
+
+    def test_persistence(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "responses.json"
+            cache = ResponseCache(ttl=10, path=path, clock=self.clock)
+            cache.set("a", 1, "A")
+            self.clock.now += 5
+            cache.set("b", 1, "B")
+            cache.save()
+
+            self.assertEqual(ResponseCache(path=path, clock=self.clock).get("a", 1), "A")
+            self.assertIsNone(ResponseCache(path=path, clock=self.clock).get("a", 2))
+            self.clock.now += 6
+            restored = ResponseCache(path=path, clock=self.clock)
+            self.assertEqual(len(restored), 1)
+            self.assertEqual(restored.get("b", 1), "B")
+
+    def test_generation_counter(self):
+        reads = []
+        counter = GenerationCounter(interval=1, clock=self.clock)
+        counter._read = lambda engine: reads.append(engine) or len(reads)
+        self.assertEqual(counter.get("engine"), 1)
+        self.clock.now += 0.5
+        self.assertEqual(counter.get("engine"), 1)
+        self.clock.now += 0.5
+        self.assertEqual(counter.get("engine"), 2)
+
+
+class TestCacheKey(unittest.TestCase):
+    def test_normalized(self):
+        key = get_cache_key({"query": "{ films(limit: 2) { id } }"})
+        self.assertEqual(
+            get_cache_key({"query": "query {\n  films(limit: 2) {\n    id  # comment\n  }\n}"}), key
+        )
+        self.assertNotEqual(get_cache_key({"query": "{ films(limit: 3) { id } }"}), key)
+
+    def test_variables(self):
+        query = "query ($limit: Int) { films(limit: $limit) { id } }"
+        key = get_cache_key({"query": query, "variables": {"limit": 2}})
+        self.assertEqual(get_cache_key({"query": query, "variables": '{"limit": 2}'}), key)
+        self.assertNotEqual(get_cache_key({"query": query, "variables": {"limit": 3}}), key)
+
+    def test_not_cached(self):
+        self.assertIsNone(get_cache_key({"query": "{ films { id }"}))
+        self.assertIsNone(get_cache_key({"query": "mutation { delete { id } }"}))
+        self.assertIsNone(get_cache_key({}))
@@ -0,0 +1,58 @@
+import tempfile
+import unittest
+from argparse import Namespace
+from pathlib import Path
+
+from benchmarks.bench_pipeline import compare, get_benchmark_config
+from benchmarks.synthetic import SyntheticDatasets
+from src.dataset_parser import DatasetParser
+from src.progress import RunReport
+from src.utils import get_config
+from tests.utils import CONFIG_REL_PATH, get_root_dir
+
+CONFIG = get_config(get_root_dir() / CONFIG_REL_PATH)
+
+
+class TestSyntheticDatasets(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_same_seed_same_bytes(self):
+        first = [path.read_bytes() for path in SyntheticDatasets(0.1, seed=3).write(self.root / "a", CONFIG)]
+        second = [path.read_bytes() for path in SyntheticDatasets(0.1, seed=3).write(self.root / "b", CONFIG)]
+        other = [path.read_bytes() for path in SyntheticDatasets(0.1, seed=4).write(self.root / "c", CONFIG)]
+        self.assertEqual(len(first), len(CONFIG["dataset_paths"]))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+
+    def test_parse(self):
+        config = get_benchmark_config(CONFIG)
+        SyntheticDatasets(0.1).write(self.root, config)
+        report = RunReport()
+        cmd_args = Namespace(root=self.root, debug=False, quiet=True, gzipped=True)
+        DatasetParser(cmd_args, config, report=report).parse_dataset()
+
+        datasets = report.stages["parse"].datasets
+        for table in ("film", "person", "principal", "alternative", "rating", "person_film"):
+            self.assertGreater(datasets[table].rows, 0, table)
+        self.assertGreater(datasets["person"].rows, datasets["film"].rows)
+
+    def test_compare(self):
+        baseline = {
+            "peak_rss": 100,
+            "parse": {"seconds": 1.0, "rows_per_sec": 1000.0},
+            "parse.film": {"seconds": 0.01, "rows_per_sec": 1000.0},
+        }
+        results = {
+            "peak_rss": 110,
+            "parse": {"seconds": 1.0, "rows_per_sec": 800.0},
+            "parse.film": {"seconds": 0.1, "rows_per_sec": 10.0},
+        }
+        self.assertEqual(compare(results, baseline, 0.25), [])
+        results["parse"]["rows_per_sec"] = 700.0
+        results["peak_rss"] = 130
+        self.assertEqual(len(compare(results, baseline, 0.25)), 2)
@@ -0,0 +1,85 @@
+import importlib.util
+import tempfile
+import unittest
+from functools import partial
+from pathlib import Path
+
+from src.table_sink import ChunkedFileSink, CsvSink, ParquetSink, PartitionedSink, write_all
+
+
+class TestChunkedFileSink(unittest.TestCase):
+    open_chunk = partial(CsvSink, delimiter="\t")
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.chunks_dir = Path(self.tmp_dir.name) / "film"
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_batches_spread_over_chunks(self):
+        rows = [(idx, f"title {idx}") for idx in range(10)]
+        with ChunkedFileSink(self.chunks_dir, "film.csv", 3, self.open_chunk) as sink:
+            self.assertEqual(write_all(sink, rows, batch_size=2), 10)
+
+        chunks = sorted(self.chunks_dir.iterdir())
+        self.assertEqual([chunk.name for chunk in chunks], ["film.csv.00", "film.csv.01", "film.csv.02"])
+        self.assertEqual([len(chunk.read_text().splitlines()) for chunk in chunks], [4, 4, 2])
+        lines = sorted(line for chunk in chunks for line in chunk.read_text().splitlines())
+        self.assertEqual(lines, sorted(f"{idx}\ttitle {idx}" for idx in range(10)))
+
+    def test_empty_batches_skipped(self):
+        with ChunkedFileSink(self.chunks_dir, "film.csv", 2, self.open_chunk) as sink:
+            sink.write_rows([])
+            sink.write_rows([(1, "a")])
+        self.assertEqual((self.chunks_dir / "film.csv.00").read_text().splitlines(), ["1\ta"])
+        self.assertEqual((self.chunks_dir / "film.csv.01").read_text(), "")
+
+
+class TestPartitionedSink(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.chunks_dir = Path(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def open_partition(self, idx):
+        return CsvSink(self.chunks_dir / f"principal.csv.00.p{idx:02d}", "\t")
+
+    def test_rows_routed_by_key(self):
+        rows = [(idx, film_id) for idx, film_id in enumerate([1, 5, 9, 10, 2, 30])]
+        with PartitionedSink([5, 10], 1, self.open_partition) as sink:
+            self.assertEqual(write_all(sink, rows, batch_size=4), 6)
+
+        names = [chunk.path.name for chunk in sink.chunks()]
+        self.assertEqual(names, ["principal.csv.00.p00", "principal.csv.00.p01", "principal.csv.00.p02"])
+        partitions = [chunk.path.read_text().splitlines() for chunk in sink.chunks()]
+        self.assertEqual(partitions, [["0\t1", "4\t2"], ["1\t5", "2\t9"], ["3\t10", "5\t30"]])
+
+
+@unittest.skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow is not installed")
+class TestParquetSink(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name) / "film.parquet"
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_typed_row_groups(self):
+        import pyarrow.parquet as pq
+
+        rows = [(idx, f"title {idx % 3}", idx % 2 == 0, str(1900 + idx), "\\N") for idx in range(10)]
+        with ParquetSink(self.path, "film", row_group_size=4) as sink:
+            write_all(sink, rows, batch_size=3)
+        self.assertEqual(sink.rows, 10)
+
+        parquet_file = pq.ParquetFile(self.path)
+        self.assertEqual(parquet_file.metadata.num_row_groups, 3)
+        self.assertIn("RLE_DICTIONARY", parquet_file.metadata.row_group(0).column(1).encodings)
+        table = parquet_file.read()
+        self.assertEqual(str(table.schema.field("start_year").type), "int32")
+        self.assertEqual(table.column("is_adult").to_pylist()[:2], [True, False])
+        self.assertEqual(table.column("start_year").to_pylist()[-1], 1909)
+        self.assertEqual(table.column("runtime_minutes").null_count, 10)
@@ -11,6 +11,8 @@ __all__ = [
     "TEST_FILENAME",
     "TEST_TVS_DATA",
     "TEST_FILENAME_INVALID",
+    "TEST_ETAG",
+    "generate_gzipped_tvs_file_stream",
     "CONFIG_REL_PATH",
     "DATASETS_REL_PATH",
     "get_root_dir",
@@ -22,6 +24,7 @@ TEST_HTTP_PORT = 8333
 DELIMITER = "\t"
 TEST_FILENAME = "valid.test.dataset.tsv.gz"
 TEST_FILENAME_INVALID = "invalid.test.dataset.tsv.zip"
+TEST_ETAG = '"test-dataset-1"'
 TEST_TVS_DATA = r"""
 nconst	primaryName	birthYear	deathYear	primaryProfession	knownForTitles
 nm0000001	Fred Astaire	1899	1987	soundtrack,actor,miscellaneous	tt0072308,tt0050419,tt0045537,tt0043044
@@ -41,29 +44,50 @@ DATASETS_REL_PATH = Path("tests") / "datasets"
 
 
 class Handler(http.server.SimpleHTTPRequestHandler):
+    """
+    Serves the test dataset with an ETag, honoring If-None-Match and
+    Range/If-Range. The headers of every request are kept in `requests`.
+    """
+
+    requests: list = []
+
     def do_GET(self):
         if self.path in [f"/{TEST_FILENAME}", f"/{TEST_FILENAME_INVALID}"]:
+            Handler.requests.append(dict(self.headers))
             self._handle_success()
         else:
             self.send_error(404)
 
     def _handle_success(self):
-        self.send_response(200)
+        if self.headers.get("If-None-Match") == TEST_ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        data = generate_gzipped_tvs_file_stream()
+        start = 0
+        if self.headers.get("Range") and self.headers.get("If-Range", TEST_ETAG) == TEST_ETAG:
+            start = int(self.headers["Range"].removeprefix("bytes=").split("-")[0])
+        self.send_response(206 if start else 200)
+        if start:
+            self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
         self.send_header("Content-Disposition", f"attachment; filename={self.path[1:]}")
         self.send_header("Content-type", "application/x-gzip")
-        self.send_header("Content-Length", "1000")
+        self.send_header("Content-Length", str(len(data) - start))
+        self.send_header("ETag", TEST_ETAG)
         self.end_headers()
-        self.wfile.write(_generate_gzipped_tvs_file_stream())
+        self.wfile.write(data[start:])
 
 
-def _generate_gzipped_tvs_file_stream():
+def generate_gzipped_tvs_file_stream():
     output = io.StringIO()
     writer = csv.writer(output, delimiter=DELIMITER)
     for line in TEST_TVS_DATA.split("\n"):
         if line.strip():
             writer.writerow(line.split(DELIMITER))
     output.seek(0)
-    return gzip.compress(output.read().encode())
+    # no timestamp in the gzip header, so every response has the same bytes
+    return gzip.compress(output.read().encode(), mtime=0)
 
 
 class FakeHTTPServer(http.server.HTTPServer):